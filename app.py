@@ -8,9 +8,10 @@ import openai
 import time
 import json
 import threading
-from modules.config import get_openai_api_key, get_elevenlabs_api_key
+from modules.config import get_openai_api_key, get_elevenlabs_api_key, get_analysis_workers, get_media_index_path
 from modules.directory_reader import gather_media_files
 from modules.media_analyzer import analyze_media_files
+from modules.derivative_store import get_derivative
 from modules.broll_suggester import suggest_broll
 from modules.voiceover_generator import generate_voiceover
 from modules.video_processor import process_videos
@@ -19,6 +20,10 @@ from modules.video_processor import process_videos
 SUB_SCRIPT_PATH = "/Users/andreas/Desktop/ViralShortAI/viralshortai/js-scripts/sub_v1.mjs"
 NODE_EXECUTABLE = "node"  # Ensure Node.js is installed and accessible
 
+# Square thumbnails of the analyzed images shown in the UI
+PREVIEW_THUMBNAIL_SIZE = 160
+PREVIEW_THUMBNAIL_LIMIT = 24
+
 # Subprocess handle for managing sub_v1.mjs
 subprocess_handle = None
 
@@ -134,7 +139,12 @@ def automated_content_generation(project_root, media_dir, context_path, output_d
                 time.sleep(generation_interval)
                 continue
                 
-            analyzed_media = analyze_media_files(media_files, marketing_context)
+            analyzed_media = analyze_media_files(
+                media_files,
+                marketing_context,
+                cache_path=get_media_index_path(),
+                workers=get_analysis_workers()
+            )
             
             # Suggest B-roll
             broll_suggestions = suggest_broll(analyzed_media, marketing_context)
@@ -281,8 +291,31 @@ def main():
                 st.error("No media files found in the media directory.")
                 return
                 
-            analyzed_media = analyze_media_files(media_files, marketing_context)
+            analysis_progress = st.progress(0.0, text="Analyzing media files...")
+
+            def on_analysis_progress(completed, total, files_per_sec):
+                fraction = completed / total if total else 0.0
+                analysis_progress.progress(
+                    min(fraction, 1.0),
+                    text=f"Analyzed {completed}/{total} files ({files_per_sec:.1f} files/sec)"
+                )
+
+            analyzed_media = analyze_media_files(
+                media_files,
+                marketing_context,
+                cache_path=get_media_index_path(),
+                workers=get_analysis_workers(),
+                progress_callback=on_analysis_progress
+            )
             st.json([m.dict() for m in analyzed_media])
+
+            # Thumbnails come from the derivative store, never from the media folder
+            images = [m for m in analyzed_media if m.file_type == "image"][:PREVIEW_THUMBNAIL_LIMIT]
+            thumbnails = [get_derivative(m.file_path, PREVIEW_THUMBNAIL_SIZE, PREVIEW_THUMBNAIL_SIZE, crop=True)
+                          for m in images]
+            thumbnails = [str(path) for path in thumbnails if path is not None]
+            if thumbnails:
+                st.image(thumbnails, width=PREVIEW_THUMBNAIL_SIZE)
             
             # Suggest B-roll
             broll_suggestions = suggest_broll(analyzed_media, marketing_context)
@@ -0,0 +1,251 @@
+# artifact_cache.py
+# Content-addressed cache of pipeline stage outputs (silence JSON, zoom plans, trimmed
+# clips, rendered videos). An artifact is keyed by the fingerprints of its input files,
+# the stage parameters and the stage's code version; hits are materialized with a
+# reflink or hardlink instead of re-running the stage, and the cache is kept under a
+# size quota by evicting the least recently used artifacts.
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from modules.fingerprint import FINGERPRINT_MODES, fingerprint_file
+
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+# ioctl request to clone a file's extents (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return True
+    except OSError:
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _link_or_copy(src: Path, dst: Path) -> str:
+    """
+    Make dst a copy of src as cheaply as the filesystem allows. Returns the method used.
+    """
+    if _reflink(src, dst):
+        return "reflink"
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+            raise
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+class ArtifactCache:
+    """
+    Directory of artifacts named by key (objects/ab/<key><suffix>). Artifacts are
+    stored read-only because hits may be hardlinks that share their data with the
+    stage output; a stage must replace its output rather than write into it, which
+    run_cached takes care of.
+
+    Args:
+        cache_dir: Cache directory
+        max_bytes: Size quota
+        fingerprint_mode: How input files are fingerprinted for keys (see
+            fingerprint.FINGERPRINT_MODES). "full" hashes every byte; "sampled" is
+            much cheaper for large footage but misses same-size edits outside the
+            sampled blocks, which then hit a stale artifact.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES, fingerprint_mode: str = "full"):
+        if fingerprint_mode not in FINGERPRINT_MODES:
+            raise ValueError(f"Unknown fingerprint mode: {fingerprint_mode}")
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.fingerprint_mode = fingerprint_mode
+        self.objects_dir = self.cache_dir / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+
+    def key(self, stage: str, version: int, inputs: Iterable[Path] = (), params: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Cache key of a stage run: stage name and code version, the fingerprint of
+        every input file (in order, in the cache's fingerprint_mode) and the
+        JSON-encoded parameters.
+        """
+        payload = json.dumps({
+            "stage": stage,
+            "version": version,
+            "inputs": [fingerprint_file(Path(path), self.fingerprint_mode) for path in inputs],
+            "params": params or {},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _find(self, key: str) -> Optional[Path]:
+        shard = self.objects_dir / key[:2]
+        try:
+            for entry in os.scandir(shard):
+                if entry.name.startswith(key) and not entry.name.endswith(".tmp"):
+                    return Path(entry.path)
+        except OSError:
+            pass
+        return None
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """
+        Path of the artifact for key inside the cache (marked as used), or None on a
+        miss. The file is read-only and may be evicted later; use it right away.
+        """
+        cached = self._find(key)
+        if cached is not None:
+            try:
+                os.utime(cached)
+            except OSError:
+                return None
+        return cached
+
+    def materialize(self, key: str, output: Path) -> bool:
+        """
+        Place the artifact for key at output; False on a miss.
+        """
+        cached = self._find(key)
+        if cached is None:
+            return False
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            output.unlink(missing_ok=True)
+            _link_or_copy(cached, output)
+            os.utime(cached)
+        except OSError as e:
+            print(f"Error materializing cached artifact {key}: {e}")
+            return False
+        return True
+
+    def store(self, key: str, path: Path):
+        """
+        Add the file at path as the artifact for key, then enforce the quota.
+        """
+        path = Path(path)
+        shard = self.objects_dir / key[:2]
+        shard.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=shard, suffix=".tmp")
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            tmp_path.unlink()
+            _link_or_copy(path, tmp_path)
+            os.chmod(tmp_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+            os.replace(tmp_path, shard / f"{key}{path.suffix}")
+        except OSError as e:
+            print(f"Error caching artifact {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self.evict(keep=[key])
+
+    def evict(self, keep: Iterable[str] = (), grace: float = 0.0):
+        """
+        Delete the least recently used artifacts until the cache fits max_bytes.
+
+        Args:
+            keep: Keys that are never deleted (e.g. the artifact just written)
+            grace: Artifacts used within this many seconds are kept too, so a path
+                another process just got from lookup() stays valid while it is read
+        """
+        keep = set(keep)
+        entries = []
+        for shard in self.objects_dir.iterdir():
+            try:
+                for entry in os.scandir(shard):
+                    if not entry.name.endswith(".tmp"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime_ns, st.st_size, entry.path))
+            except OSError:
+                continue
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        cutoff = time.time_ns() - int(grace * 1e9)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if (grace and mtime > cutoff) or os.path.basename(path).split(".", 1)[0] in keep:
+                continue
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+    def size(self) -> int:
+        return sum(entry.stat().st_size for shard in self.objects_dir.iterdir() for entry in os.scandir(shard))
+
+
+def run_cached(
+    cache: Optional[ArtifactCache],
+    stage: str,
+    version: int,
+    inputs: Iterable[Path],
+    params: Optional[Dict[str, Any]],
+    output: Path,
+    produce: Callable[[], Any]
+) -> bool:
+    """
+    Materialize a stage's output from the cache, or run produce() to write it to
+    output and cache the result. Returns True on a cache hit.
+
+    Args:
+        cache: Artifact cache (None runs the stage uncached)
+        stage: Stage name
+        version: Stage code version; bump it when the stage's output changes
+        inputs: Files the stage reads
+        params: Stage parameters that affect the output
+        output: File the stage writes
+        produce: Runs the stage
+    """
+    output = Path(output)
+    if cache is None:
+        produce()
+        return False
+    inputs = list(inputs)
+    key = cache.key(stage, version, inputs, params)
+    if cache.materialize(key, output):
+        return True
+    # The previous output may be a hardlink into the cache; never write through it
+    output.unlink(missing_ok=True)
+    produce()
+    if output.exists() and output.stat().st_size > 0:
+        cache.store(key, output)
+    return False
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Show or trim the artifact cache.")
+    parser.add_argument("cache_dir", type=Path)
+    parser.add_argument("--max-gb", type=float, default=None, help="Evict down to this size")
+    args = parser.parse_args()
+
+    cache = ArtifactCache(args.cache_dir, int(args.max_gb * 1024 ** 3) if args.max_gb is not None else DEFAULT_MAX_BYTES)
+    if args.max_gb is not None:
+        cache.evict()
+    print(f"{cache.size() / 1024 ** 2:.1f} MB in {args.cache_dir}")
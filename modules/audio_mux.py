@@ -0,0 +1,99 @@
+# audio_mux.py
+# Replace a video's audio track without touching its video: the video stream is copied
+# packet for packet, and the new audio is copied too when MP4 can carry it and it needs
+# no padding, otherwise encoded - attaching a voiceover never re-renders the video.
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+try:
+    import av
+except ImportError:
+    av = None
+
+from modules.ffmpeg_utils import run_ffmpeg
+from modules.media_probe import probe_media
+
+AUDIO_BITRATE = "192k"
+# Audio codecs stored in MP4 as they are
+MP4_AUDIO_CODECS = {"aac", "mp3", "alac", "ac3", "eac3", "opus"}
+# Audio this much shorter than the video is left as is rather than padded
+PAD_TOLERANCE = 0.1
+
+# How the output length follows the two tracks:
+#   video    - the video's length; longer audio is cut, shorter audio padded with silence
+#   shortest - the shorter track's length
+#   longest  - the longer track's length; shorter audio is padded, and past the end of a
+#              shorter video players hold its last frame
+LENGTH_MODES = ("video", "shortest", "longest")
+
+
+def _audio_info(path: Path) -> Tuple[Optional[str], float]:
+    """
+    (codec name, duration in seconds) of a file's first audio stream; (None, 0.0)
+    when it cannot be read without decoding.
+    """
+    if av is None:
+        return None, 0.0
+    try:
+        with av.open(str(path)) as container:
+            stream = container.streams.audio[0]
+            if stream.duration is not None:
+                duration = float(stream.duration * stream.time_base)
+            else:
+                duration = (container.duration or 0) / av.time_base
+            # canonical_name is the codec ("mp3"), name the decoder ("mp3float")
+            return stream.codec_context.codec.canonical_name, duration
+    except Exception as e:
+        print(f"Error reading audio stream of {path}: {e}")
+        return None, 0.0
+
+
+def replace_audio(video_path: Path, audio_path: Path, output_path: Path, length: str = "video") -> Path:
+    """
+    Mux audio_path as the only audio track of video_path, stream-copying the video.
+
+    Args:
+        video_path: Source video (its audio, if any, is dropped)
+        audio_path: New audio track (any format ffmpeg reads)
+        output_path: Destination MP4; must differ from both inputs
+        length: One of LENGTH_MODES
+    """
+    if length not in LENGTH_MODES:
+        raise ValueError(f"Unknown length mode {length!r}, expected one of {LENGTH_MODES}")
+    args = ["-i", str(video_path), "-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy"]
+    video_duration = probe_media(video_path).get("duration") or 0
+    codec, audio_duration = _audio_info(audio_path)
+    # Padding needs an encode; cutting a copied track happens on a packet boundary
+    # (a few tens of milliseconds)
+    needs_padding = length != "shortest" and audio_duration < video_duration - PAD_TOLERANCE
+    if codec in MP4_AUDIO_CODECS and audio_duration > 0 and not needs_padding:
+        args += ["-c:a", "copy"]
+    else:
+        if length != "shortest" and video_duration > 0:
+            args += ["-af", f"apad=whole_dur={video_duration:.3f}"]
+        args += ["-c:a", "aac", "-b:a", AUDIO_BITRATE]
+    # -shortest is not used with padding: apad never ends while the video is copied
+    if length == "shortest":
+        args += ["-shortest"]
+    elif length == "video" and video_duration > 0:
+        args += ["-t", f"{video_duration:.3f}"]
+    args += ["-movflags", "+faststart", str(output_path)]
+    run_ffmpeg(args)
+    return Path(output_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Replace a video's audio without re-encoding the video.")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("audio", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--length", choices=LENGTH_MODES, default="video")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    replace_audio(args.video, args.audio, args.output, args.length)
+    print(f"Muxed {args.output} in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,377 @@
+# audio_pacing.py
+# Beat- and speech-aware scene pacing. Streams a voiceover or music bed through ffmpeg
+# in fixed-size blocks, builds a spectral-flux onset envelope, estimates tempo and a
+# beat grid, reads sentence boundaries from the transcript, and places scene cuts on
+# those anchors within each style's min/max scene length.
+
+import hashlib
+import json
+import os
+import random
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from modules.ffmpeg_utils import FFMPEG_BINARY
+from modules.fingerprint import fingerprint_file
+
+ANALYSIS_SAMPLE_RATE = 22050
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+# Samples decoded per block (~3 s at 22.05 kHz); memory stays bounded by this plus
+# the onset envelope (one float per hop, ~100 KB for 10 minutes)
+BLOCK_SAMPLES = 65536
+
+MIN_BPM = 60.0
+MAX_BPM = 180.0
+
+# Anchor weights: cutting at the end of a sentence matters most, then strong onsets
+# and beats (scaled by onset strength and tempo confidence)
+SENTENCE_WEIGHT = 3.0
+ONSET_WEIGHT = 1.0
+BEAT_WEIGHT = 1.0
+
+# Resolution of the free cut positions used where no anchor is in reach
+PACING_GRID = 0.1
+
+# Penalty for a scene's distance from the middle of the style's range (per full range),
+# so dense onsets don't collapse every scene to the minimum length
+LENGTH_WEIGHT = 1.0
+
+# Transcript gaps at least this long also count as a sentence boundary
+SENTENCE_GAP_MS = 700
+
+# Bumped whenever the analysis output changes, invalidating cached results
+AUDIO_ANALYSIS_VERSION = 1
+
+
+def iter_audio_blocks(
+    audio_path: Path,
+    sample_rate: int = ANALYSIS_SAMPLE_RATE,
+    block_samples: int = BLOCK_SAMPLES
+) -> Iterator[np.ndarray]:
+    """
+    Decode any audio/video file to mono float32 PCM with ffmpeg and yield it in blocks.
+    """
+    cmd = [
+        FFMPEG_BINARY, "-v", "error", "-nostdin",
+        "-i", str(audio_path),
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "f32le", "pipe:1"
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    block_bytes = block_samples * 4
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % 4
+            yield np.frombuffer(data[:usable], dtype=np.float32)
+    finally:
+        process.stdout.close()
+        error = process.stderr.read().decode("utf-8", errors="ignore")
+        process.stderr.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"FFmpeg error while decoding {audio_path}: {error.strip()}")
+
+
+def onset_envelope(blocks, frame_size: int = FRAME_SIZE, hop_size: int = HOP_SIZE) -> Tuple[np.ndarray, int]:
+    """
+    Spectral-flux onset strength: the summed positive change of the log-magnitude
+    spectrum between consecutive STFT frames, computed block by block.
+
+    Returns:
+        (envelope, total_samples): one value per hop, and the number of samples read
+    """
+    window = np.hanning(frame_size).astype(np.float32)
+    carry = np.zeros(0, dtype=np.float32)
+    previous = None
+    envelope = []
+    total_samples = 0
+
+    for block in blocks:
+        total_samples += len(block)
+        data = np.concatenate([carry, block]) if len(carry) else block
+        if len(data) < frame_size:
+            carry = data
+            continue
+        frame_count = 1 + (len(data) - frame_size) // hop_size
+        frames = np.lib.stride_tricks.sliding_window_view(data, frame_size)[::hop_size][:frame_count]
+        spectrum = np.log1p(100.0 * np.abs(np.fft.rfft(frames * window, axis=1))).astype(np.float32)
+        if previous is None:
+            previous = spectrum[:1]
+        flux = np.maximum(np.diff(np.concatenate([previous, spectrum]), axis=0), 0.0).sum(axis=1)
+        envelope.append(flux)
+        previous = spectrum[-1:]
+        carry = data[frame_count * hop_size:]
+
+    if not envelope:
+        return np.zeros(0, dtype=np.float32), total_samples
+    return np.concatenate(envelope).astype(np.float32), total_samples
+
+
+def estimate_tempo(envelope: np.ndarray, frame_rate: float, min_bpm: float = MIN_BPM, max_bpm: float = MAX_BPM) -> Tuple[float, float]:
+    """
+    Tempo from the autocorrelation of the onset envelope, with a mild preference for
+    tempos near 120 BPM to avoid octave errors.
+
+    Returns:
+        (bpm, confidence): confidence is the normalized autocorrelation at the chosen
+        lag (0 = no periodicity, 1 = perfectly periodic); bpm is 0 if undetermined.
+    """
+    if len(envelope) < 4:
+        return 0.0, 0.0
+    centered = envelope - envelope.mean()
+    size = 1 << int(np.ceil(np.log2(2 * len(centered))))
+    spectrum = np.fft.rfft(centered, size)
+    autocorr = np.fft.irfft(spectrum * np.conj(spectrum), size)[:len(centered)]
+    if autocorr[0] <= 0:
+        return 0.0, 0.0
+    autocorr /= autocorr[0]
+
+    min_lag = max(1, int(np.floor(60.0 * frame_rate / max_bpm)))
+    max_lag = min(len(autocorr) - 2, int(np.ceil(60.0 * frame_rate / min_bpm)))
+    if max_lag <= min_lag:
+        return 0.0, 0.0
+    lags = np.arange(min_lag, max_lag + 1)
+    bpms = 60.0 * frame_rate / lags
+    prior = np.exp(-0.5 * (np.log2(bpms / 120.0)) ** 2)
+    best = lags[np.argmax(autocorr[lags] * prior)]
+
+    # Parabolic interpolation around the peak for a sub-frame lag
+    left, center, right = autocorr[best - 1], autocorr[best], autocorr[best + 1]
+    denominator = left - 2 * center + right
+    offset = 0.5 * (left - right) / denominator if denominator else 0.0
+    lag = best + float(np.clip(offset, -0.5, 0.5))
+    return float(60.0 * frame_rate / lag), float(max(0.0, center))
+
+
+def beat_grid(envelope: np.ndarray, frame_rate: float, bpm: float) -> np.ndarray:
+    """
+    Beat times (seconds) for a constant tempo, phase-aligned to where the onset
+    envelope is strongest.
+    """
+    if bpm <= 0 or len(envelope) == 0:
+        return np.zeros(0)
+    period = 60.0 * frame_rate / bpm
+    best_phase, best_score = 0, -1.0
+    for phase in range(max(1, int(period))):
+        positions = np.round(np.arange(phase, len(envelope), period)).astype(np.int64)
+        positions = positions[positions < len(envelope)]
+        score = float(envelope[positions].mean()) if len(positions) else 0.0
+        if score > best_score:
+            best_phase, best_score = phase, score
+    return np.arange(best_phase, len(envelope), period) / frame_rate
+
+
+def pick_onsets(envelope: np.ndarray, frame_rate: float, min_gap: float = 0.1, delta: float = 0.5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Peak-pick the onset envelope against a moving-average threshold.
+
+    Returns:
+        (times, strengths): onset times in seconds and strengths normalized to 0-1
+    """
+    if len(envelope) < 3:
+        return np.zeros(0), np.zeros(0)
+    width = max(3, int(frame_rate * 0.5) | 1)
+    local_mean = np.convolve(envelope, np.ones(width) / width, mode="same")
+    threshold = local_mean + delta * envelope.std()
+    peaks = np.flatnonzero(
+        (envelope[1:-1] > envelope[:-2]) & (envelope[1:-1] >= envelope[2:]) & (envelope[1:-1] > threshold[1:-1])
+    ) + 1
+
+    # Enforce a minimum gap, keeping the stronger peak
+    gap = max(1, int(min_gap * frame_rate))
+    suppressed = np.zeros(len(envelope), dtype=bool)
+    kept = []
+    for peak in peaks[np.argsort(envelope[peaks], kind="stable")[::-1]]:
+        if not suppressed[peak]:
+            kept.append(peak)
+            suppressed[max(0, peak - gap + 1):peak + gap] = True
+    kept = np.sort(np.array(kept, dtype=np.int64))
+    if len(kept) == 0:
+        return np.zeros(0), np.zeros(0)
+    strengths = envelope[kept] / envelope[kept].max()
+    return kept / frame_rate, strengths
+
+
+def sentence_boundaries(transcript: Sequence[Dict[str, Any]], gap_ms: int = SENTENCE_GAP_MS) -> List[float]:
+    """
+    Times (seconds) where a sentence ends, from the token-level transcript format
+    written by sub.py ({"text", "timestampMs", "endMs", ...}). A token ending in . ! ?
+    or a pause of at least gap_ms before the next token marks a boundary.
+    """
+    tokens = sorted(transcript, key=lambda t: t.get("timestampMs", 0))
+    boundaries = []
+    for i, token in enumerate(tokens):
+        end_ms = token.get("timestampMs", 0) + max(0, token.get("endMs", 0) - token.get("startMs", 0))
+        text = str(token.get("text", "")).strip()
+        next_start = tokens[i + 1].get("timestampMs", 0) if i + 1 < len(tokens) else None
+        if text.endswith((".", "!", "?")) or (next_start is not None and next_start - end_ms >= gap_ms):
+            boundaries.append(end_ms / 1000.0)
+    return boundaries
+
+
+def analyze_audio(audio_path: Path, cache_dir: Optional[Path] = None, fingerprint_mode: str = "sampled") -> Dict[str, Any]:
+    """
+    Onset, tempo and beat analysis of an audio (or video) file, streamed in blocks.
+
+    Results are cached as JSON in cache_dir, keyed by the file's fingerprint in
+    fingerprint_mode (see fingerprint.FINGERPRINT_MODES), so re-planning against the
+    same voiceover skips decoding entirely.
+
+    Returns:
+        Dictionary with duration, tempo, tempo_confidence, beats, onsets and
+        onset_strengths (times in seconds)
+    """
+    audio_path = Path(audio_path)
+    cache_file = None
+    if cache_dir is not None:
+        fingerprint = fingerprint_file(audio_path, fingerprint_mode)
+        key = hashlib.sha256(
+            f"{fingerprint}:{AUDIO_ANALYSIS_VERSION}:{ANALYSIS_SAMPLE_RATE}:{FRAME_SIZE}:{HOP_SIZE}".encode("utf-8")
+        ).hexdigest()
+        cache_file = Path(cache_dir) / f"{key}.json"
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    frame_rate = ANALYSIS_SAMPLE_RATE / HOP_SIZE
+    envelope, total_samples = onset_envelope(iter_audio_blocks(audio_path))
+    tempo, confidence = estimate_tempo(envelope, frame_rate)
+    beats = beat_grid(envelope, frame_rate, tempo)
+    onsets, strengths = pick_onsets(envelope, frame_rate)
+    result = {
+        "duration": total_samples / ANALYSIS_SAMPLE_RATE,
+        "tempo": round(tempo, 2),
+        "tempo_confidence": round(confidence, 3),
+        "beats": [round(float(t), 3) for t in beats],
+        "onsets": [round(float(t), 3) for t in onsets],
+        "onset_strengths": [round(float(s), 3) for s in strengths],
+    }
+
+    if cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(result, f)
+            os.replace(tmp_file, cache_file)
+        except OSError as e:
+            print(f"Error caching audio analysis: {e}")
+    return result
+
+
+def pacing_anchors(
+    analysis: Optional[Dict[str, Any]] = None,
+    transcript: Optional[Sequence[Dict[str, Any]]] = None
+) -> List[Tuple[float, float]]:
+    """
+    Combine audio analysis and transcript into weighted cut candidates [(time, weight)].
+    """
+    anchors = []
+    if analysis:
+        anchors.extend(
+            (t, ONSET_WEIGHT * s) for t, s in zip(analysis.get("onsets", []), analysis.get("onset_strengths", []))
+        )
+        confidence = analysis.get("tempo_confidence", 0.0)
+        anchors.extend((t, BEAT_WEIGHT * confidence) for t in analysis.get("beats", []))
+    if transcript:
+        anchors.extend((t, SENTENCE_WEIGHT) for t in sentence_boundaries(transcript))
+    return sorted(anchors)
+
+
+def align_scene_durations(
+    total_duration: float,
+    min_duration: float,
+    max_duration: float,
+    anchors: Sequence[Tuple[float, float]],
+    rng: Optional[random.Random] = None,
+    grid: float = PACING_GRID
+) -> List[float]:
+    """
+    Split total_duration into scenes of min_duration..max_duration whose cuts land on
+    the highest-weighted anchors.
+
+    Cut positions are the anchors plus a fine grid of zero-weight fallback positions;
+    a dynamic program over them picks the chain from 0 to total_duration with the
+    largest total anchor weight (less a penalty for straying from the middle of the
+    range), so every scene respects the style's limits. A small random jitter (from
+    rng) varies the choice between equally good plans. Returns [] when no chain of
+    scenes within the limits adds up to total_duration.
+    """
+    rng = rng or random
+    if total_duration <= min_duration:
+        return [total_duration] if total_duration > 0 else []
+
+    # Merge anchors and grid points into one sorted candidate list (best weight wins)
+    weights: Dict[float, float] = {}
+    for anchor_time, weight in anchors:
+        if 0 < anchor_time < total_duration:
+            key = round(anchor_time, 3)
+            weights[key] = max(weights.get(key, 0.0), weight)
+    for grid_time in np.arange(grid, total_duration, grid):
+        weights.setdefault(round(float(grid_time), 3), 0.0)
+    times = np.array([0.0] + sorted(weights) + [float(total_duration)])
+    gains = np.array([0.0] + [weights[t] for t in sorted(weights)] + [0.0])
+    gains += np.array([rng.random() * 1e-3 for _ in range(len(gains))])
+
+    target = 0.5 * (min_duration + max_duration)
+    spread = max(max_duration - min_duration, 1e-6)
+    score = np.full(len(times), -np.inf)
+    previous = np.full(len(times), -1, dtype=np.int64)
+    score[0] = 0.0
+    for j in range(1, len(times)):
+        lo = np.searchsorted(times, times[j] - max_duration - 1e-9, side="left")
+        hi = np.searchsorted(times, times[j] - min_duration + 1e-9, side="right")
+        if hi <= lo:
+            continue
+        lengths = times[j] - times[lo:hi]
+        window = score[lo:hi] - LENGTH_WEIGHT * np.abs(lengths - target) / spread
+        best = int(np.argmax(window))
+        if window[best] == -np.inf:
+            continue
+        score[j] = window[best] + gains[j]
+        previous[j] = lo + best
+
+    if score[-1] == -np.inf:
+        return []
+    cuts = [len(times) - 1]
+    while cuts[-1] > 0:
+        cuts.append(previous[cuts[-1]])
+    cuts.reverse()
+    return [float(times[b] - times[a]) for a, b in zip(cuts, cuts[1:])]
+
+
+if __name__ == "__main__":
+    import argparse
+    import resource
+    import time
+
+    parser = argparse.ArgumentParser(description="Analyze onsets, tempo and beats of an audio file.")
+    parser.add_argument("audio", type=Path)
+    parser.add_argument("--transcript", type=Path, default=None, help="Token-level transcript JSON")
+    parser.add_argument("--style", default="dynamic")
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    analysis = analyze_audio(args.audio, args.cache_dir)
+    elapsed = time.perf_counter() - started
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{analysis['duration']:.1f}s of audio in {elapsed:.2f}s, peak RSS {peak_mb:.0f} MB")
+    print(f"Tempo {analysis['tempo']} BPM (confidence {analysis['tempo_confidence']}), "
+          f"{len(analysis['beats'])} beats, {len(analysis['onsets'])} onsets")
+
+    from modules.broll_suggester import calculate_scene_pacing
+
+    transcript = json.loads(args.transcript.read_text()) if args.transcript else None
+    durations = calculate_scene_pacing(
+        min(analysis["duration"], 60.0), args.style, anchors=pacing_anchors(analysis, transcript)
+    )
+    print("Scene durations:", [round(d, 2) for d in durations])
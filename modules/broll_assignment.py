@@ -0,0 +1,227 @@
+# broll_assignment.py
+# Scene-to-media assignment for B-roll plans. Every (scene, media) pair is scored once
+# in a vectorized cost matrix and the whole plan is solved at once, instead of letting
+# early scenes grab the best clips greedily.
+
+import random
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+from modules.broll_index import SCENE_PREFERRED_TAGS, MediaSelectionIndex
+
+ASSIGNMENT_STRATEGIES = ("random", "optimal", "greedy")
+
+# Cost weights; a perfect match costs 0
+TAG_WEIGHT = 1.0
+DURATION_WEIGHT = 1.0
+ORIENTATION_WEIGHT = 0.5
+RECENCY_WEIGHT = 0.5
+# Small random tie-breaker so equally good libraries don't always yield the same plan
+JITTER = 0.01
+
+# Above this many pruned cells the exact solver is skipped for the greedy one
+OPTIMAL_MAX_CELLS = 4_000_000
+
+
+def build_cost_matrix(
+    index: MediaSelectionIndex,
+    scene_types: Sequence[str],
+    scene_durations: Sequence[float],
+    orientation: Optional[str] = None,
+    recent_usage: Optional[Dict[str, int]] = None,
+    rng: Optional[random.Random] = None
+) -> np.ndarray:
+    """
+    Score every (scene, media) pair. Returns a float32 (scenes x media) matrix where
+    lower is better.
+
+    Args:
+        index: Selection index over the (duplicate-collapsed) library
+        scene_types: Scene type per scene (intro, action, detail, ...)
+        scene_durations: Scene length in seconds per scene
+        orientation: "portrait" or "landscape" to penalize the other orientation
+        recent_usage: {path: times used recently}, e.g. by earlier variants; the
+            recency penalty only applies to paths listed here
+        rng: Random source for the tie-breaking jitter
+    """
+    rng = rng or random
+    num_scenes = len(scene_types)
+    durations = np.asarray(scene_durations, dtype=np.float32)[:, np.newaxis]
+
+    # Tag match: 0 when the clip has one of the scene type's preferred tags
+    cost = np.zeros((num_scenes, index.size), dtype=np.float32)
+    for scene_type in set(scene_types):
+        rows = [i for i, t in enumerate(scene_types) if t == scene_type]
+        if scene_type == "transition":
+            match = index.is_image | index.tag_mask(SCENE_PREFERRED_TAGS["transition"])
+        elif scene_type in SCENE_PREFERRED_TAGS:
+            match = index.tag_mask(SCENE_PREFERRED_TAGS[scene_type])
+        else:
+            continue
+        cost[rows] += TAG_WEIGHT * (~match).astype(np.float32)
+    if "action" in scene_types:
+        rows = [i for i, t in enumerate(scene_types) if t == "action"]
+        cost[rows] += 0.5 * TAG_WEIGHT * index.is_image.astype(np.float32)
+
+    # Duration fit: short scenes want stills or clips up to twice their length, longer
+    # scenes want videos covering at least 70% of the scene; the penalty grows with
+    # the relative shortfall or excess.
+    media_durations = np.nan_to_num(index.durations, nan=0.0).astype(np.float32)[np.newaxis, :]
+    is_image = index.is_image[np.newaxis, :]
+    is_video = index.is_video[np.newaxis, :]
+    short_scene = durations < 2.0
+    too_long = np.clip((media_durations - 2.0 * durations) / (2.0 * durations), 0.0, 1.0)
+    too_short = np.clip((0.7 * durations - media_durations) / (0.7 * durations), 0.0, 1.0)
+    duration_cost = np.where(
+        short_scene,
+        np.where(is_image, 0.0, np.where(media_durations > 0, too_long, 1.0)),
+        np.where(is_video & (media_durations > 0), too_short, 1.0),
+    )
+    cost += DURATION_WEIGHT * duration_cost.astype(np.float32)
+
+    if orientation in ("portrait", "landscape"):
+        other = "landscape" if orientation == "portrait" else "portrait"
+        cost += ORIENTATION_WEIGHT * index.tag_mask([other]).astype(np.float32)[np.newaxis, :]
+
+    if recent_usage:
+        usage = np.array([recent_usage.get(path, 0) for path in index.paths], dtype=np.float32)
+        cost += RECENCY_WEIGHT * (1.0 - 1.0 / (1.0 + usage))[np.newaxis, :]
+
+    if JITTER:
+        noise = np.random.default_rng(rng.getrandbits(32)).random(cost.shape, dtype=np.float32)
+        cost += JITTER * noise
+    return cost
+
+
+def _candidate_columns(cost: np.ndarray) -> np.ndarray:
+    """
+    Columns that can appear in an optimal assignment: each row's `rows` cheapest.
+    At most rows - 1 other rows can take those, so swapping in a free one never
+    costs more - pruning to this union keeps the assignment optimal.
+    """
+    rows, cols = cost.shape
+    if cols <= rows:
+        return np.arange(cols)
+    top = np.argpartition(cost, rows - 1, axis=1)[:, :rows]
+    return np.unique(top)
+
+
+def _solve_greedy(cost: np.ndarray) -> np.ndarray:
+    """
+    Scenes with the best available match pick first; each takes its cheapest media
+    that no earlier scene took.
+    """
+    rows, cols = cost.shape
+    assignment = np.full(rows, -1, dtype=np.int64)
+    # A row never needs more than `rows` of its cheapest columns
+    keep = min(rows, cols)
+    top = np.argpartition(cost, keep - 1, axis=1)[:, :keep] if keep < cols else np.tile(np.arange(cols), (rows, 1))
+    order = np.take_along_axis(cost, top, axis=1).argsort(axis=1, kind="stable")
+    ranked = np.take_along_axis(top, order, axis=1)
+    taken = np.zeros(cols, dtype=bool)
+    for row in np.argsort(cost.min(axis=1), kind="stable"):
+        for col in ranked[row]:
+            if not taken[col]:
+                assignment[row] = col
+                taken[col] = True
+                break
+    return assignment
+
+
+def solve_assignment(cost: np.ndarray, strategy: str = "optimal") -> np.ndarray:
+    """
+    Assign one distinct column (media) to each row (scene) minimizing the total cost.
+
+    Rows beyond the number of columns reuse media: the matrix is solved in rounds of
+    at most `columns` scenes, as the random selection resets once everything is used.
+    Uses scipy's linear_sum_assignment on the pruned candidate columns, or the greedy
+    solver when scipy is unavailable, the problem is huge, or strategy == "greedy".
+    """
+    rows, cols = cost.shape
+    if cols == 0:
+        return np.full(rows, -1, dtype=np.int64)
+    assignment = np.empty(rows, dtype=np.int64)
+    for start in range(0, rows, cols):
+        block = cost[start:start + cols]
+        candidates = _candidate_columns(block)
+        pruned = block[:, candidates]
+        if strategy == "optimal" and linear_sum_assignment is not None and pruned.size <= OPTIMAL_MAX_CELLS:
+            row_ind, col_ind = linear_sum_assignment(pruned)
+            chosen = np.empty(len(block), dtype=np.int64)
+            chosen[row_ind] = col_ind
+        else:
+            chosen = _solve_greedy(pruned)
+        assignment[start:start + len(block)] = candidates[chosen]
+    return assignment
+
+
+def assign_media(
+    index: MediaSelectionIndex,
+    scene_types: Sequence[str],
+    scene_durations: Sequence[float],
+    strategy: str = "optimal",
+    orientation: Optional[str] = None,
+    recent_usage: Optional[Dict[str, int]] = None,
+    rng: Optional[random.Random] = None
+) -> List[List[str]]:
+    """
+    Pick media for every scene at once. Returns one [path] list per scene (empty if
+    the library is empty), in the same shape select_media_for_scene produces.
+
+    Media is steered away from recently used paths only when the caller passes
+    recent_usage ({path: uses}); suggest_broll takes it as an argument and
+    suggest_broll_variants fills it from the variants planned so far.
+    """
+    if index.size == 0:
+        return [[] for _ in scene_types]
+    cost = build_cost_matrix(index, scene_types, scene_durations, orientation, recent_usage, rng)
+    assignment = solve_assignment(cost, strategy)
+    return [[index.paths[col]] if col >= 0 else [] for col in assignment]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from pathlib import Path
+
+    from modules.media_analyzer import MediaItem
+
+    parser = argparse.ArgumentParser(description="Benchmark scene-to-media assignment.")
+    parser.add_argument("--scenes", type=int, default=100)
+    parser.add_argument("--assets", type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tag_pool = ["landscape", "portrait", "short-clip", "medium-clip", "long-clip", "high-fps",
+                "energetic", "detail", "establishing"]
+    library = [
+        MediaItem(
+            file_path=Path(f"/library/asset_{i:06d}.mp4"),
+            file_type="video" if rng.random() < 0.7 else "image",
+            duration=round(rng.uniform(1, 60), 2),
+            description="",
+            suggested_usage="",
+            tags=rng.sample(tag_pool, 3),
+        )
+        for i in range(args.assets)
+    ]
+    index = MediaSelectionIndex(library, duplicate_clusters=[])
+    scene_types = [rng.choice(["intro", "action", "detail", "transition", "general"]) for _ in range(args.scenes)]
+    scene_durations = [rng.uniform(0.8, 6.0) for _ in range(args.scenes)]
+
+    started = time.perf_counter()
+    cost = build_cost_matrix(index, scene_types, scene_durations, rng=rng)
+    built = time.perf_counter() - started
+    print(f"Cost matrix {cost.shape[0]}x{cost.shape[1]} in {built * 1000:.1f} ms")
+    for strategy in ("optimal", "greedy"):
+        started = time.perf_counter()
+        assignment = solve_assignment(cost, strategy)
+        elapsed = time.perf_counter() - started
+        total = float(cost[np.arange(len(assignment)), assignment].sum())
+        print(f"{strategy:>8}: total cost {total:.3f} in {elapsed * 1000:.1f} ms")
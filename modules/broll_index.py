@@ -0,0 +1,152 @@
+# broll_index.py
+# Prebuilt selection index over analyzed media for B-roll planning: tag -> boolean
+# masks, file-type partitions and duration-sorted arrays, so each scene is picked with
+# a few vectorized mask operations instead of list comprehensions over the library.
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from modules.perceptual_hash import collapse_duplicates
+
+# Tags that make an item a good fit for each scene type, shared by the scene-by-scene
+# selection (broll_suggester) and the assignment cost matrix (broll_assignment).
+# Transition scenes also take any still image.
+SCENE_PREFERRED_TAGS = {
+    "intro": ["landscape", "establishing", "product-focused"],
+    "action": ["short-clip", "high-fps", "energetic"],
+    "detail": ["portrait", "product-focused", "detail"],
+    "transition": ["short-clip"],
+}
+
+
+class MediaSelectionIndex:
+    """
+    Read-only index over a media library. Build it once per library and reuse it for
+    every scene and every plan; per-plan state (which items were used) lives in a
+    boolean mask from new_used_mask().
+
+    Args:
+        analyzed_media: MediaItem objects (anything with file_path, file_type, tags
+            and duration works)
+        duplicate_clusters: Near-duplicate path groups; each is reduced to one item.
+            Computed from the perceptual hashes when omitted.
+    """
+
+    def __init__(self, analyzed_media, duplicate_clusters: Optional[List[List[str]]] = None):
+        self.items = collapse_duplicates(list(analyzed_media), duplicate_clusters)
+        self.paths = [str(item.file_path) for item in self.items]
+        self._positions = {path: i for i, path in enumerate(self.paths)}
+        self.size = len(self.items)
+
+        # Tag -> positions, materialized as masks on first use
+        positions: Dict[str, List[int]] = {}
+        for i, item in enumerate(self.items):
+            for tag in set(item.tags):
+                positions.setdefault(tag, []).append(i)
+        self._tag_positions = {tag: np.array(ids, dtype=np.int64) for tag, ids in positions.items()}
+        self._tag_masks: Dict[str, np.ndarray] = {}
+
+        file_types = np.array([item.file_type for item in self.items], dtype=object)
+        self.is_image = file_types == "image"
+        self.is_video = file_types == "video"
+
+        # NaN for items without a usable duration, which the original selection treated
+        # as "no duration" (None or 0)
+        durations = np.array([item.duration or np.nan for item in self.items], dtype=np.float64)
+        self.durations = durations
+        self._duration_order = np.argsort(durations, kind="stable")
+        valid = int(np.count_nonzero(~np.isnan(durations)))
+        self._duration_order = self._duration_order[:valid]
+        self._sorted_durations = durations[self._duration_order]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def new_used_mask(self) -> np.ndarray:
+        return np.zeros(self.size, dtype=bool)
+
+    def tag_mask(self, tags: Iterable[str]) -> np.ndarray:
+        """
+        Mask of items carrying any of the given tags.
+        """
+        mask = np.zeros(self.size, dtype=bool)
+        for tag in tags:
+            tag_mask = self._tag_masks.get(tag)
+            if tag_mask is None:
+                tag_mask = np.zeros(self.size, dtype=bool)
+                ids = self._tag_positions.get(tag)
+                if ids is not None:
+                    tag_mask[ids] = True
+                self._tag_masks[tag] = tag_mask
+            mask |= tag_mask
+        return mask
+
+    def duration_mask(self, min_duration: float = -np.inf, max_duration: float = np.inf) -> np.ndarray:
+        """
+        Mask of items whose duration lies in [min_duration, max_duration], found by
+        bisecting the sorted duration array.
+        """
+        start = np.searchsorted(self._sorted_durations, min_duration, side="left")
+        stop = np.searchsorted(self._sorted_durations, max_duration, side="right")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self._duration_order[start:stop]] = True
+        return mask
+
+    def path_mask(self, paths: Iterable[str]) -> np.ndarray:
+        """
+        Mask of the given paths (paths not in the index are ignored).
+        """
+        mask = np.zeros(self.size, dtype=bool)
+        ids = [self._positions[path] for path in paths if path in self._positions]
+        if ids:
+            mask[ids] = True
+        return mask
+
+    def positions(self, mask: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(mask)
+
+
+if __name__ == "__main__":
+    import argparse
+    import random
+    import time
+    from pathlib import Path
+
+    from modules.broll_suggester import suggest_broll
+    from modules.media_analyzer import MediaItem
+
+    parser = argparse.ArgumentParser(description="Benchmark B-roll planning against a synthetic library.")
+    parser.add_argument("--assets", type=int, default=50000)
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    tag_pool = ["landscape", "portrait", "short-clip", "medium-clip", "long-clip", "high-fps",
+                "energetic", "detail", "establishing", "brightness:dark", "brightness:bright"]
+    library = []
+    for i in range(args.assets):
+        is_video = rng.random() < 0.7
+        library.append(MediaItem(
+            file_path=Path(f"/library/asset_{i:06d}.{'mp4' if is_video else 'jpg'}"),
+            file_type="video" if is_video else "image",
+            duration=round(rng.uniform(1, 60), 2) if is_video else None,
+            description="",
+            suggested_usage="",
+            tags=rng.sample(tag_pool, 3),
+        ))
+
+    started = time.perf_counter()
+    index = MediaSelectionIndex(library, duplicate_clusters=[])
+    build = time.perf_counter() - started
+
+    timings = []
+    for run in range(args.runs):
+        started = time.perf_counter()
+        scenes = suggest_broll(library, "product demo", args.duration, selection_index=index)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    print(f"Index over {len(index)} assets built in {build * 1000:.1f} ms")
+    print(f"Planned {len(scenes)} scenes for {args.duration:.0f}s: "
+          f"median {timings[len(timings) // 2] * 1000:.2f} ms, best {timings[0] * 1000:.2f} ms")
@@ -4,8 +4,13 @@
 import json
 import random
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
+import numpy as np
+from modules.broll_index import SCENE_PREFERRED_TAGS, MediaSelectionIndex
+from modules.broll_assignment import ASSIGNMENT_STRATEGIES, assign_media
+from modules.plan_cache import PlanCache, media_version, plan_key
+from modules.audio_pacing import align_scene_durations, pacing_anchors
 
 class BrollScene(BaseModel):
     scene_number: int
@@ -14,32 +19,44 @@ class BrollScene(BaseModel):
     media_files: List[str]  # List of media file paths
     transition: str  # Type of transition (cut, fade, dissolve, etc.)
 
-def calculate_scene_pacing(total_duration: float, style: str = "dynamic") -> List[float]:
+# Scene length range (seconds) per pacing style
+PACING_STYLES = {
+    "dynamic": (1.5, 4.0),    # Fast-paced, many quick cuts
+    "calm": (3.0, 8.0),       # Slower pacing, longer scenes
+    "energetic": (0.8, 3.0),  # Very fast cuts
+    "emotional": (2.0, 6.0),
+}
+DEFAULT_PACING = (2.0, 6.0)  # emotional or standard
+
+def calculate_scene_pacing(
+    total_duration: float,
+    style: str = "dynamic",
+    rng: Optional[random.Random] = None,
+    anchors: Optional[List[Tuple[float, float]]] = None
+) -> List[float]:
     """
     Calculate scene durations based on pacing style.
+
+    With anchors ([(time, weight)] from audio_pacing.pacing_anchors: beats, onsets and
+    sentence ends) cuts are placed on them within the style's min/max scene length;
+    without, or when no such split exists, durations are drawn at random from that
+    range.
     """
-    if style == "dynamic":
-        # Fast-paced, many quick cuts
-        min_duration = 1.5
-        max_duration = 4.0
-    elif style == "calm":
-        # Slower pacing, longer scenes
-        min_duration = 3.0
-        max_duration = 8.0
-    elif style == "energetic":
-        # Very fast cuts
-        min_duration = 0.8
-        max_duration = 3.0
-    else:  # emotional or standard
-        min_duration = 2.0
-        max_duration = 6.0
+    rng = rng or random
+    min_duration, max_duration = PACING_STYLES.get(style, DEFAULT_PACING)
+
+    if anchors:
+        durations = align_scene_durations(total_duration, min_duration, max_duration, anchors, rng)
+        if durations:
+            return durations
+        print(f"No {style} scene pacing fits {total_duration:.2f}s on the anchors; using unaligned durations")
     
     scenes = []
     current_time = 0.0
     
     while current_time < total_duration:
         # Use random duration within range, with variation
-        duration = random.uniform(min_duration, max_duration)
+        duration = rng.uniform(min_duration, max_duration)
         
         # Ensure we don't exceed total duration
         if current_time + duration > total_duration:
@@ -55,72 +72,80 @@ def select_media_for_scene(
     analyzed_media,
     scene_type: str,
     scene_duration: float,
-    used_media: set
+    used_media: set,
+    rng: Optional[random.Random] = None,
+    selection_index: Optional[MediaSelectionIndex] = None
 ) -> List[str]:
     """
     Select appropriate media files for a scene based on type and requirements.
+
+    List-based entry point over select_media_from_index, which applies the rules.
+    used_media is updated in place. Callers selecting for several scenes should
+    build the index once and pass it as selection_index; otherwise analyzed_media is
+    indexed as is (no duplicate collapsing) on every call.
     """
-    selected = []
-    
+    index = selection_index
+    if index is None:
+        index = MediaSelectionIndex(analyzed_media, duplicate_clusters=[])
+    used_mask = index.path_mask(used_media)
+    selected = select_media_from_index(index, scene_type, scene_duration, used_mask, rng)
+    used_media.update(selected)
+    return selected
+
+def select_media_from_index(
+    index: MediaSelectionIndex,
+    scene_type: str,
+    scene_duration: float,
+    used_mask: np.ndarray,
+    rng: Optional[random.Random] = None
+) -> List[str]:
+    """
+    Select media for a scene of the given type and duration from a prebuilt
+    MediaSelectionIndex, preferring unused items. used_mask is updated in place.
+    """
+    rng = rng or random
+    if index.size == 0:
+        return []
+
     # Filter out already used media for variety
-    available_media = [m for m in analyzed_media if str(m.file_path) not in used_media]
-    if not available_media:
-        available_media = analyzed_media  # Reset if we've used everything
-    
-    # Scene type specific selection
+    available = ~used_mask
+    if not available.any():
+        available = np.ones(index.size, dtype=bool)  # Reset if we've used everything
+
     if scene_type == "intro":
-        # Prefer establishing shots, landscapes, or branded content
-        candidates = [m for m in available_media if 
-                     any(tag in m.tags for tag in ["landscape", "establishing", "product-focused"])]
-        if not candidates:
-            candidates = available_media
-    
+        candidates = available & index.tag_mask(SCENE_PREFERRED_TAGS["intro"])
+        if not candidates.any():
+            candidates = available
     elif scene_type == "action":
-        # Prefer dynamic content, short clips
-        candidates = [m for m in available_media if 
-                     any(tag in m.tags for tag in ["short-clip", "high-fps", "energetic"])]
-        if not candidates:
-            candidates = [m for m in available_media if m.file_type == "video"]
-    
+        candidates = available & index.tag_mask(SCENE_PREFERRED_TAGS["action"])
+        if not candidates.any():
+            candidates = available & index.is_video
     elif scene_type == "detail":
-        # Prefer close-ups, product shots, portrait orientation
-        candidates = [m for m in available_media if 
-                     any(tag in m.tags for tag in ["portrait", "product-focused", "detail"])]
-        if not candidates:
-            candidates = available_media
-    
+        candidates = available & index.tag_mask(SCENE_PREFERRED_TAGS["detail"])
+        if not candidates.any():
+            candidates = available
     elif scene_type == "transition":
-        # Prefer images or very short clips
-        candidates = [m for m in available_media if 
-                     m.file_type == "image" or "short-clip" in m.tags]
-        if not candidates:
-            candidates = available_media
-    
+        candidates = available & (index.is_image | index.tag_mask(SCENE_PREFERRED_TAGS["transition"]))
+        if not candidates.any():
+            candidates = available
     else:  # general
-        candidates = available_media
-    
+        candidates = available
+
     # Select based on duration requirements
     if scene_duration < 2.0:
-        # For very short scenes, prefer images or short clips
-        final_candidates = [m for m in candidates if 
-                           m.file_type == "image" or 
-                           (m.duration and m.duration <= scene_duration * 2)]
+        final_candidates = candidates & (index.is_image | index.duration_mask(max_duration=scene_duration * 2))
     else:
-        # For longer scenes, prefer videos with sufficient duration
-        final_candidates = [m for m in candidates if 
-                           m.file_type == "video" and 
-                           m.duration and m.duration >= scene_duration * 0.7]
-    
-    if not final_candidates:
-        final_candidates = candidates
-    
-    # Select the best candidate
-    if final_candidates:
-        selected_media = random.choice(final_candidates)
-        selected.append(str(selected_media.file_path))
-        used_media.add(str(selected_media.file_path))
-    
-    return selected
+        final_candidates = candidates & index.is_video & index.duration_mask(min_duration=scene_duration * 0.7)
+
+    positions = index.positions(final_candidates)
+    if len(positions) == 0:
+        positions = index.positions(candidates)
+    if len(positions) == 0:
+        return []
+
+    chosen = positions[rng.randrange(len(positions))]
+    used_mask[chosen] = True
+    return [index.paths[chosen]]
 
 def determine_scene_types(num_scenes: int, context: str) -> List[str]:
     """
@@ -166,10 +191,11 @@ def determine_scene_types(num_scenes: int, context: str) -> List[str]:
     
     return scene_types
 
-def select_transition(scene_index: int, total_scenes: int, style: str) -> str:
+def select_transition(scene_index: int, total_scenes: int, style: str, rng: Optional[random.Random] = None) -> str:
     """
     Select appropriate transition based on position and style.
     """
+    rng = rng or random
     if scene_index == 0:
         return "fade_in"
     elif scene_index == total_scenes - 1:
@@ -184,50 +210,61 @@ def select_transition(scene_index: int, total_scenes: int, style: str) -> str:
     else:
         transitions = ["cut", "fade", "dissolve"]
     
-    return random.choice(transitions)
+    return rng.choice(transitions)
 
-def suggest_broll(
-    analyzed_media,
+def _plan_scenes(
+    selection_index: MediaSelectionIndex,
     context: str,
-    target_duration: float = 30.0,
-    style: str = "dynamic"
+    target_duration: float,
+    style: str,
+    strategy: str,
+    orientation: Optional[str],
+    rng: random.Random,
+    recent_usage: Optional[Dict[str, int]] = None,
+    scene_type_cache: Optional[Dict[int, List[str]]] = None,
+    anchors: Optional[List[Tuple[float, float]]] = None
 ) -> List[Dict[str, Any]]:
     """
-    Suggests B-roll scenes based on analyzed media and context.
-    
-    Args:
-        analyzed_media: List of MediaItem objects from media analysis
-        context: Marketing or creative context for the video
-        target_duration: Target video duration in seconds
-        style: Video style (dynamic, calm, energetic, emotional)
-    
-    Returns:
-        List of B-roll scene suggestions
+    Plan one set of scenes against a prebuilt index. recent_usage ({path: uses})
+    steers the plan away from media other variants already use; anchors align the
+    cuts to the audio.
     """
-    if not analyzed_media:
-        return []
-    
     # Calculate scene durations
-    scene_durations = calculate_scene_pacing(target_duration, style)
+    scene_durations = calculate_scene_pacing(target_duration, style, rng, anchors)
     num_scenes = len(scene_durations)
     
-    # Determine scene types
-    scene_types = determine_scene_types(num_scenes, context)
-    
-    # Track used media for variety
-    used_media = set()
+    # Determine scene types (memoized across variants planned for the same context)
+    if scene_type_cache is None:
+        scene_type_cache = {}
+    if num_scenes not in scene_type_cache:
+        scene_type_cache[num_scenes] = determine_scene_types(num_scenes, context)
+    scene_types = scene_type_cache[num_scenes]
+    
+    # Track used media for variety; media used by other variants starts out used
+    used_mask = selection_index.new_used_mask()
+    if recent_usage and strategy == "random":
+        used_mask |= selection_index.path_mask(recent_usage)
+    assigned_media = None
+    if strategy != "random":
+        assigned_media = assign_media(
+            selection_index, scene_types, scene_durations, strategy, orientation, recent_usage, rng
+        )
     
     # Generate B-roll scenes
     broll_scenes = []
     
     for i, (duration, scene_type) in enumerate(zip(scene_durations, scene_types)):
         # Select media for this scene
-        media_files = select_media_for_scene(
-            analyzed_media,
-            scene_type,
-            duration,
-            used_media
-        )
+        if assigned_media is not None:
+            media_files = assigned_media[i]
+        else:
+            media_files = select_media_from_index(
+                selection_index,
+                scene_type,
+                duration,
+                used_mask,
+                rng
+            )
         
         # Create scene description
         descriptions = {
@@ -242,7 +279,7 @@ def suggest_broll(
         description = descriptions.get(scene_type, "Content scene")
         
         # Select transition
-        transition = select_transition(i, num_scenes, style)
+        transition = select_transition(i, num_scenes, style, rng)
         
         # Create scene object
         scene = {
@@ -255,6 +292,83 @@ def suggest_broll(
         }
         
         broll_scenes.append(scene)
+
+    return broll_scenes
+
+def suggest_broll(
+    analyzed_media,
+    context: str,
+    target_duration: float = 30.0,
+    style: str = "dynamic",
+    duplicate_clusters: Optional[List[List[str]]] = None,
+    selection_index: Optional[MediaSelectionIndex] = None,
+    strategy: str = "random",
+    orientation: Optional[str] = None,
+    seed: Optional[int] = None,
+    plan_cache: Optional[PlanCache] = None,
+    audio_analysis: Optional[Dict[str, Any]] = None,
+    transcript: Optional[List[Dict[str, Any]]] = None,
+    recent_usage: Optional[Dict[str, int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Suggests B-roll scenes based on analyzed media and context.
+    
+    Args:
+        analyzed_media: List of MediaItem objects from media analysis
+        context: Marketing or creative context for the video
+        target_duration: Target video duration in seconds
+        style: Video style (dynamic, calm, energetic, emotional)
+        duplicate_clusters: Near-duplicate groups of file paths (see perceptual_hash);
+            computed from the items' hashes when omitted. Each group is used as one asset.
+        selection_index: Prebuilt MediaSelectionIndex over analyzed_media; pass one
+            when planning repeatedly against the same library.
+        strategy: "random" picks scene by scene as before; "optimal" scores every
+            (scene, media) pair and solves the whole plan as an assignment problem;
+            "greedy" is the fast approximation of it for very large inputs
+        orientation: Preferred media orientation ("portrait"/"landscape") for the
+            optimal and greedy strategies
+        seed: Makes the plan reproducible; the same inputs and seed give the same scenes
+        plan_cache: Stores seeded plans keyed by the library version and all inputs,
+            so a repeated request is answered from disk
+        audio_analysis: Result of audio_pacing.analyze_audio for the voiceover or
+            music bed; cuts snap to its beats and onsets
+        transcript: Token-level transcript (sub.py format); cuts snap to sentence ends
+        recent_usage: {path: times used} of media other plans already use (e.g.
+            earlier videos in a campaign); the plan steers away from it
+    
+    Returns:
+        List of B-roll scene suggestions
+    """
+    if strategy not in ASSIGNMENT_STRATEGIES:
+        raise ValueError(f"Unknown assignment strategy: {strategy}")
+    if not analyzed_media:
+        return []
+
+    anchors = pacing_anchors(audio_analysis, transcript) or None
+
+    cache_key = None
+    if plan_cache is not None and seed is not None:
+        cache_key = plan_key(
+            media_version(analyzed_media), context, target_duration, style, seed,
+            strategy=strategy, orientation=orientation, duplicate_clusters=duplicate_clusters,
+            anchors=anchors, recent_usage=recent_usage
+        )
+        cached_scenes = plan_cache.get(cache_key)
+        if cached_scenes is not None:
+            return cached_scenes
+
+    # One generator per call: no shared global state, reproducible when seeded
+    rng = random.Random(seed)
+
+    # Near-identical takes and resized copies count as one asset (collapsed by the
+    # index), so they can never end up back to back
+    if selection_index is None:
+        selection_index = MediaSelectionIndex(analyzed_media, duplicate_clusters)
+    
+    broll_scenes = _plan_scenes(
+        selection_index, context, target_duration, style, strategy, orientation, rng,
+        recent_usage, anchors=anchors
+    )
     
     # Add metadata about the suggestion
     result = {
@@ -266,4 +380,128 @@ def suggest_broll(
         "context_summary": context[:200] + "..." if len(context) > 200 else context
     }
     
-    return broll_scenes  # Return just the scenes list for compatibility 
\ No newline at end of file
+    if cache_key is not None:
+        plan_cache.put(cache_key, broll_scenes)
+
+    return broll_scenes  # Return just the scenes list for compatibility
+
+def plan_media(scenes: List[Dict[str, Any]]) -> set:
+    """
+    Set of media paths used by a plan.
+    """
+    return {path for scene in scenes for path in scene["media_files"]}
+
+def plan_distance(scenes_a: List[Dict[str, Any]], scenes_b: List[Dict[str, Any]]) -> float:
+    """
+    Jaccard distance between the media sets of two plans (0 = same media, 1 = disjoint).
+    """
+    media_a, media_b = plan_media(scenes_a), plan_media(scenes_b)
+    union = media_a | media_b
+    if not union:
+        return 0.0
+    return 1.0 - len(media_a & media_b) / len(union)
+
+def suggest_broll_variants(
+    analyzed_media,
+    context: str,
+    n: int = 10,
+    styles: Optional[List[str]] = None,
+    durations: Optional[List[float]] = None,
+    strategy: str = "optimal",
+    min_distance: float = 0.5,
+    max_attempts: int = 5,
+    orientation: Optional[str] = None,
+    seed: Optional[int] = None,
+    duplicate_clusters: Optional[List[List[str]]] = None,
+    audio_analysis: Optional[Dict[str, Any]] = None,
+    transcript: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Generate n diverse B-roll plans in one call, e.g. for an A/B campaign.
+
+    The selection index, scene types and cost inputs are built once and shared by every
+    variant. Each new variant is steered away from media earlier variants used, and is
+    re-planned (up to max_attempts times) until its media-set Jaccard distance to every
+    accepted variant is at least min_distance; if that never happens the most distant
+    attempt is kept and flagged in the report.
+
+    Args:
+        analyzed_media: List of MediaItem objects from media analysis
+        context: Marketing or creative context for the video
+        n: Number of variants
+        styles: Styles to cycle through (default: ["dynamic"])
+        durations: Target durations to cycle through (default: [30.0])
+        strategy: Assignment strategy, as in suggest_broll
+        min_distance: Required media-overlap distance between any two variants (0-1)
+        max_attempts: Plans tried per variant before settling for the most distant one
+        orientation: Preferred media orientation
+        seed: Makes the whole batch reproducible
+        duplicate_clusters: Near-duplicate groups, as in suggest_broll
+        audio_analysis, transcript: Cut alignment inputs, as in suggest_broll
+
+    Returns:
+        {"variants": [{"variant", "style", "target_duration", "seed", "recent_usage",
+         "scenes"}, ...], "diversity": {...}}. A variant's seed alone does not
+        reproduce it, since earlier variants steer it; suggest_broll with the same
+        inputs plus that seed and recent_usage does.
+    """
+    if strategy not in ASSIGNMENT_STRATEGIES:
+        raise ValueError(f"Unknown assignment strategy: {strategy}")
+    styles = styles or ["dynamic"]
+    durations = durations or [30.0]
+    if not analyzed_media or n <= 0:
+        return {"variants": [], "diversity": {}}
+
+    selection_index = MediaSelectionIndex(analyzed_media, duplicate_clusters)
+    scene_type_cache: Dict[int, List[str]] = {}
+    anchors = pacing_anchors(audio_analysis, transcript) or None
+    seeds = random.Random(seed)
+    usage: Dict[str, int] = {}
+
+    variants = []
+    below_threshold = []
+    for v in range(n):
+        style = styles[v % len(styles)]
+        target_duration = float(durations[v % len(durations)])
+        # Usage as this variant saw it; with its seed, it replays the variant alone
+        usage_before = dict(usage)
+        best = None
+        for attempt in range(max(1, max_attempts)):
+            variant_seed = seeds.getrandbits(32)
+            scenes = _plan_scenes(
+                selection_index, context, target_duration, style, strategy, orientation,
+                random.Random(variant_seed), usage, scene_type_cache, anchors
+            )
+            distance = min((plan_distance(scenes, other["scenes"]) for other in variants), default=1.0)
+            if best is None or distance > best[0]:
+                best = (distance, variant_seed, scenes)
+            if distance >= min_distance:
+                break
+        distance, variant_seed, scenes = best
+        if distance < min_distance:
+            below_threshold.append(v + 1)
+        for path in plan_media(scenes):
+            usage[path] = usage.get(path, 0) + 1
+        variants.append({
+            "variant": v + 1,
+            "style": style,
+            "target_duration": target_duration,
+            "seed": variant_seed,
+            "recent_usage": usage_before,
+            "scenes": scenes
+        })
+
+    distances = [
+        plan_distance(a["scenes"], b["scenes"])
+        for i, a in enumerate(variants) for b in variants[i + 1:]
+    ]
+    diversity = {
+        "min_distance": round(min(distances), 3) if distances else None,
+        "mean_distance": round(sum(distances) / len(distances), 3) if distances else None,
+        "required_distance": min_distance,
+        "unique_media": len(usage),
+        "library_size": len(selection_index),
+        "variants_below_threshold": below_threshold
+    }
+    return {"variants": variants, "diversity": diversity}
+
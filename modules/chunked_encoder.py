@@ -0,0 +1,204 @@
+# chunked_encoder.py
+# Segment-parallel rendering of one timeline: the output is split at scene cuts or
+# source keyframes into chunks sized to the core count, each chunk is encoded by its
+# own ffmpeg process with closed GOPs and identical encoder settings, and the chunks
+# are joined without re-encoding by the concat demuxer next to a single audio render.
+
+import contextvars
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from modules.ffmpeg_utils import run_ffmpeg
+from modules.timeline import Timeline, slice_timeline
+from modules.timeline_renderer import (AUDIO_BITRATE, DEFAULT_CRF, DEFAULT_PRESET, build_filter_graph,
+                                       video_codec_args)
+
+# Chunks shorter than this cost more in process start-up and seeking than they gain
+MIN_CHUNK_SECONDS = 4.0
+# Two chunks per worker even out chunks that encode slower than others
+CHUNKS_PER_WORKER = 2
+# ffmpeg threads given to each chunk process
+THREADS_PER_CHUNK = 2
+# Below this many threads for one video a single libx264 process scales well enough
+CHUNKED_MIN_THREADS = 8
+
+
+def _cut_candidates(timeline: Timeline, keyframe_times: Optional[np.ndarray]) -> np.ndarray:
+    """
+    Output times where a chunk boundary is cheapest: scene cuts (segment joins and
+    overlay edges) and, when given, source keyframes mapped through the cuts.
+    """
+    candidates = []
+    offset = 0.0
+    for segment in timeline.segments:
+        candidates.append(offset)
+        if keyframe_times is not None and len(keyframe_times):
+            lo = np.searchsorted(keyframe_times, segment.start, side="left")
+            hi = np.searchsorted(keyframe_times, segment.end, side="right")
+            candidates.extend(offset + keyframe_times[lo:hi] - segment.start)
+        offset += segment.duration
+    for overlay in timeline.overlays:
+        candidates += [overlay.start, overlay.start + overlay.duration]
+    return np.unique(np.asarray(candidates, dtype=np.float64))
+
+
+def plan_chunks(
+    timeline: Timeline,
+    workers: int,
+    keyframe_times: Optional[np.ndarray] = None,
+    min_chunk: float = MIN_CHUNK_SECONDS
+) -> List[Tuple[float, float]]:
+    """
+    Split the timeline's output into (start, end) chunks.
+
+    Aims for CHUNKS_PER_WORKER chunks per worker (fewer when that would make chunks
+    shorter than min_chunk). Each evenly spaced boundary moves to the nearest scene
+    cut or keyframe within a quarter chunk, then onto the frame grid; boundaries never
+    fall inside a fade.
+    """
+    duration = timeline.duration
+    fps = timeline.fps
+    count = max(1, min(workers * CHUNKS_PER_WORKER, int(duration // min_chunk)))
+    if count == 1:
+        return [(0.0, duration)]
+
+    candidates = _cut_candidates(timeline, keyframe_times)
+    fades = [(t.at, t.at + t.duration) for t in timeline.transitions]
+    step = duration / count
+    bounds = [0.0]
+    for i in range(1, count):
+        ideal = i * step
+        near = candidates[np.abs(candidates - ideal) <= step / 4]
+        cut = float(near[np.argmin(np.abs(near - ideal))]) if len(near) else ideal
+        for fade_start, fade_end in fades:
+            if fade_start < cut < fade_end:
+                cut = fade_start if cut - fade_start < fade_end - cut else fade_end
+        cut = round(cut * fps) / fps
+        if cut - bounds[-1] >= min_chunk / 2 and duration - cut >= min_chunk / 2:
+            bounds.append(cut)
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _encode_chunk(timeline: Timeline, start: float, end: float, output: Path, preset: str, crf: int, threads: int):
+    chunk = slice_timeline(timeline, start, end)
+    inputs, filter_graph, video_label, _ = build_filter_graph(chunk, video=True, audio=False)
+    frames = int(round(end * timeline.fps)) - int(round(start * timeline.fps))
+    args = inputs + [
+        "-filter_complex_threads", str(threads),
+        "-filter_complex", filter_graph, "-map", f"[{video_label}]",
+    ] + video_codec_args(timeline.fps, preset, crf) + [
+        # Closed GOPs keep every chunk independently decodable after the join
+        "-flags", "+cgop", "-frames:v", str(frames), "-threads", str(threads),
+        "-f", "matroska", str(output),
+    ]
+    run_ffmpeg(args)
+
+
+def render_timeline_chunked(
+    timeline: Timeline,
+    output_path: Path,
+    preset: str = DEFAULT_PRESET,
+    crf: int = DEFAULT_CRF,
+    threads: Optional[int] = None,
+    keyframe_times: Optional[np.ndarray] = None,
+    work_dir: Optional[Path] = None
+) -> dict:
+    """
+    Render a timeline by encoding chunks in parallel ffmpeg processes and joining them
+    losslessly. Produces the same frames and audio as render_timeline.
+
+    Args:
+        timeline: Edit decision list to render
+        output_path: Destination MP4
+        preset: libx264 preset
+        crf: libx264 constant rate factor
+        threads: Total thread budget (all cores when None); split into workers of
+            THREADS_PER_CHUNK threads
+        keyframe_times: Source keyframe times (keyframe_index) to cut chunks on
+        work_dir: Directory for the intermediate chunks (a temporary one by default)
+
+    Returns:
+        Statistics: workers and chunk boundaries
+    """
+    if not timeline.segments:
+        raise ValueError("Timeline has no segments to render")
+    threads = threads or os.cpu_count() or 1
+    workers = max(1, threads // THREADS_PER_CHUNK)
+    chunk_threads = max(1, threads // workers)
+    chunks = plan_chunks(timeline, workers, keyframe_times)
+
+    temp_dir = Path(tempfile.mkdtemp(prefix="chunks_", dir=work_dir))
+    try:
+        chunk_paths = [temp_dir / f"chunk_{i:04d}.mkv" for i in range(len(chunks))]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Each chunk runs in a copy of the caller's context so its ffmpeg process is
+            # charged to the calling pipeline stage (resource_usage)
+            futures = [
+                executor.submit(contextvars.copy_context().run, _encode_chunk, timeline, start, end, path,
+                                preset, crf, chunk_threads)
+                for (start, end), path in zip(chunks, chunk_paths)
+            ]
+            # Audio is cheap and rendered once in full, next to the video chunks
+            inputs, filter_graph, _, audio_label = build_filter_graph(timeline, video=False, audio=True)
+            audio_path = None
+            if audio_label:
+                audio_path = temp_dir / "audio.mka"
+                run_ffmpeg(inputs + ["-filter_complex", filter_graph, "-map", f"[{audio_label}]",
+                                     "-c:a", "aac", "-b:a", AUDIO_BITRATE, str(audio_path)])
+            for future in futures:
+                future.result()
+
+        concat_list = temp_dir / "chunks.txt"
+        concat_list.write_text("".join(f"file '{path.as_posix()}'\n" for path in chunk_paths), encoding="utf-8")
+        args = ["-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if audio_path is not None:
+            args += ["-i", str(audio_path), "-map", "0:v", "-map", "1:a"]
+        args += ["-c", "copy", "-movflags", "+faststart", str(output_path)]
+        run_ffmpeg(args)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {"workers": workers, "chunks": [(round(a, 3), round(b, 3)) for a, b in chunks]}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from modules.keyframe_index import load_keyframe_index
+    from modules.media_probe import probe_media
+    from modules.timeline import apply_silence_trim, timeline_from_source
+    from modules.timeline_renderer import render_timeline
+
+    parser = argparse.ArgumentParser(description="Compare monolithic and chunked rendering of a video.")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("--silence", type=Path, help="Silence JSON from silence.detect_silence")
+    parser.add_argument("--height", type=int, default=1920)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output-dir", type=Path, default=Path(tempfile.gettempdir()))
+    args = parser.parse_args()
+
+    timeline = timeline_from_source(args.video, probe_media(args.video), output_height=args.height)
+    if args.silence:
+        with open(args.silence, "r", encoding="utf-8") as f:
+            timeline = apply_silence_trim(timeline, json.load(f))
+    keyframes = load_keyframe_index(args.video).times
+
+    started = time.perf_counter()
+    render_timeline(timeline, args.output_dir / "monolithic.mp4", threads=args.threads)
+    monolithic = time.perf_counter() - started
+    started = time.perf_counter()
+    stats = render_timeline_chunked(timeline, args.output_dir / "chunked.mp4", threads=args.threads,
+                                    keyframe_times=keyframes)
+    chunked = time.perf_counter() - started
+    print(f"{timeline.duration:.1f}s output on {args.threads or os.cpu_count()} threads")
+    print(f"  monolithic: {monolithic:.2f}s")
+    print(f"  chunked:    {chunked:.2f}s ({stats['workers']} workers, {len(stats['chunks'])} chunks, "
+          f"{monolithic / chunked:.2f}x)")
@@ -1,6 +1,7 @@
 # Provides configuration utilities, such as retrieving API keys.
 
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 def get_openai_api_key():
@@ -11,4 +12,90 @@ def get_openai_api_key():
 def get_elevenlabs_api_key():
     load_dotenv()
     # Retrieve Eleven Labs API key from environment or a secure config
-    return os.getenv("ELEVEN_LABS_API_KEY")
\ No newline at end of file
+    return os.getenv("ELEVEN_LABS_API_KEY")
+
+def get_analysis_workers():
+    load_dotenv()
+    # Number of processes used for media analysis (1 = serial, 0 = one per CPU)
+    try:
+        return int(os.getenv("ANALYSIS_WORKERS", "1"))
+    except ValueError:
+        return 1
+
+def get_media_index_path():
+    load_dotenv()
+    # SQLite media index shared by the Streamlit app and the MCP server
+    default_path = Path(__file__).resolve().parent.parent / "media_index.db"
+    return Path(os.getenv("MEDIA_INDEX_PATH", str(default_path)))
+
+def get_plan_cache_dir():
+    load_dotenv()
+    # On-disk cache of seeded B-roll plans (see plan_cache.py)
+    default_path = Path(__file__).resolve().parent.parent / ".plan_cache"
+    return Path(os.getenv("PLAN_CACHE_DIR", str(default_path)))
+
+def get_audio_analysis_cache_dir():
+    load_dotenv()
+    # Cached onset/tempo analysis of voiceovers and music beds (see audio_pacing.py)
+    default_path = Path(__file__).resolve().parent.parent / ".audio_cache"
+    return Path(os.getenv("AUDIO_ANALYSIS_CACHE_DIR", str(default_path)))
+
+def get_keyframe_index_dir():
+    load_dotenv()
+    # Memory-mapped keyframe indexes of source videos (see keyframe_index.py)
+    default_path = Path(__file__).resolve().parent.parent / ".keyframe_cache"
+    return Path(os.getenv("KEYFRAME_INDEX_DIR", str(default_path)))
+
+def get_video_workers():
+    load_dotenv()
+    # Videos processed concurrently by process_videos (1 = one at a time, 0 = one per CPU)
+    try:
+        return int(os.getenv("VIDEO_WORKERS", "0"))
+    except ValueError:
+        return 0
+
+def get_render_mode():
+    load_dotenv()
+    # How process_videos encodes each timeline: "single", "chunked" or "auto"
+    mode = os.getenv("RENDER_MODE", "auto").lower()
+    return mode if mode in ("single", "chunked", "auto") else "auto"
+
+def get_artifact_cache_dir():
+    load_dotenv()
+    # Cached stage outputs reused across runs (see artifact_cache.py)
+    default_path = Path(__file__).resolve().parent.parent / ".artifact_cache"
+    return Path(os.getenv("ARTIFACT_CACHE_DIR", str(default_path)))
+
+def get_artifact_fingerprint_mode():
+    load_dotenv()
+    # How artifact cache keys fingerprint their input files: "full", "blake2" or "sampled" (see fingerprint.py)
+    mode = os.getenv("ARTIFACT_FINGERPRINT_MODE", "full").lower()
+    return mode if mode in ("full", "blake2", "sampled") else "full"
+
+def get_artifact_cache_max_bytes():
+    load_dotenv()
+    # Size quota of the artifact cache in GB; least recently used artifacts are evicted beyond it
+    try:
+        return int(float(os.getenv("ARTIFACT_CACHE_MAX_GB", "20")) * 1024 ** 3)
+    except ValueError:
+        return 20 * 1024 ** 3
+
+def get_voiceover_length_mode():
+    load_dotenv()
+    # How a voiceover muxed onto a finished video sets the output length: "video", "shortest" or "longest"
+    mode = os.getenv("VOICEOVER_LENGTH", "video").lower()
+    return mode if mode in ("video", "shortest", "longest") else "video"
+
+def get_derivative_store_dir():
+    load_dotenv()
+    # Resized copies of media images (previews, thumbnails, B-roll stills), kept outside the media tree
+    default_path = Path(__file__).resolve().parent.parent / ".derivative_store"
+    return Path(os.getenv("DERIVATIVE_STORE_DIR", str(default_path)))
+
+def get_derivative_store_max_bytes():
+    load_dotenv()
+    # Size quota of the derivative store in GB; least recently used derivatives are evicted beyond it
+    try:
+        return int(float(os.getenv("DERIVATIVE_STORE_MAX_GB", "2")) * 1024 ** 3)
+    except ValueError:
+        return 2 * 1024 ** 3
@@ -0,0 +1,193 @@
+# derivative_store.py
+# Resized copies of media images (previews, thumbnails, pre-scaled B-roll stills) kept in
+# one store outside the media tree instead of as resized_ files next to the originals.
+# A derivative is keyed by the source's fingerprint and its transform spec, decoded at
+# reduced scale, written atomically and evicted least recently used under a disk quota.
+
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from PIL import Image, ImageOps
+from pydantic import BaseModel
+
+from modules.artifact_cache import ArtifactCache
+from modules.config import get_artifact_fingerprint_mode, get_derivative_store_dir, get_derivative_store_max_bytes
+from modules.image_loader import load_reduced_image
+
+# Bumped when the resizing code changes its output
+DERIVATIVE_VERSION = 1
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+FORMAT_SUFFIXES = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+# Derivatives used this recently are never evicted: the paths get() hands out are
+# read by ffmpeg or the UI right after, possibly in another process
+RECENT_USE_GRACE = 300.0
+
+
+class DerivativeSpec(BaseModel):
+    width: int
+    height: Optional[int] = None  # None keeps the aspect ratio at the given width
+    crop: bool = False  # fill width x height exactly, cropping around the centre
+    format: str = "JPEG"  # JPEG, PNG or WEBP; PNG and WEBP keep transparency
+    quality: int = 85
+
+
+def render_derivative(source: Path, spec: DerivativeSpec) -> Image.Image:
+    """
+    Decode source at the smallest scale covering the spec, then resize it: into
+    width x height (or exactly that size with crop), or to width when there is no
+    height. Images are never upscaled except to fill a crop.
+    """
+    keep_alpha = spec.format != "JPEG"
+    # A height of 1 lets the reduced decode follow the width alone
+    image, _ = load_reduced_image(Path(source), (spec.width, spec.height or 1), keep_alpha=keep_alpha)
+    if spec.height is None:
+        if image.width > spec.width:
+            height = max(1, round(image.height * spec.width / image.width))
+            image = image.resize((spec.width, height), Image.LANCZOS)
+    elif spec.crop:
+        image = ImageOps.fit(image, (spec.width, spec.height), Image.LANCZOS)
+    else:
+        image.thumbnail((spec.width, spec.height), Image.LANCZOS)
+    if spec.format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    return image
+
+
+class DerivativeStore(ArtifactCache):
+    """
+    Artifact cache of image derivatives. Creation holds an exclusive lock per key
+    shard, so processes and threads asking for the same derivative decode the source
+    once; files appear under their final name only when complete.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int = DEFAULT_MAX_BYTES, fingerprint_mode: str = "full"):
+        super().__init__(cache_dir, max_bytes, fingerprint_mode)
+        self.locks_dir = self.cache_dir / "locks"
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _creation_lock(self, key: str):
+        if fcntl is None:
+            yield
+            return
+        # One lock file per shard: a fixed set that never needs cleaning up
+        with open(self.locks_dir / f"{key[:2]}.lock", "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def get(self, source: Path, spec: DerivativeSpec) -> Path:
+        """
+        Path of the derivative of source described by spec, creating it on a miss.
+        """
+        if spec.format not in FORMAT_SUFFIXES:
+            raise ValueError(f"Unknown derivative format {spec.format!r}, expected one of {tuple(FORMAT_SUFFIXES)}")
+        key = self.key("derivative", DERIVATIVE_VERSION, [Path(source)], spec.dict())
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+
+        with self._creation_lock(key):
+            # Another worker may have created it while this one waited
+            cached = self.lookup(key)
+            if cached is not None:
+                return cached
+            image = render_derivative(Path(source), spec)
+            shard = self.objects_dir / key[:2]
+            shard.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=shard, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    options = {"quality": spec.quality} if spec.format in ("JPEG", "WEBP") else {}
+                    image.save(f, format=spec.format, **options)
+                os.chmod(tmp_name, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                path = shard / f"{key}{FORMAT_SUFFIXES[spec.format]}"
+                os.replace(tmp_name, path)
+            except Exception:
+                Path(tmp_name).unlink(missing_ok=True)
+                raise
+        self.evict(keep=[key], grace=RECENT_USE_GRACE)
+        return path
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def default_store() -> DerivativeStore:
+    """
+    The store configured by DERIVATIVE_STORE_DIR / DERIVATIVE_STORE_MAX_GB, keyed with
+    the ARTIFACT_FINGERPRINT_MODE fingerprints.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DerivativeStore(get_derivative_store_dir(), get_derivative_store_max_bytes(),
+                                             get_artifact_fingerprint_mode())
+        return _default_store
+
+
+def get_derivative(
+    source: Path,
+    width: int,
+    height: Optional[int] = None,
+    crop: bool = False,
+    format: str = "JPEG",
+    quality: int = 85,
+    store: Optional[DerivativeStore] = None
+) -> Optional[Path]:
+    """
+    Resized copy of an image from the derivative store; None if it cannot be made.
+
+    Args:
+        source: Original image
+        width: Target width
+        height: Target height (None keeps the aspect ratio)
+        crop: Fill width x height exactly instead of fitting inside it
+        format: Output format, see FORMAT_SUFFIXES
+        quality: JPEG/WEBP quality
+        store: Store to use (the configured one by default)
+    """
+    try:
+        spec = DerivativeSpec(width=width, height=height, crop=crop, format=format, quality=quality)
+        return (store or default_store()).get(Path(source), spec)
+    except Exception as e:
+        print(f"Error creating derivative of {source}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Create image derivatives, or show and trim the derivative store.")
+    parser.add_argument("images", type=Path, nargs="*")
+    parser.add_argument("--width", type=int, default=320)
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--crop", action="store_true")
+    parser.add_argument("--format", choices=tuple(FORMAT_SUFFIXES), default="JPEG")
+    parser.add_argument("--max-gb", type=float, default=None, help="Evict down to this size")
+    args = parser.parse_args()
+
+    store = default_store()
+    if args.max_gb is not None:
+        store.max_bytes = int(args.max_gb * 1024 ** 3)
+        store.evict()
+    for image_path in args.images:
+        started = time.perf_counter()
+        path = get_derivative(image_path, args.width, args.height, args.crop, args.format, store=store)
+        print(f"{image_path} -> {path} ({time.perf_counter() - started:.3f}s)")
+    print(f"{store.size() / 1024 ** 2:.1f} MB in {store.cache_dir}")
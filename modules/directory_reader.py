@@ -1,23 +1,105 @@
 # This module scans the media directory and returns a list of files.
 # Each file will later be analyzed by the media_analyzer module.
 
+import os
 from pathlib import Path
+from typing import FrozenSet, Iterable, Iterator, List, Optional
 
-def gather_media_files(media_dir: Path):
+from modules import config
+
+# Everything analyze_single_media_file knows how to handle (matched case-insensitively)
+VIDEO_EXTENSIONS = frozenset({".mp4", ".mov", ".mkv", ".webm", ".m4v", ".avi"})
+IMAGE_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"})
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS | IMAGE_EXTENSIONS
+
+# Generated files and scratch directories that must not be re-analyzed as new media.
+# Hidden directories are skipped too; the app's own caches are matched by path (see
+# app_cache_dirs), so user folders that merely share a name like "cache" are scanned.
+SKIP_FILE_PREFIXES = ("resized_", ".")
+SKIP_FILE_MARKERS = ("TEMP_MPY_",)
+SKIP_DIR_NAMES = frozenset({"__pycache__", "node_modules"})
+
+
+def app_cache_dirs() -> FrozenSet[str]:
+    """
+    Real paths of the directories the app writes its caches and derivatives to, as
+    configured.
     """
-    Gather all media files from the given directory, including images, videos, and JSON files.
+    directories = [
+        config.get_plan_cache_dir(),
+        config.get_audio_analysis_cache_dir(),
+        config.get_keyframe_index_dir(),
+        config.get_artifact_cache_dir(),
+        config.get_derivative_store_dir(),
+    ]
+    return frozenset(os.path.realpath(directory) for directory in directories)
+
+
+def iter_media_entries(
+    media_dir: Path,
+    extensions: Iterable[str] = MEDIA_EXTENSIONS,
+    recursive: bool = True,
+    skip_dirs: Optional[Iterable[Path]] = None
+) -> Iterator[os.DirEntry]:
+    """
+    Walk the directory once with os.scandir and lazily yield matching files.
+
+    The yielded DirEntry objects carry the stat information gathered by the walk,
+    so callers can start analyzing the first file before the scan has finished.
+
+    Args:
+        media_dir: Directory to scan
+        extensions: File extensions to include (with leading dot, any case)
+        recursive: Whether to descend into subdirectories
+        skip_dirs: Directories not to descend into (the app's cache directories
+            when None)
+    """
+    extensions = {ext.lower() if ext.startswith(".") else f".{ext.lower()}" for ext in extensions}
+    skip_paths = app_cache_dirs() if skip_dirs is None else frozenset(os.path.realpath(d) for d in skip_dirs)
+    pending = [os.fspath(media_dir)]
+
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                # Sort for a stable order across filesystems
+                entries = sorted(entries, key=lambda e: e.name)
+        except OSError as e:
+            print(f"Error scanning {directory}: {e}")
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not recursive or name.startswith(".") or name.lower() in SKIP_DIR_NAMES:
+                        continue
+                    if os.path.realpath(entry.path) in skip_paths:
+                        print(f"Skipping cache directory {entry.path}")
+                        continue
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+
+            if name.startswith(SKIP_FILE_PREFIXES) or any(marker in name for marker in SKIP_FILE_MARKERS):
+                continue
+            if os.path.splitext(name)[1].lower() in extensions:
+                yield entry
+
+        # Depth-first, in name order
+        pending.extend(reversed(subdirs))
+
+
+def gather_media_files(media_dir: Path, extensions: Iterable[str] = MEDIA_EXTENSIONS) -> List[Path]:
+    """
+    Gather all media files from the given directory, including images and videos.
     """
-    # Define the extensions to include
-    allowed_extensions = ['mp4', 'mov', 'jpg', 'jpeg', 'png']
-    
     # Check if the directory exists
     if not media_dir.exists():
         return []
-    
-    # Gather files matching the allowed extensions (case-insensitive)
-    media_files = [
-        file for ext in allowed_extensions
-        for file in media_dir.rglob(f'*.{ext}')
-    ]
-    
-    return media_files
\ No newline at end of file
+
+    return [Path(entry.path) for entry in iter_media_entries(media_dir, extensions)]
@@ -0,0 +1,28 @@
+# ffmpeg_utils.py
+# Shared helpers for calling the ffmpeg binary directly.
+
+import os
+from typing import List, Sequence
+
+from modules.resource_usage import run_subprocess
+
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY", "ffmpeg")
+
+
+def ffmpeg_command(args: Sequence[str], overwrite: bool = True) -> List[str]:
+    """
+    Full ffmpeg command line for args, quiet apart from errors.
+    """
+    return [FFMPEG_BINARY, "-hide_banner", "-v", "error", "-nostdin"] + (["-y"] if overwrite else []) + list(args)
+
+
+def run_ffmpeg(args: Sequence[str], overwrite: bool = True):
+    """
+    Run ffmpeg with args; raises RuntimeError carrying ffmpeg's stderr on failure.
+    """
+    cmd = ffmpeg_command(args, overwrite)
+    result = run_subprocess(cmd)
+    if result.returncode != 0:
+        message = result.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg exited with {result.returncode}: {message[-2000:]}")
+    return result
@@ -0,0 +1,170 @@
+# fingerprint.py
+# Content fingerprints for media files and pipeline artifacts.
+#
+# Modes:
+#   "full"    - hash every byte with the fastest available hash (blake3 or xxh3 when
+#               installed, hashlib BLAKE2 otherwise), using mmap or large buffered reads
+#   "blake2"  - hash every byte with hashlib BLAKE2b (no optional dependencies)
+#   "sampled" - hash the file size plus its head, tail and N evenly spaced blocks;
+#               cheap change detection for multi-GB footage, not a content identity
+
+import hashlib
+import mmap
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+FINGERPRINT_MODES = ("full", "blake2", "sampled")
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+SAMPLE_BLOCK_SIZE = 256 * 1024
+SAMPLE_BLOCKS = 16
+
+
+def _new_hasher(mode: str):
+    """
+    Return (algorithm name, hasher) for the given mode.
+    """
+    if mode == "full":
+        if blake3 is not None:
+            return "blake3", blake3.blake3(max_threads=blake3.blake3.AUTO)
+        if xxhash is not None:
+            return "xxh3_128", xxhash.xxh3_128()
+    return "blake2b", hashlib.blake2b(digest_size=20)
+
+
+def _hash_full(filepath: Path, hasher) -> None:
+    size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        if size > 0:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    view = memoryview(mm)
+                    try:
+                        for offset in range(0, size, READ_BLOCK_SIZE):
+                            hasher.update(view[offset:offset + READ_BLOCK_SIZE])
+                    finally:
+                        view.release()
+                return
+            except (ValueError, OSError):
+                # Not mappable (pipes, some network filesystems): fall back to reads
+                f.seek(0)
+        buffer = bytearray(READ_BLOCK_SIZE)
+        view = memoryview(buffer)
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            hasher.update(view[:read])
+
+
+def _hash_sampled(filepath: Path, hasher, sample_blocks: int, block_size: int) -> None:
+    size = os.path.getsize(filepath)
+    hasher.update(size.to_bytes(8, "little"))
+    if size <= block_size * (sample_blocks + 2):
+        # Small enough that sampling would read most of it anyway
+        _hash_full(filepath, hasher)
+        return
+
+    last = size - block_size
+    offsets = [0] + [last * (i + 1) // (sample_blocks + 1) for i in range(sample_blocks)] + [last]
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        for offset in offsets:
+            hasher.update(os.pread(fd, block_size, offset))
+    finally:
+        os.close(fd)
+
+
+def fingerprint_file(
+    filepath: Path,
+    mode: str = "full",
+    sample_blocks: int = SAMPLE_BLOCKS,
+    block_size: int = SAMPLE_BLOCK_SIZE
+) -> str:
+    """
+    Fingerprint a file's content.
+
+    Args:
+        filepath: File to fingerprint
+        mode: One of FINGERPRINT_MODES
+        sample_blocks: Number of evenly spaced blocks hashed in "sampled" mode
+        block_size: Size of each sampled block in bytes
+
+    Returns:
+        "<algorithm>:<hexdigest>", prefixed with "sampled-" for sampled fingerprints so
+        digests from different modes never compare equal.
+    """
+    if mode not in FINGERPRINT_MODES:
+        raise ValueError(f"Unknown fingerprint mode: {mode}")
+
+    algorithm, hasher = _new_hasher(mode)
+    if mode == "sampled":
+        _hash_sampled(Path(filepath), hasher, sample_blocks, block_size)
+        algorithm = f"sampled-{algorithm}"
+    else:
+        _hash_full(Path(filepath), hasher)
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+def fingerprint_bytes(data: bytes) -> str:
+    """
+    Fingerprint an in-memory value (parameters, plans) with the same naming scheme.
+    """
+    algorithm, hasher = _new_hasher("full")
+    hasher.update(data)
+    return f"{algorithm}:{hasher.hexdigest()}"
+
+
+def benchmark_fingerprint(filepath: Path, modes: Iterable[str] = FINGERPRINT_MODES, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Time each fingerprint mode on a file and report throughput.
+
+    MB/s is relative to the full file size, so for "sampled" it is the effective
+    change-detection throughput rather than the bytes actually read.
+    """
+    size_mb = os.path.getsize(filepath) / (1024 * 1024)
+    results = {}
+    for mode in modes:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fingerprint_file(filepath, mode)
+            timings.append(time.perf_counter() - started)
+        best = min(timings)
+        results[mode] = {
+            "algorithm": _new_hasher(mode)[0],
+            "seconds": best,
+            "mb_per_s": size_mb / best if best > 0 else float("inf")
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fingerprint files or benchmark fingerprint modes.")
+    parser.add_argument("files", nargs="+", help="Files to fingerprint")
+    parser.add_argument("--mode", choices=FINGERPRINT_MODES, default="full")
+    parser.add_argument("--benchmark", action="store_true", help="Report MB/s for every mode")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for file in args.files:
+        if args.benchmark:
+            size_mb = os.path.getsize(file) / (1024 * 1024)
+            print(f"{file} ({size_mb:.1f} MB)")
+            for mode, result in benchmark_fingerprint(Path(file), repeat=args.repeat).items():
+                print(f"  {mode:<8} {result['algorithm']:<9} {result['seconds'] * 1000:9.1f} ms  {result['mb_per_s']:10.1f} MB/s")
+        else:
+            print(f"{fingerprint_file(Path(file), args.mode)}  {file}")
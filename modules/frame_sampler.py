@@ -0,0 +1,142 @@
+# frame_sampler.py
+# Grabs K evenly spaced, downscaled frames from a video in one sequential decode pass,
+# instead of seeking with CAP_PROP_POS_FRAMES for every frame (slow and inaccurate on
+# long-GOP footage).
+
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+from modules.media_probe import PROBE_CONTAINER_OPTIONS
+
+DEFAULT_SAMPLE_COUNT = 8
+DEFAULT_SAMPLE_WIDTH = 320
+
+
+def _scaled_size(width: int, height: int, max_width: int):
+    if width <= max_width:
+        return width, height
+    scaled_height = max(2, int(round(height * max_width / width / 2)) * 2)
+    return max_width, scaled_height
+
+
+def _sample_with_av(video_path: Path, count: int, max_width: int, keyframes_only: bool) -> List[np.ndarray]:
+    frames = []
+    with av.open(str(video_path), container_options=PROBE_CONTAINER_OPTIONS) as container:
+        if not container.streams.video:
+            return []
+        stream = container.streams.video[0]
+        if not keyframes_only:
+            stream.thread_type = "AUTO"
+
+        if container.duration:
+            duration = container.duration / av.time_base
+        elif stream.duration:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = 0.0
+        targets = [(i + 0.5) * duration / count for i in range(count)] if duration > 0 else [0.0] * count
+
+        def take(frame, time):
+            nonlocal next_target
+            width, height = _scaled_size(frame.width, frame.height, max_width)
+            frames.append(frame.to_ndarray(width=width, height=height, format="rgb24"))
+            # One frame may satisfy several targets on sparse-keyframe footage
+            while next_target < count and targets[next_target] <= time + 1e-3:
+                next_target += 1
+
+        next_target = 0
+        if keyframes_only:
+            # Demux front to back but only hand the keyframe packets we need to the
+            # decoder; everything else is skipped without being decoded.
+            codec = stream.codec_context
+            codec.skip_frame = "NONKEY"
+            time_base = stream.time_base
+            for packet in container.demux(stream):
+                if packet.pts is None or not packet.is_keyframe:
+                    continue
+                time = float(packet.pts * time_base)
+                if time + 1e-3 < targets[next_target]:
+                    continue
+                decoded = codec.decode(packet)
+                if not decoded:
+                    # Decoders with reordering delay hold the frame back until flushed
+                    decoded = codec.decode(None)
+                    codec.flush_buffers()
+                if decoded:
+                    take(decoded[0], time)
+                if next_target >= count:
+                    break
+        else:
+            for frame in container.decode(stream):
+                if frame.time is None or frame.time + 1e-3 < targets[next_target]:
+                    continue
+                take(frame, frame.time)
+                if next_target >= count:
+                    break
+    return frames
+
+
+def _sample_with_cv2(video_path: Path, count: int, max_width: int) -> List[np.ndarray]:
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        return []
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total_frames <= 0:
+            return []
+        targets = sorted({min(total_frames - 1, int((i + 0.5) * total_frames / count)) for i in range(count)})
+        frames = []
+        index = 0
+        for target in targets:
+            # grab() advances without converting; only the sampled frames are retrieved
+            while index < target:
+                if not cap.grab():
+                    return frames
+                index += 1
+            ret, frame = cap.read()
+            index += 1
+            if not ret:
+                break
+            height, width = frame.shape[:2]
+            new_width, new_height = _scaled_size(width, height, max_width)
+            if (new_width, new_height) != (width, height):
+                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        return frames
+    finally:
+        cap.release()
+
+
+def sample_frames(
+    video_path: Path,
+    count: int = DEFAULT_SAMPLE_COUNT,
+    max_width: int = DEFAULT_SAMPLE_WIDTH,
+    keyframes_only: bool = True
+) -> List[np.ndarray]:
+    """
+    Return up to `count` evenly spaced RGB frames (uint8, H x W x 3) scaled to at most
+    `max_width` pixels wide.
+
+    With PyAV the clip is read once, front to back; with keyframes_only only the
+    keyframe packets nearest each sample position are decoded. Clips with too few
+    keyframes to sample are re-read with full decoding. Without PyAV, cv2 grabs frames
+    sequentially and only converts the sampled ones.
+    """
+    try:
+        if av is not None:
+            frames = _sample_with_av(video_path, count, max_width, keyframes_only)
+            if keyframes_only and len(frames) < min(count, 3):
+                frames = _sample_with_av(video_path, count, max_width, False)
+            return frames
+        return _sample_with_cv2(video_path, count, max_width)
+    except Exception as e:
+        print(f"Error sampling frames from {video_path}: {e}")
+        return []
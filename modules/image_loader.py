@@ -0,0 +1,96 @@
+# image_loader.py
+# Opens an image once and decodes it at reduced scale (JPEG draft mode, or
+# Image.reduce for formats without scaled decoding), so analysis and previews never
+# fully decode a 48 MP photo just to compute a handful of numbers.
+
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from PIL import Image
+
+# EXIF tag holding the orientation
+EXIF_ORIENTATION = 0x0112
+
+# Default working size: large enough for encode_image previews, which also makes it
+# roughly a 1/8-scale decode for 40-50 MP phone photos
+REDUCED_MAX_SIZE = (1024, 1024)
+
+
+def load_reduced_image(
+    image_path: Path,
+    max_size: Tuple[int, int] = REDUCED_MAX_SIZE,
+    keep_alpha: bool = False
+) -> Tuple[Image.Image, Dict[str, Any]]:
+    """
+    Decode an image at the smallest scale that still covers max_size.
+
+    Args:
+        image_path: Image file
+        max_size: Width and height the decoded image must still cover
+        keep_alpha: Return RGBA instead of RGB for images with transparency
+
+    Returns:
+        (image, info): the reduced RGB(A) image with EXIF orientation applied, and a dict
+        with the original display width/height, mode, format, EXIF orientation and
+        the decode scale that was used.
+    """
+    with Image.open(image_path) as img:
+        orientation = 1
+        try:
+            orientation = img.getexif().get(EXIF_ORIENTATION, 1) or 1
+        except Exception:
+            pass
+        width, height = img.size
+        info = {
+            "mode": img.mode,
+            "format": img.format,
+            "orientation": orientation,
+        }
+
+        # EXIF orientations 5-8 swap the axes
+        target = max_size if orientation < 5 else (max_size[1], max_size[0])
+        if img.format == "JPEG":
+            # libjpeg scales by 1/2, 1/4 or 1/8 while decoding
+            img.draft("RGB", target)
+            reduced = img.convert("RGB") if img.mode != "RGB" else img.copy()
+        else:
+            # Image.reduce only handles the plain modes; palette, bilevel and 16-bit
+            # images are converted first
+            if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+                img = img.convert("RGBA")
+            elif img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            factor = max(1, min(width // target[0], height // target[1]))
+            reduced = img.reduce(factor) if factor > 1 else img.copy()
+            if not (keep_alpha and reduced.mode == "RGBA"):
+                reduced = reduced.convert("RGB")
+
+    reduced = _apply_orientation(reduced, orientation)
+    # The orientation is baked in now; drop it so exif_transpose won't apply it again
+    reduced.info.pop("exif", None)
+
+    if orientation >= 5:
+        width, height = height, width
+    info.update({
+        "width": width,
+        "height": height,
+        "aspect_ratio": f"{width}:{height}",
+        "scale": reduced.width / width if width else 1.0,
+    })
+    return reduced, info
+
+
+def _apply_orientation(image: Image.Image, orientation: int) -> Image.Image:
+    """
+    Apply an EXIF orientation to the decoded pixels.
+    """
+    method = {
+        2: Image.Transpose.FLIP_LEFT_RIGHT,
+        3: Image.Transpose.ROTATE_180,
+        4: Image.Transpose.FLIP_TOP_BOTTOM,
+        5: Image.Transpose.TRANSPOSE,
+        6: Image.Transpose.ROTATE_270,
+        7: Image.Transpose.TRANSVERSE,
+        8: Image.Transpose.ROTATE_90,
+    }.get(orientation)
+    return image.transpose(method) if method is not None else image
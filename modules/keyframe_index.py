@@ -0,0 +1,165 @@
+# keyframe_index.py
+# Per-file keyframe (GOP) index. Keyframe presentation timestamps are collected once from
+# packet flags - no decoding - and stored as an int64 .npy sidecar keyed by the file's
+# fingerprint, which later runs memory-map instead of demuxing the file again.
+
+import hashlib
+import json
+import os
+from fractions import Fraction
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+from modules.fingerprint import fingerprint_file
+
+KEYFRAME_INDEX_VERSION = 1
+
+
+class KeyframeIndex:
+    """
+    Sorted keyframe timestamps of a file's first video stream.
+
+    Args:
+        pts: Keyframe presentation timestamps in stream time_base units, relative to
+            the stream start (int64, may be a read-only memory map)
+        time_base: Stream time base
+        end_pts: End of the last frame in the same units
+    """
+
+    def __init__(self, pts: np.ndarray, time_base: Fraction, end_pts: int):
+        self.pts = pts
+        self.time_base = time_base
+        self.end_pts = end_pts
+        self.times = pts.astype(np.float64) * float(time_base)
+        self.duration = end_pts * float(time_base)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    def keyframe_at_or_before(self, time: float) -> float:
+        """
+        Latest keyframe at or before time (the first keyframe for earlier times).
+        """
+        if not len(self.times):
+            return 0.0
+        i = np.searchsorted(self.times, time, side="right") - 1
+        return float(self.times[max(i, 0)])
+
+    def keyframe_at_or_after(self, time: float) -> Optional[float]:
+        """
+        Earliest keyframe at or after time; None past the last keyframe.
+        """
+        i = np.searchsorted(self.times, time, side="left")
+        return float(self.times[i]) if i < len(self.times) else None
+
+    def gop_ranges(self, start: float, end: float) -> List[Tuple[float, float]]:
+        """
+        (start, end) of every GOP overlapping [start, end), in seconds. Their union is
+        the smallest keyframe-aligned range covering the interval.
+        """
+        if not len(self.times) or end <= start:
+            return []
+        first = max(np.searchsorted(self.times, start, side="right") - 1, 0)
+        last = np.searchsorted(self.times, end, side="left")
+        bounds = np.append(self.times, self.duration)
+        return [(float(bounds[i]), float(bounds[i + 1])) for i in range(first, max(last, first + 1))]
+
+
+def build_keyframe_index(video_path: Path) -> KeyframeIndex:
+    """
+    Demux every packet of the first video stream (nothing is decoded) and record the
+    keyframe timestamps. Container index entries are not used because MP4 indexes
+    store decode timestamps, which differ from presentation times on B-frame footage.
+    """
+    if av is None:
+        raise ImportError("PyAV is required to build keyframe indexes")
+    with av.open(str(video_path)) as container:
+        if not container.streams.video:
+            raise ValueError(f"No video stream in {video_path}")
+        stream = container.streams.video[0]
+        start = stream.start_time or 0
+        keyframes = []
+        end_pts = 0
+        for packet in container.demux(stream):
+            if packet.pts is None:
+                continue
+            if packet.is_keyframe:
+                keyframes.append(packet.pts - start)
+            end_pts = max(end_pts, packet.pts - start + (packet.duration or 0))
+        time_base = stream.time_base
+    return KeyframeIndex(np.unique(np.asarray(keyframes, dtype=np.int64)), Fraction(time_base), int(end_pts))
+
+
+def _cache_paths(video_path: Path, cache_dir: Path, fingerprint_mode: str = "sampled") -> Tuple[Path, Path]:
+    fingerprint = fingerprint_file(video_path, fingerprint_mode)
+    key = hashlib.sha256(f"{fingerprint}:{KEYFRAME_INDEX_VERSION}".encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"{key}.npy", Path(cache_dir) / f"{key}.json"
+
+
+def load_keyframe_index(
+    video_path: Path,
+    cache_dir: Optional[Path] = None,
+    fingerprint_mode: str = "sampled"
+) -> KeyframeIndex:
+    """
+    Keyframe index for video_path, memory-mapped from cache_dir when it was built
+    before, otherwise built and (with a cache_dir) saved.
+
+    Cache entries are keyed by the file's fingerprint in fingerprint_mode (see
+    fingerprint.FINGERPRINT_MODES); "sampled" keeps lookups cheap for long footage.
+    """
+    video_path = Path(video_path)
+    if cache_dir is None:
+        return build_keyframe_index(video_path)
+
+    array_file, meta_file = _cache_paths(video_path, cache_dir, fingerprint_mode)
+    try:
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        pts = np.load(array_file, mmap_mode="r")
+        return KeyframeIndex(pts, Fraction(*meta["time_base"]), meta["end_pts"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    index = build_keyframe_index(video_path)
+    try:
+        array_file.parent.mkdir(parents=True, exist_ok=True)
+        # The metadata file is written last and marks the entry complete
+        tmp_array = array_file.with_name(f"{array_file.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_array, index.pts)
+        os.replace(tmp_array, array_file)
+        tmp_meta = meta_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_meta, "w", encoding="utf-8") as f:
+            json.dump({
+                "time_base": [index.time_base.numerator, index.time_base.denominator],
+                "end_pts": index.end_pts,
+            }, f)
+        os.replace(tmp_meta, meta_file)
+    except OSError as e:
+        print(f"Error caching keyframe index: {e}")
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or load the keyframe index of a video.")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("--cache-dir", type=Path, default=None)
+    args = parser.parse_args()
+
+    for attempt in ("first", "second"):
+        started = time.perf_counter()
+        index = load_keyframe_index(args.video, args.cache_dir)
+        elapsed = time.perf_counter() - started
+        gops = np.diff(np.append(index.times, index.duration))
+        print(f"{attempt} load: {len(index)} keyframes over {index.duration:.1f}s in {elapsed:.3f}s "
+              f"(GOP mean {gops.mean():.2f}s, max {gops.max():.2f}s)")
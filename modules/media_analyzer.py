@@ -3,16 +3,44 @@ import mimetypes
 import json
 import os
 import base64
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 from pydantic import BaseModel
 from PIL import Image, ImageOps
 from io import BytesIO
 import cv2
 from pathlib import Path
+try:
+    import av
+except ImportError:
+    av = None
+from modules.fingerprint import fingerprint_file
+from modules.keyframe_index import load_keyframe_index
+from modules.directory_reader import VIDEO_EXTENSIONS, IMAGE_EXTENSIONS
+from modules.media_probe import probe_media, probe_media_files
+from modules.frame_sampler import sample_frames
+from modules.visual_features import compute_visual_features, visual_tags, brightness_label, dominant_colors
+from modules.image_loader import load_reduced_image
+from modules.derivative_store import get_derivative
+from modules.perceptual_hash import phash, hash_frames, hash_to_hex
+import numpy as np
 import datetime
-import hashlib
+import time
+import itertools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 
+# Number of upcoming videos whose headers are probed together in serial analysis
+PROBE_BATCH_SIZE = 32
+
+# Frames sampled per video for visual features
+VIDEO_SAMPLE_FRAMES = 8
+
+# Bumped when analysis gains new fields; cached items from older versions are re-analyzed
+ANALYSIS_VERSION = 2
+
 class MediaItem(BaseModel):
     file_path: Path
     file_type: str  # "image", "video", etc.
@@ -23,17 +51,45 @@ class MediaItem(BaseModel):
     tags: List[str] = []
     file_hash: str = ""
     analyzed_at: str = ""
+    # Stat snapshot taken when file_hash was computed; while it still matches the
+    # file on disk the cached analysis is reused without re-reading the content.
+    file_size: int = 0
+    file_mtime_ns: int = 0
+    file_inode: int = 0
+    # Stream metadata for videos (from media_probe)
+    fps: Optional[float] = None
+    codec: Optional[str] = None
+    bitrate: Optional[int] = None
+    rotation: Optional[int] = None
+    has_audio: Optional[bool] = None
+    keyframe_interval: Optional[float] = None
+    # Clip-level NumPy features (mean_luma, contrast, colorfulness, sharpness, motion_energy)
+    visual_features: Dict[str, float] = {}
+    dominant_colors: List[str] = []  # hex colors, most common first (images)
+    # 64-bit pHash (hex); for videos the majority vote over the sampled frames
+    perceptual_hash: Optional[str] = None
+    analysis_version: int = 0
 
 def encode_image(image, max_size=(1024, 1024)):
     """
     Downscale and encode the image to Base64.
+
+    Accepts a PIL image or a path. Paths are served from the derivative store, so a
+    photo is decoded (at reduced scale) once and later calls just read the stored
+    JPEG; callers that already hold a reduced image should pass it directly.
     """
     try:
-        # Correct orientation using EXIF metadata
-        image = ImageOps.exif_transpose(image)
+        if isinstance(image, (str, Path)):
+            derivative = get_derivative(Path(image), max_size[0], max_size[1])
+            if derivative is not None:
+                return base64.b64encode(derivative.read_bytes()).decode('utf-8')
+            image, _ = load_reduced_image(Path(image), max_size)
+        else:
+            # Correct orientation using EXIF metadata
+            image = ImageOps.exif_transpose(image)
 
         # Convert the image to RGB if it's in a mode like RGBA
-        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        if image.mode != "RGB":
             image = image.convert("RGB")
 
         # Downscale
@@ -48,10 +104,40 @@ def encode_image(image, max_size=(1024, 1024)):
         print(f"Error encoding image: {e}")
         return None
 
-def extract_frame(video_path, position=0.5):
+def _extract_frame_with_av(video_path, position, keyframe_cache_dir=None):
+    # Jump straight to the keyframe at or before the target and decode forward from
+    # there, instead of letting the demuxer guess where to start
+    index = load_keyframe_index(video_path, keyframe_cache_dir)
+    with av.open(str(video_path)) as container:
+        stream = container.streams.video[0]
+        start = stream.start_time or 0
+        # Same frame as int(frame_count * position) when the rate is known
+        rate = stream.average_rate or stream.guessed_rate
+        target = int(index.duration * rate * position) / rate if rate else index.duration * position
+        keyframe = index.keyframe_at_or_before(target)
+        container.seek(start + int(keyframe / index.time_base), stream=stream, backward=True, any_frame=False)
+        target_pts = start + int(target / index.time_base)
+        last = None
+        for frame in container.decode(stream):
+            last = frame
+            if frame.pts is not None and frame.pts >= target_pts:
+                break
+        if last is None:
+            raise IOError("Failed to read frame from the video.")
+        return last.to_image()
+
+def extract_frame(video_path, position=0.5, keyframe_cache_dir=None):
     """
     Extract a representative frame from the video as a PIL Image.
+
+    With PyAV the decode starts at the keyframe before the target, found in the
+    file's keyframe index (cached in keyframe_cache_dir when given).
     """
+    if av is not None:
+        try:
+            return _extract_frame_with_av(video_path, position, keyframe_cache_dir)
+        except Exception as e:
+            print(f"Error seeking {video_path} by keyframe, falling back to cv2: {e}")
     try:
         cap = cv2.VideoCapture(str(video_path))
         if not cap.isOpened():
@@ -79,7 +165,15 @@ def extract_frame(video_path, position=0.5):
 def get_video_info(video_path: Path) -> Dict[str, Any]:
     """
     Extract detailed information about a video file.
+
+    Stream headers are read with media_probe (exact container duration, rotation-aware
+    dimensions, codec, bitrate, audio presence, keyframe interval). cv2 is only used
+    as a fallback when the file cannot be probed.
     """
+    info = probe_media(video_path)
+    if info:
+        return info
+
     try:
         cap = cv2.VideoCapture(str(video_path))
         if not cap.isOpened():
@@ -127,44 +221,51 @@ def analyze_brightness(image: Image.Image) -> str:
     Analyze the brightness of an image.
     """
     try:
-        grayscale = image.convert('L')
-        histogram = grayscale.histogram()
-        pixels = sum(histogram)
-        brightness = sum(i * histogram[i] for i in range(256)) / pixels
-        
-        if brightness < 85:
-            return "dark"
-        elif brightness > 170:
-            return "bright"
-        else:
-            return "balanced"
-    except:
+        histogram = np.asarray(image.convert('L').histogram(), dtype=np.float64)
+        brightness = float(histogram @ np.arange(256)) / histogram.sum()
+        return brightness_label(brightness)
+    except Exception:
         return "unknown"
 
-def get_file_hash(filepath: Path) -> str:
+def get_file_hash(filepath: Path, mode: str = "full") -> str:
     """
-    Calculate a hash of the file content to identify changes.
+    Calculate a fingerprint of the file content to identify changes.
+
+    Args:
+        filepath: File to hash
+        mode: Fingerprint mode, see modules.fingerprint.FINGERPRINT_MODES
     """
     try:
-        hash_md5 = hashlib.md5()
-        with open(filepath, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return fingerprint_file(filepath, mode)
     except Exception as e:
         print(f"Error calculating file hash: {e}")
         return ""
 
-def analyze_single_media_file(file_path: Path, context: str = "") -> MediaItem:
+def get_file_stat_key(file_path: Path, stat_result: os.stat_result = None) -> tuple:
+    """
+    Return the (resolved path, size, mtime_ns, inode) tuple used to detect file changes
+    without hashing the content. os.DirEntry objects reuse the stat from the scan.
+    """
+    if stat_result is None and isinstance(file_path, os.DirEntry):
+        stat_result = file_path.stat()
+    st = stat_result or os.stat(file_path)
+    return (os.path.realpath(file_path), st.st_size, st.st_mtime_ns, st.st_ino)
+
+def analyze_single_media_file(file_path: Path, context: str = "", file_hash: Optional[str] = None) -> MediaItem:
     """
     Analyze a single media file without AI.
+
+    Args:
+        file_path: File to analyze
+        context: Marketing or creative context used for tagging
+        file_hash: Content hash if the caller already computed it (avoids a second read)
     """
     # Determine media type
     mtype, _ = mimetypes.guess_type(file_path)
     if mtype is None:
-        if file_path.suffix.lower() in [".mp4", ".mov", ".mkv", ".webm", ".m4v", ".avi"]:
+        if file_path.suffix.lower() in VIDEO_EXTENSIONS:
             file_type = "video"
-        elif file_path.suffix.lower() in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]:
+        elif file_path.suffix.lower() in IMAGE_EXTENSIONS:
             file_type = "image"
         else:
             file_type = "unknown"
@@ -178,42 +279,50 @@ def analyze_single_media_file(file_path: Path, context: str = "") -> MediaItem:
     # Initialize variables
     duration = None
     dimensions = None
+    stream_info = {}
+    visual_features = {}
+    dominant = []
+    perceptual = None
     tags = []
     description = ""
     suggested_usage = ""
     
     # Analyze based on file type
     if file_type == "image":
-        info = get_image_info(file_path)
-        if info:
-            dimensions = (info.get("width"), info.get("height"))
-            
-            # Analyze image properties
-            try:
-                with Image.open(file_path) as img:
-                    brightness = analyze_brightness(img)
-                    tags.append(f"brightness:{brightness}")
-                    
-                    # Determine orientation
-                    if dimensions[0] > dimensions[1]:
-                        tags.append("landscape")
-                        suggested_usage = "Good for wide shots, backgrounds, or establishing scenes"
-                    elif dimensions[0] < dimensions[1]:
-                        tags.append("portrait")
-                        suggested_usage = "Perfect for mobile-first content, close-ups, or single subjects"
-                    else:
-                        tags.append("square")
-                        suggested_usage = "Ideal for social media posts or balanced compositions"
-                    
-                    # Basic description
-                    description = f"{file_path.name}: {dimensions[0]}x{dimensions[1]} {file_type}, {brightness} lighting"
-            except:
-                description = f"{file_path.name}: Image file"
-                suggested_usage = "Could be used for various purposes"
+        try:
+            # One reduced-scale decode feeds dimensions, orientation and every feature
+            reduced, info = load_reduced_image(file_path)
+            dimensions = (info["width"], info["height"])
+            rgb = np.asarray(reduced)
+            visual_features = compute_visual_features(rgb)
+            visual_features.pop("motion_energy", None)
+            dominant = dominant_colors(rgb)
+            perceptual = hash_to_hex(phash(reduced))
+            brightness = brightness_label(visual_features["mean_luma"])
+            tags.extend(visual_tags(visual_features))
+
+            # Determine orientation
+            if dimensions[0] > dimensions[1]:
+                tags.append("landscape")
+                suggested_usage = "Good for wide shots, backgrounds, or establishing scenes"
+            elif dimensions[0] < dimensions[1]:
+                tags.append("portrait")
+                suggested_usage = "Perfect for mobile-first content, close-ups, or single subjects"
+            else:
+                tags.append("square")
+                suggested_usage = "Ideal for social media posts or balanced compositions"
+
+            # Basic description
+            description = f"{file_path.name}: {dimensions[0]}x{dimensions[1]} {file_type}, {brightness} lighting"
+        except Exception as e:
+            print(f"Error analyzing image {file_path}: {e}")
+            description = f"{file_path.name}: Image file"
+            suggested_usage = "Could be used for various purposes"
     
     elif file_type == "video":
         info = get_video_info(file_path)
         if info:
+            stream_info = info
             duration = info.get("duration", 0)
             dimensions = (info.get("width"), info.get("height"))
             fps = info.get("fps", 0)
@@ -242,8 +351,23 @@ def analyze_single_media_file(file_path: Path, context: str = "") -> MediaItem:
                 tags.append("smooth-motion")
             elif fps >= 24:
                 tags.append("standard-fps")
+
+            # Visual features from evenly spaced frames, decoded in a single pass. Odd
+            # frames (e.g. sizes changing mid-stream) only cost the visual tags, not the
+            # metadata probed above.
+            try:
+                frames = sample_frames(file_path, VIDEO_SAMPLE_FRAMES)
+                visual_features = compute_visual_features(frames)
+                tags.extend(visual_tags(visual_features))
+                if frames:
+                    perceptual = hash_to_hex(hash_frames(frames))
+            except Exception as e:
+                print(f"Error computing visual features of {file_path}: {e}")
+                visual_features = {}
             
             description = f"{file_path.name}: {dimensions[0]}x{dimensions[1]} video, {round(duration, 2)}s at {round(fps)}fps"
+            if visual_features:
+                description += f", {brightness_label(visual_features['mean_luma'])} lighting"
         else:
             description = f"{file_path.name}: Video file"
             suggested_usage = "Video content"
@@ -262,6 +386,11 @@ def analyze_single_media_file(file_path: Path, context: str = "") -> MediaItem:
         if any(word in context_lower for word in ["promo", "sale", "discount"]):
             tags.append("promotional")
     
+    try:
+        _, file_size, file_mtime_ns, file_inode = get_file_stat_key(file_path)
+    except OSError:
+        file_size, file_mtime_ns, file_inode = 0, 0, 0
+
     return MediaItem(
         file_path=file_path,
         file_type=file_type,
@@ -270,62 +399,287 @@ def analyze_single_media_file(file_path: Path, context: str = "") -> MediaItem:
         description=description,
         suggested_usage=suggested_usage,
         tags=tags,
-        file_hash=get_file_hash(file_path),
-        analyzed_at=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        file_hash=file_hash if file_hash is not None else get_file_hash(file_path),
+        analyzed_at=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        file_size=file_size,
+        file_mtime_ns=file_mtime_ns,
+        file_inode=file_inode,
+        fps=stream_info.get("fps"),
+        codec=stream_info.get("codec"),
+        bitrate=stream_info.get("bitrate"),
+        rotation=stream_info.get("rotation"),
+        has_audio=stream_info.get("has_audio"),
+        keyframe_interval=stream_info.get("keyframe_interval"),
+        visual_features=visual_features,
+        dominant_colors=dominant,
+        perceptual_hash=perceptual,
+        analysis_version=ANALYSIS_VERSION
     )
 
+def _analyze_file_safe(
+    file_path: Path,
+    context: str = "",
+    stale_item: Optional[MediaItem] = None,
+    hash_mode: str = "full"
+):
+    """
+    Worker entry point: analyze one file and return (item, error) instead of raising,
+    so a single corrupt file never takes down the rest of the batch.
+
+    The content hash is computed exactly once here. If it matches stale_item (a cache
+    entry whose stat snapshot no longer matches, e.g. after a touch or copy), the cached
+    analysis is kept and only its stat snapshot is refreshed.
+    """
+    try:
+        file_hash = get_file_hash(file_path, hash_mode)
+        if stale_item is not None and file_hash and stale_item.file_hash == file_hash \
+                and stale_item.analysis_version >= ANALYSIS_VERSION:
+            _, file_size, file_mtime_ns, file_inode = get_file_stat_key(file_path)
+            return stale_item.copy(update={
+                "file_size": file_size,
+                "file_mtime_ns": file_mtime_ns,
+                "file_inode": file_inode
+            }), None
+        return analyze_single_media_file(file_path, context, file_hash=file_hash), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _iter_analysis_results(
+    jobs,
+    context: str = "",
+    workers: int = 1,
+    progress_callback: Optional[Callable[[int, Optional[int], float], None]] = None,
+    total: Optional[int] = None,
+    hash_mode: str = "full"
+):
+    """
+    Run analysis for (file_path, cached_item, stale_item) jobs and yield
+    (file_path, item, error) in submission order. Jobs with an up-to-date cached item
+    are passed straight through; the rest are analyzed in-process (workers <= 1) or
+    fanned out across a process pool.
+    """
+    started = time.perf_counter()
+    completed = 0
+
+    def report():
+        if progress_callback:
+            elapsed = time.perf_counter() - started
+            rate = completed / elapsed if elapsed > 0 else 0.0
+            try:
+                progress_callback(completed, total, rate)
+            except Exception as e:
+                print(f"Error in progress callback: {e}")
+
+    if workers <= 1:
+        # Probe the stream headers of the next batch of videos concurrently; the
+        # per-file analysis below then picks the results up from the probe cache.
+        jobs = iter(jobs)
+        while True:
+            batch = list(itertools.islice(jobs, PROBE_BATCH_SIZE))
+            if not batch:
+                break
+            videos = [job[0] for job in batch if job[1] is None and Path(job[0]).suffix.lower() in VIDEO_EXTENSIONS]
+            if len(videos) > 1:
+                probe_media_files(videos)
+            for file_path, cached_item, stale_item in batch:
+                if cached_item is not None:
+                    item, error = cached_item, None
+                else:
+                    item, error = _analyze_file_safe(file_path, context, stale_item, hash_mode)
+                completed += 1
+                report()
+                yield file_path, item, error
+        return
+
+    # Keep a bounded window of outstanding work so results stream back while the
+    # input iterable is still being consumed.
+    window = workers * 4
+    pending = deque()
+    executor = None
+    # Single-worker pool for files that were outstanding when a worker crashed
+    isolated = None
+
+    def new_pool(max_workers):
+        # spawn avoids forking a parent that already runs cv2/Streamlit/asyncio threads
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(file_path, stale_item):
+        nonlocal executor
+        if executor is None:
+            executor = new_pool(workers)
+        return executor.submit(_analyze_file_safe, file_path, context, stale_item, hash_mode)
+
+    def run_isolated(file_path, stale_item):
+        # Alone in its pool, a file that kills the worker is the one that crashed it
+        nonlocal isolated
+        if isolated is None:
+            isolated = new_pool(1)
+        try:
+            return isolated.submit(_analyze_file_safe, file_path, context, stale_item, hash_mode).result()
+        except BrokenProcessPool:
+            isolated.shutdown(wait=False, cancel_futures=True)
+            isolated = None
+            return None, "worker process crashed while analyzing this file"
+
+    def drain_head():
+        nonlocal executor, completed
+        file_path, cached_item, stale_item, future = pending.popleft()
+        if cached_item is not None:
+            item, error = cached_item, None
+        elif future is None:
+            item, error = run_isolated(file_path, stale_item)
+        else:
+            try:
+                item, error = future.result()
+            except BrokenProcessPool:
+                # A worker died (e.g. a decoder segfault), which fails every outstanding
+                # future, so the crash cannot be pinned on this file. Restart the pool
+                # for new work and rerun each file without a result one at a time, so
+                # only a file that crashes on its own is dropped.
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = None
+                for i, (path_i, cached_i, stale_i, future_i) in enumerate(pending):
+                    if future_i is not None and not (future_i.done() and future_i.exception() is None):
+                        pending[i] = (path_i, cached_i, stale_i, None)
+                item, error = run_isolated(file_path, stale_item)
+        completed += 1
+        report()
+        return file_path, item, error
+
+    try:
+        for file_path, cached_item, stale_item in jobs:
+            future = None if cached_item is not None else submit(file_path, stale_item)
+            pending.append((file_path, cached_item, stale_item, future))
+            while len(pending) >= window:
+                yield drain_head()
+        while pending:
+            yield drain_head()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        if isolated is not None:
+            isolated.shutdown(wait=True, cancel_futures=True)
+
 def analyze_media_files(
     media_files: List[Path],
     context: str = "",
-    cache_path: Path = None
+    cache_path: Path = None,
+    workers: int = 1,
+    progress_callback: Optional[Callable[[int, Optional[int], float], None]] = None,
+    media_index=None,
+    hash_mode: str = "full"
 ) -> List[MediaItem]:
     """
     Analyze multiple media files.
+
+    Cache entries are keyed by resolved path. A file whose (size, mtime_ns, inode) still
+    matches its entry is reused without being read; otherwise it is hashed once and only
+    re-analyzed if the content actually changed.
+
+    Args:
+        media_files: Files to analyze; any iterable of paths or os.DirEntry objects, so a
+            directory_reader.iter_media_entries scan can be streamed straight in
+        context: Marketing or creative context used for tagging
+        cache_path: Optional cache of previous results. A .db/.sqlite path opens a
+            MediaIndex; any other path is treated as the legacy JSON cache.
+        workers: Number of analysis processes (1 = analyze in-process, 0 = one per CPU)
+        progress_callback: Called as (completed, total, files_per_sec) after every file
+        media_index: Optional MediaIndex to read from and upsert into. Unlike the JSON
+            cache, only the requested files are returned, since an index may be shared
+            between several media directories.
+        hash_mode: Fingerprint mode used when a file's stat snapshot changed; "sampled"
+            trades content identity for near-constant cost on huge videos
     """
+    if not workers or workers < 0:
+        workers = os.cpu_count() or 1
+
+    if media_index is None and cache_path and Path(cache_path).suffix.lower() in (".db", ".sqlite", ".sqlite3"):
+        from modules.media_index import MediaIndex
+        media_index = MediaIndex(Path(cache_path))
+        cache_path = None
+
     # Load cache if available
     cached_items = []
     cached_file_dict = {}
-    if cache_path and cache_path.exists():
+    index_snapshot = {}
+    if media_index is not None:
+        try:
+            index_snapshot = media_index.stat_snapshot()
+        except Exception as e:
+            print(f"Error reading media index: {e}")
+    elif cache_path and cache_path.exists():
         try:
             with open(cache_path, 'r') as f:
                 cached_data = json.load(f)
             for item_data in cached_data:
                 item_data['file_path'] = Path(item_data['file_path'])
                 cached_items.append(MediaItem(**item_data))
-            cached_file_dict = {item.file_path.name: (item, item.file_hash) for item in cached_items}
+            cached_file_dict = {str(item.file_path): item for item in cached_items}
         except Exception as e:
             print(f"Error loading cache: {e}")
+
+    def lookup(path_key: str) -> Optional[MediaItem]:
+        if media_index is not None:
+            return media_index.get(path_key) if path_key in index_snapshot else None
+        return cached_file_dict.get(path_key)
+
+    def is_fresh(path_key: str, stat_key: tuple) -> bool:
+        if media_index is not None:
+            entry = index_snapshot.get(path_key)
+            return entry is not None and bool(entry[3]) and entry[:3] == stat_key
+        cached_item = cached_file_dict.get(path_key)
+        return cached_item is not None and bool(cached_item.file_hash) and \
+            (cached_item.file_size, cached_item.file_mtime_ns, cached_item.file_inode) == stat_key
     
     # Analyze files
     all_items = []
     processed_files = set()
-    
-    for file_path in media_files:
-        try:
-            file_path = Path(file_path).resolve()
-            file_hash = get_file_hash(file_path)
-            processed_files.add(file_path.name)
-            
-            # Use cache if file hasn't changed
-            if file_path.name in cached_file_dict and cached_file_dict[file_path.name][1] == file_hash:
-                all_items.append(cached_file_dict[file_path.name][0])
+    reused_files = set()
+
+    def jobs():
+        for file_path in media_files:
+            try:
+                path_key, file_size, file_mtime_ns, file_inode = get_file_stat_key(file_path)
+            except Exception as e:
+                print(f"Error analyzing {file_path}: {e}")
                 continue
-            
-            # Analyze the file
-            item = analyze_single_media_file(file_path, context)
-            all_items.append(item)
-            
-        except Exception as e:
-            print(f"Error analyzing {file_path}: {e}")
+            processed_files.add(path_key)
+
+            # Use cache without reading the file if its stat snapshot hasn't changed
+            cached_item = lookup(path_key)
+            if cached_item is not None and cached_item.analysis_version >= ANALYSIS_VERSION \
+                    and is_fresh(path_key, (file_size, file_mtime_ns, file_inode)):
+                reused_files.add(path_key)
+                yield Path(path_key), cached_item, None
+            else:
+                yield Path(path_key), None, cached_item
+
+    total = len(media_files) if hasattr(media_files, "__len__") else None
+    for file_path, item, error in _iter_analysis_results(
+        jobs(), context, workers, progress_callback, total, hash_mode
+    ):
+        if error:
+            print(f"Error analyzing {file_path}: {error}")
             continue
+        all_items.append(item)
+
+    changed_items = [item for item in all_items if str(item.file_path) not in reused_files]
+
+    if media_index is not None:
+        if changed_items:
+            try:
+                media_index.upsert_many(changed_items)
+            except Exception as e:
+                print(f"Error updating media index: {e}")
+        return all_items
     
     # Include cached items that weren't in the current media_files
     for cached_item in cached_items:
-        if cached_item.file_path.name not in processed_files:
+        if str(cached_item.file_path) not in processed_files:
             all_items.append(cached_item)
     
-    # Save cache if path provided
-    if cache_path:
+    # Save cache if path provided and something changed
+    if cache_path and (changed_items or not cache_path.exists()):
         try:
             cache_data = []
             for item in all_items:
@@ -0,0 +1,226 @@
+# media_index.py
+# Persistent SQLite index of analyzed media. Replaces the whole-file JSON media cache:
+# rows are upserted individually, lookups by path/hash/type/tag hit indexes, and the
+# database (in WAL mode) can be shared by the Streamlit automation thread and the MCP server.
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from modules.media_analyzer import MediaItem
+
+MEDIA_INDEX_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL DEFAULT '',
+    file_type TEXT NOT NULL DEFAULT '',
+    file_size INTEGER NOT NULL DEFAULT 0,
+    file_mtime_ns INTEGER NOT NULL DEFAULT 0,
+    file_inode INTEGER NOT NULL DEFAULT 0,
+    duration REAL,
+    analyzed_at TEXT NOT NULL DEFAULT '',
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_media_hash ON media(file_hash);
+CREATE INDEX IF NOT EXISTS idx_media_type ON media(file_type);
+CREATE TABLE IF NOT EXISTS media_tags (
+    path TEXT NOT NULL REFERENCES media(path) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (path, tag)
+);
+CREATE INDEX IF NOT EXISTS idx_media_tags_tag ON media_tags(tag);
+"""
+
+
+class MediaIndex:
+    """
+    SQLite-backed store of MediaItem rows keyed by resolved file path.
+
+    Each thread gets its own connection; WAL mode lets readers run while another
+    thread or process writes.
+    """
+
+    def __init__(self, db_path: Path, timeout: float = 30.0):
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _row_to_item(data: str) -> MediaItem:
+        item_data = json.loads(data)
+        item_data["file_path"] = Path(item_data["file_path"])
+        return MediaItem(**item_data)
+
+    def stat_snapshot(self) -> Dict[str, Tuple[int, int, int, str]]:
+        """
+        Return {path: (size, mtime_ns, inode, file_hash)} for every row without
+        materializing any MediaItem.
+        """
+        rows = self._connect().execute(
+            "SELECT path, file_size, file_mtime_ns, file_inode, file_hash FROM media"
+        )
+        return {row[0]: (row[1], row[2], row[3], row[4]) for row in rows}
+
+    def get(self, path) -> Optional[MediaItem]:
+        row = self._connect().execute(
+            "SELECT data FROM media WHERE path = ?", (str(path),)
+        ).fetchone()
+        return self._row_to_item(row[0]) if row else None
+
+    def get_many(self, paths: Iterable) -> Iterator[MediaItem]:
+        """
+        Lazily materialize the rows for the given paths, in the given order.
+        """
+        conn = self._connect()
+        for path in paths:
+            row = conn.execute("SELECT data FROM media WHERE path = ?", (str(path),)).fetchone()
+            if row:
+                yield self._row_to_item(row[0])
+
+    def find_by_hash(self, file_hash: str) -> List[MediaItem]:
+        rows = self._connect().execute("SELECT data FROM media WHERE file_hash = ?", (file_hash,))
+        return [self._row_to_item(row[0]) for row in rows]
+
+    def iter_items(self, file_type: Optional[str] = None, tag: Optional[str] = None) -> Iterator[MediaItem]:
+        """
+        Lazily iterate indexed items, optionally filtered by file type and/or tag.
+        """
+        query = "SELECT m.data FROM media m"
+        params = []
+        if tag is not None:
+            query += " JOIN media_tags t ON t.path = m.path AND t.tag = ?"
+            params.append(tag)
+        if file_type is not None:
+            query += " WHERE m.file_type = ?"
+            params.append(file_type)
+        query += " ORDER BY m.path"
+        for row in self._connect().execute(query, params):
+            yield self._row_to_item(row[0])
+
+    def paths_with_tag(self, tag: str) -> List[str]:
+        rows = self._connect().execute("SELECT path FROM media_tags WHERE tag = ? ORDER BY path", (tag,))
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def upsert_many(self, items: Iterable[MediaItem]) -> int:
+        """
+        Insert or replace items in a single transaction. Returns the number written.
+        """
+        conn = self._connect()
+        written = 0
+        with conn:
+            for item in items:
+                item_dict = item.dict()
+                item_dict["file_path"] = str(item_dict["file_path"])
+                path = item_dict["file_path"]
+                conn.execute(
+                    """
+                    INSERT INTO media (path, file_hash, file_type, file_size, file_mtime_ns,
+                                       file_inode, duration, analyzed_at, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(path) DO UPDATE SET
+                        file_hash = excluded.file_hash,
+                        file_type = excluded.file_type,
+                        file_size = excluded.file_size,
+                        file_mtime_ns = excluded.file_mtime_ns,
+                        file_inode = excluded.file_inode,
+                        duration = excluded.duration,
+                        analyzed_at = excluded.analyzed_at,
+                        data = excluded.data
+                    """,
+                    (
+                        path, item.file_hash, item.file_type, item.file_size, item.file_mtime_ns,
+                        item.file_inode, item.duration, item.analyzed_at, json.dumps(item_dict)
+                    )
+                )
+                conn.execute("DELETE FROM media_tags WHERE path = ?", (path,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO media_tags (path, tag) VALUES (?, ?)",
+                    [(path, tag) for tag in item.tags]
+                )
+                written += 1
+        return written
+
+    def upsert(self, item: MediaItem):
+        self.upsert_many([item])
+
+    def remove(self, paths: Iterable) -> int:
+        conn = self._connect()
+        with conn:
+            cursor = conn.executemany("DELETE FROM media WHERE path = ?", [(str(p),) for p in paths])
+        return cursor.rowcount
+
+    def import_json_cache(self, json_path: Path, media_root: Optional[Path] = None) -> int:
+        """
+        Import an existing media_cache.json into the index.
+
+        Both MediaItem-shaped entries (written by analyze_media_files) and the older
+        {filename, media_type, description} entries are accepted. Older entries carry no
+        hash or stat snapshot, so they are re-analyzed the next time their file is scanned.
+
+        Args:
+            json_path: Path to the JSON cache file
+            media_root: Directory used to resolve entries that only record a filename
+        """
+        with open(json_path, "r") as f:
+            cached_data = json.load(f)
+
+        media_root = Path(media_root) if media_root else Path(json_path).parent
+        items = []
+        for entry in cached_data:
+            try:
+                if "file_path" in entry:
+                    entry["file_path"] = Path(entry["file_path"]).resolve()
+                    items.append(MediaItem(**entry))
+                elif "filename" in entry:
+                    matches = list(media_root.rglob(entry["filename"]))
+                    file_path = matches[0] if matches else media_root / entry["filename"]
+                    items.append(MediaItem(
+                        file_path=file_path.resolve(),
+                        file_type=entry.get("media_type", "unknown"),
+                        description=entry.get("description", ""),
+                        suggested_usage=entry.get("relevance", "")
+                    ))
+            except Exception as e:
+                print(f"Skipping cache entry {entry}: {e}")
+
+        return self.upsert_many(items)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Import a JSON media cache into a SQLite media index.")
+    parser.add_argument("json", help="Path to the existing media_cache.json")
+    parser.add_argument("index", help="Path to the SQLite media index to create or update")
+    parser.add_argument("--media-root", help="Directory used to resolve entries that only store a filename")
+    args = parser.parse_args()
+
+    index = MediaIndex(Path(args.index))
+    imported = index.import_json_cache(Path(args.json), Path(args.media_root) if args.media_root else None)
+    print(f"Imported {imported} entries into {args.index} ({index.count()} total)")
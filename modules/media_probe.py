@@ -0,0 +1,317 @@
+# media_probe.py
+# Header-level metadata probing for video files. Reads container and stream headers
+# (in-process with PyAV when installed, otherwise with concurrent ffprobe calls) instead
+# of opening a full cv2 decoder per file.
+
+import json
+import math
+import os
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import av
+except ImportError:
+    av = None
+
+FFPROBE_BINARY = os.getenv("FFPROBE_BINARY", "ffprobe")
+
+# Packets (or index entries) inspected to estimate the keyframe interval
+KEYFRAME_SAMPLE_PACKETS = 300
+
+PROBE_CONTAINER_OPTIONS = {"analyzeduration": "0", "probesize": "65536"}
+
+# Probe results are memoized per (path, size, mtime) so a batch prefetch can feed
+# the per-file analysis that follows it.
+_PROBE_CACHE_SIZE = 4096
+_probe_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_probe_cache_lock = threading.Lock()
+
+
+def _cache_key(path: Path) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+
+def _keyframe_interval(keyframe_times: List[float]) -> Optional[float]:
+    if len(keyframe_times) < 2:
+        return None
+    keyframe_times = sorted(keyframe_times)
+    gaps = [b - a for a, b in zip(keyframe_times, keyframe_times[1:]) if b > a]
+    return round(sum(gaps) / len(gaps), 3) if gaps else None
+
+
+def _iter_boxes(f, start: int, end: int):
+    """
+    Yield (type, payload offset, payload end) for the ISO-BMFF boxes in [start, end).
+    """
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        payload = offset + 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            payload += 8
+        elif size == 0:
+            size = end - offset
+        if size < 8:
+            return
+        yield box_type, payload, min(offset + size, end)
+        offset += size
+
+
+def _clockwise(degrees: float) -> int:
+    """
+    Rotation in the convention every probe backend reports: clockwise degrees in
+    [0, 360), as in the legacy "rotate" tag.
+    """
+    return int(round(degrees)) % 360
+
+
+def _mp4_rotation(path: Path) -> Optional[int]:
+    """
+    Read the video track rotation from the MP4/MOV track header (tkhd) display matrix.
+    Only box headers are read, so this works without decoding and whether the moov box
+    sits at the start or the end of the file. Returns None for non-ISO-BMFF files.
+    """
+    try:
+        with open(path, "rb") as f:
+            file_end = os.fstat(f.fileno()).st_size
+            moov = next(((p, e) for t, p, e in _iter_boxes(f, 0, file_end) if t == b"moov"), None)
+            if moov is None:
+                return None
+            for box_type, trak_start, trak_end in _iter_boxes(f, *moov):
+                if box_type != b"trak":
+                    continue
+                tkhd = None
+                handler = None
+                for child_type, child_start, child_end in _iter_boxes(f, trak_start, trak_end):
+                    if child_type == b"tkhd":
+                        tkhd = child_start
+                    elif child_type == b"mdia":
+                        for mdia_type, mdia_start, _ in _iter_boxes(f, child_start, child_end):
+                            if mdia_type == b"hdlr":
+                                f.seek(mdia_start + 8)
+                                handler = f.read(4)
+                if handler != b"vide" or tkhd is None:
+                    continue
+                f.seek(tkhd)
+                version = f.read(1)[0]
+                # version/flags, creation/modification time, track id, reserved, duration,
+                # then reserved, layer, alternate group, volume, reserved -> 3x3 matrix
+                times_size = 8 + 8 + 4 + 4 + 8 if version == 1 else 4 + 4 + 4 + 4 + 4
+                f.seek(tkhd + 4 + times_size + 8 + 2 + 2 + 2 + 2)
+                a, b, _, c, d = struct.unpack(">iiiii", f.read(20))
+                angle = math.degrees(math.atan2(b / 65536.0, a / 65536.0))
+                # ffmpeg reports -angle, the counterclockwise display rotation
+                return _clockwise(angle)
+    except (OSError, struct.error, IndexError):
+        return None
+    return None
+
+
+def _finalize(info: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Derive display dimensions and the fields get_video_info has always returned.
+    """
+    width, height = info.get("width") or 0, info.get("height") or 0
+    if abs(info.get("rotation") or 0) % 180 == 90:
+        width, height = height, width
+    info["width"], info["height"] = width, height
+    fps = info.get("fps") or 0
+    duration = info.get("duration") or 0
+    info["frame_count"] = int(round(duration * fps)) if fps else 0
+    info["aspect_ratio"] = f"{width}:{height}"
+    return info
+
+
+def _probe_with_av(path: Path) -> Dict[str, Any]:
+    # Stream parameters come from the headers; skip the long packet analysis ffmpeg
+    # otherwise runs to guess them (this dominates open time for MKV/WebM)
+    with av.open(str(path), container_options=PROBE_CONTAINER_OPTIONS) as container:
+        if not container.streams.video:
+            return {}
+        stream = container.streams.video[0]
+        codec = stream.codec_context
+
+        if container.duration is not None:
+            duration = container.duration / av.time_base
+        elif stream.duration is not None:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = 0.0
+
+        rate = stream.average_rate or stream.guessed_rate
+        fps = float(rate) if rate else 0.0
+
+        # Keyframe positions: from the container index when present (MP4/MOV keep it in
+        # the header), otherwise from the flags of the first packets - never decoded.
+        keyframe_times = []
+        time_base = float(stream.time_base)
+        entries = stream.index_entries
+        if entries is not None and len(entries) > 1:
+            for i in range(min(len(entries), KEYFRAME_SAMPLE_PACKETS)):
+                entry = entries[i]
+                if entry.is_keyframe:
+                    keyframe_times.append(entry.timestamp * time_base)
+        else:
+            for i, packet in enumerate(container.demux(stream)):
+                if i >= KEYFRAME_SAMPLE_PACKETS:
+                    break
+                if packet.pts is not None and packet.is_keyframe:
+                    keyframe_times.append(packet.pts * time_base)
+            container.seek(0)
+
+        rotate_tag = stream.metadata.get("rotate")
+        if rotate_tag is not None:
+            rotation = _clockwise(float(rotate_tag))
+        else:
+            # PyAV does not expose the stream display matrix, so read it from the header
+            rotation = _mp4_rotation(path) or 0
+
+        audio = container.streams.audio[0] if container.streams.audio else None
+        return _finalize({
+            "width": codec.width,
+            "height": codec.height,
+            "fps": fps,
+            "duration": duration,
+            "rotation": rotation,
+            "codec": codec.name,
+            "bitrate": container.bit_rate or codec.bit_rate or 0,
+            "has_audio": audio is not None,
+            "audio_codec": audio.codec_context.name if audio is not None else None,
+            "keyframe_interval": _keyframe_interval(keyframe_times),
+        })
+
+
+def _parse_rate(rate: Optional[str]) -> float:
+    if not rate or rate == "0/0":
+        return 0.0
+    if "/" in rate:
+        num, den = rate.split("/", 1)
+        return float(num) / float(den) if float(den) else 0.0
+    return float(rate)
+
+
+def _probe_with_ffprobe(path: Path) -> Dict[str, Any]:
+    cmd = [
+        FFPROBE_BINARY, "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        # Packet flags (no decoding) for the first packets give the keyframe interval
+        "-show_entries", "packet=stream_index,pts_time,flags",
+        "-analyzeduration", "0", "-probesize", "65536",
+        "-read_intervals", f"%+#{KEYFRAME_SAMPLE_PACKETS}",
+        str(path)
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    data = json.loads(result.stdout.decode("utf-8", errors="ignore") or "{}")
+
+    streams = data.get("streams", [])
+    video_streams = [s for s in streams if s.get("codec_type") == "video"]
+    audio_streams = [s for s in streams if s.get("codec_type") == "audio"]
+    if not video_streams:
+        return {}
+    stream = video_streams[0]
+    fmt = data.get("format", {})
+
+    rotation = 0
+    if "rotate" in stream.get("tags", {}):
+        rotation = _clockwise(float(stream["tags"]["rotate"]))
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            # ffmpeg's display matrix angle, counterclockwise
+            rotation = _clockwise(-float(side_data["rotation"]))
+
+    keyframe_times = [
+        float(packet["pts_time"]) for packet in data.get("packets", [])
+        if packet.get("stream_index") == stream.get("index")
+        and "K" in packet.get("flags", "")
+        and packet.get("pts_time") not in (None, "N/A")
+    ]
+
+    return _finalize({
+        "width": int(stream.get("width", 0)),
+        "height": int(stream.get("height", 0)),
+        "fps": _parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate")),
+        "duration": float(fmt.get("duration") or stream.get("duration") or 0),
+        "rotation": rotation,
+        "codec": stream.get("codec_name"),
+        "bitrate": int(fmt.get("bit_rate") or stream.get("bit_rate") or 0),
+        "has_audio": bool(audio_streams),
+        "audio_codec": audio_streams[0].get("codec_name") if audio_streams else None,
+        "keyframe_interval": _keyframe_interval(keyframe_times),
+    })
+
+
+def probe_media(path: Path) -> Dict[str, Any]:
+    """
+    Read stream metadata for a video file without decoding it.
+
+    Returns:
+        Dictionary with width/height (display orientation), fps, exact duration,
+        rotation, codec, bitrate, has_audio, audio_codec, keyframe_interval,
+        frame_count and aspect_ratio; empty if the file could not be probed.
+    """
+    key = _cache_key(path)
+    if key is not None:
+        with _probe_cache_lock:
+            if key in _probe_cache:
+                _probe_cache.move_to_end(key)
+                return dict(_probe_cache[key])
+
+    try:
+        info = _probe_with_av(path) if av is not None else _probe_with_ffprobe(path)
+    except Exception as e:
+        print(f"Error probing {path}: {e}")
+        return {}
+
+    if key is not None and info:
+        with _probe_cache_lock:
+            _probe_cache[key] = info
+            while len(_probe_cache) > _PROBE_CACHE_SIZE:
+                _probe_cache.popitem(last=False)
+    return dict(info)
+
+
+def probe_media_files(paths: Iterable[Path], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Probe many files concurrently with a bounded pool and return results in input order.
+    Both PyAV demuxing and ffprobe subprocesses release the GIL, so threads are enough.
+    """
+    paths = list(paths)
+    if not paths:
+        return []
+    if max_workers is None:
+        max_workers = min(16, (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(paths)))) as executor:
+        return list(executor.map(probe_media, paths))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Probe video metadata from stream headers.")
+    parser.add_argument("files", nargs="+", help="Video files to probe")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = probe_media_files([Path(f) for f in args.files], args.workers)
+    elapsed = time.perf_counter() - started
+    for file, info in zip(args.files, results):
+        print(file, json.dumps(info))
+    print(f"Probed {len(results)} files in {elapsed:.3f}s ({'PyAV' if av is not None else 'ffprobe'})")
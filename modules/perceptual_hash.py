@@ -0,0 +1,263 @@
+# perceptual_hash.py
+# 64-bit perceptual hashes (pHash / dHash) for images and sampled video frames, a
+# multi-index hash table for sub-linear Hamming-distance lookups, and the
+# near-duplicate clusters that broll_suggester collapses into a single asset.
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+
+# Maximum Hamming distance (out of 64 bits) for two pHashes to count as the same shot.
+# Re-encodes, resizes and small crops land well below this; different shots rarely do.
+DUPLICATE_DISTANCE = 8
+
+_PHASH_SIZE = 32
+_PHASH_LOW = 8
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, np.newaxis]
+    i = np.arange(n)[np.newaxis, :]
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(_PHASH_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def _to_gray(image, size: Tuple[int, int]) -> np.ndarray:
+    """
+    Shrink a PIL image or an (H, W, 3) RGB array to a float32 grayscale array.
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    gray = image.convert("L").resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def phash(image) -> int:
+    """
+    DCT-based perceptual hash: sign of the lowest 8x8 frequencies against their median.
+    """
+    gray = _to_gray(image, (_PHASH_SIZE, _PHASH_SIZE))
+    low = (_DCT @ gray @ _DCT.T)[:_PHASH_LOW, :_PHASH_LOW]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(image) -> int:
+    """
+    Difference hash: whether each pixel of a 9x8 thumbnail is brighter than its right neighbour.
+    """
+    gray = _to_gray(image, (9, 8))
+    return _bits_to_int(gray[:, 1:] > gray[:, :-1])
+
+
+def hash_frames(frames: Sequence[np.ndarray]) -> Optional[int]:
+    """
+    Hash a video from its sampled frames: the bitwise majority of the per-frame pHashes,
+    so one odd frame (a flash, a cut) does not change the clip hash.
+    """
+    if len(frames) == 0:
+        return None
+    bits = np.array(
+        [np.unpackbits(np.frombuffer(phash(frame).to_bytes(8, "big"), dtype=np.uint8)) for frame in frames]
+    )
+    return _bits_to_int(bits.sum(axis=0) * 2 > len(frames))
+
+
+def hash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hex_to_hash(value: str) -> int:
+    return int(value, 16)
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """
+    Per-element bit count of a uint64 array.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return _BYTE_POPCOUNT[values.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+class HammingIndex:
+    """
+    Multi-index hash table for radius queries over 64-bit hashes.
+
+    Each hash is split into `chunks` 16-bit substrings with one lookup table per chunk.
+    By the pigeonhole principle two hashes within distance r agree to within
+    r // chunks bits on at least one chunk, so a query only enumerates that small
+    neighbourhood of each chunk value and verifies the handful of candidates it finds,
+    instead of comparing against every stored hash.
+    """
+
+    def __init__(self, chunks: int = 4):
+        if HASH_BITS % chunks:
+            raise ValueError(f"chunks must divide {HASH_BITS}")
+        self.chunks = chunks
+        self._chunk_bits = HASH_BITS // chunks
+        self._mask = (1 << self._chunk_bits) - 1
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._items: List[object] = []
+        self._flips: Dict[int, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _split(self, value: int) -> List[int]:
+        return [(value >> (i * self._chunk_bits)) & self._mask for i in range(self.chunks)]
+
+    def _neighbour_masks(self, radius: int) -> List[int]:
+        # XOR masks with at most `radius` bits set within one chunk
+        if radius not in self._flips:
+            masks = {0}
+            for _ in range(radius):
+                masks |= {m | (1 << bit) for m in masks for bit in range(self._chunk_bits)}
+            self._flips[radius] = sorted(masks)
+        return self._flips[radius]
+
+    def add(self, value: int, item) -> None:
+        position = len(self._items)
+        if position == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[position] = value
+        self._items.append(item)
+        for table, part in zip(self._tables, self._split(value)):
+            table.setdefault(part, []).append(position)
+
+    def query(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        """
+        Return (distance, item) for every stored item within `radius` of value.
+        """
+        masks = self._neighbour_masks(min(radius // self.chunks, self._chunk_bits))
+        candidates = set()
+        for table, part in zip(self._tables, self._split(value)):
+            for mask in masks:
+                bucket = table.get(part ^ mask)
+                if bucket:
+                    candidates.update(bucket)
+        if not candidates:
+            return []
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        positions.sort()
+        distances = _popcount(self._hashes[positions] ^ np.uint64(value))
+        hits = distances <= radius
+        return [(int(d), self._items[p]) for p, d in zip(positions[hits], distances[hits])]
+
+
+def find_duplicate_clusters(analyzed_media, max_distance: int = DUPLICATE_DISTANCE) -> List[List[str]]:
+    """
+    Group near-identical media into clusters.
+
+    Items of the same file_type join a cluster when their perceptual hashes are within
+    max_distance bits, or when their content hashes are identical. Only clusters with at
+    least two members are returned, each sorted by path.
+    """
+    paths = [str(item.file_path) for item in analyzed_media]
+    parent = list(range(len(paths)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(a, b):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    indexes: Dict[str, HammingIndex] = {}
+    by_content: Dict[str, int] = {}
+    for i, item in enumerate(analyzed_media):
+        if item.file_hash:
+            if item.file_hash in by_content:
+                union(by_content[item.file_hash], i)
+            else:
+                by_content[item.file_hash] = i
+        if not getattr(item, "perceptual_hash", None):
+            continue
+        value = hex_to_hash(item.perceptual_hash)
+        index = indexes.setdefault(item.file_type, HammingIndex())
+        for _, j in index.query(value, max_distance):
+            union(i, j)
+        index.add(value, i)
+
+    groups: Dict[int, List[str]] = {}
+    for i, path in enumerate(paths):
+        groups.setdefault(find(i), []).append(path)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=lambda g: g[0])
+
+
+def _representative_key(item):
+    width, height = item.dimensions or (0, 0)
+    return (
+        -(width or 0) * (height or 0),
+        Path(item.file_path).name.startswith("resized_"),
+        -(item.duration or 0),
+        str(item.file_path),
+    )
+
+
+def collapse_duplicates(analyzed_media, clusters: Optional[Iterable[List[str]]] = None) -> List:
+    """
+    Keep one item per duplicate cluster (highest resolution, originals before resized_
+    copies, then the longest clip) and pass everything else through in input order.
+    """
+    if clusters is None:
+        clusters = find_duplicate_clusters(analyzed_media)
+    cluster_of = {}
+    for cluster_id, cluster in enumerate(clusters):
+        for path in cluster:
+            cluster_of[path] = cluster_id
+    if not cluster_of:
+        return list(analyzed_media)
+
+    best = {}
+    for item in analyzed_media:
+        cluster_id = cluster_of.get(str(item.file_path))
+        if cluster_id is not None and (
+            cluster_id not in best or _representative_key(item) < _representative_key(best[cluster_id])
+        ):
+            best[cluster_id] = item
+    keep = {id(item) for item in best.values()}
+    return [item for item in analyzed_media if str(item.file_path) not in cluster_of or id(item) in keep]
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from modules.media_index import MediaIndex
+
+    parser = argparse.ArgumentParser(description="List near-duplicate clusters in a media index.")
+    parser.add_argument("index", help="Path to the SQLite media index")
+    parser.add_argument("--distance", type=int, default=DUPLICATE_DISTANCE)
+    args = parser.parse_args()
+
+    items = list(MediaIndex(Path(args.index)).iter_items())
+    started = time.perf_counter()
+    clusters = find_duplicate_clusters(items, args.distance)
+    elapsed = time.perf_counter() - started
+    for cluster in clusters:
+        print(" | ".join(cluster))
+    print(f"{len(clusters)} clusters among {len(items)} items in {elapsed:.3f}s")
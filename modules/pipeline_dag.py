@@ -0,0 +1,195 @@
+# pipeline_dag.py
+# Minimal DAG executor for the video pipeline: stages are nodes with explicit
+# dependencies, nodes whose dependencies are done run concurrently on a thread pool,
+# and every node's wall/CPU time, peak memory and I/O go into a run report.
+
+import contextvars
+import json
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from modules.resource_usage import measure_stage
+
+
+class Node(NamedTuple):
+    name: str
+    func: Callable[..., Any]  # called with the results of deps, in order
+    deps: Sequence[str] = ()
+    stage: str = ""  # stage kind the report aggregates by (the name by default)
+    resource: Optional[str] = None  # concurrency limit group, see run_dag's limits
+
+
+def _check_graph(nodes: Sequence[Node]):
+    names = [node.name for node in nodes]
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate node names in pipeline")
+    by_name = {node.name: node for node in nodes}
+    for node in nodes:
+        for dep in node.deps:
+            if dep not in by_name:
+                raise ValueError(f"Node {node.name} depends on unknown node {dep}")
+    # Kahn's algorithm: every node must become ready at some point
+    remaining = {node.name: len(node.deps) for node in nodes}
+    ready = [name for name, count in remaining.items() if count == 0]
+    dependents = {name: [] for name in names}
+    for node in nodes:
+        for dep in node.deps:
+            dependents[dep].append(node.name)
+    visited = 0
+    while ready:
+        name = ready.pop()
+        visited += 1
+        for child in dependents[name]:
+            remaining[child] -= 1
+            if remaining[child] == 0:
+                ready.append(child)
+    if visited != len(nodes):
+        raise ValueError("Pipeline has a dependency cycle")
+
+
+def _run_node(node: Node, args: List[Any]):
+    with measure_stage() as usage:
+        try:
+            result, error = node.func(*args), None
+        except Exception as e:
+            traceback.print_exc()
+            result, error = None, str(e)
+    return result, error, usage
+
+
+def run_dag(
+    nodes: Sequence[Node],
+    workers: int = 4,
+    limits: Optional[Dict[str, int]] = None,
+    initializer: Optional[Callable[[], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run a pipeline of nodes, each as soon as its dependencies have finished.
+
+    A node that raises is recorded as failed and everything depending on it is
+    skipped; independent branches carry on.
+
+    Args:
+        nodes: Pipeline nodes; ready nodes start in this order
+        workers: Nodes running at once
+        limits: Maximum concurrently running nodes per resource group
+            (e.g. {"encode": 2} for CPU-heavy renders)
+        initializer: Run in every worker thread before its first node
+
+    Returns:
+        Run report: {"wall_s", "nodes": [...], "results": {name: result}}
+    """
+    _check_graph(nodes)
+    limits = limits or {}
+    pending = {node.name: node for node in nodes}
+    results, records = {}, {}
+    in_use = {}
+    running = {}
+    run_started = time.perf_counter()
+
+    def record(node, status, error=None, usage=None, started=None):
+        entry = {"name": node.name, "stage": node.stage or node.name, "status": status,
+                 "deps": list(node.deps), "error": error}
+        if usage is not None:
+            entry["start_s"] = round(started - run_started, 3)
+            entry.update(usage.to_dict())
+        records[node.name] = entry
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), initializer=initializer) as executor:
+        while pending or running:
+            # Skip everything below a failure, repeatedly since skips cascade
+            changed = True
+            while changed:
+                changed = False
+                for name, node in list(pending.items()):
+                    failed = [dep for dep in node.deps if records.get(dep, {}).get("status") in ("failed", "skipped")]
+                    if failed:
+                        record(node, "skipped", f"dependency {failed[0]} did not complete")
+                        del pending[name]
+                        changed = True
+
+            for name, node in list(pending.items()):
+                if len(running) >= max(1, workers):
+                    break
+                if any(records.get(dep, {}).get("status") != "ok" for dep in node.deps):
+                    continue
+                if node.resource is not None and in_use.get(node.resource, 0) >= limits.get(node.resource, workers):
+                    continue
+                del pending[name]
+                if node.resource is not None:
+                    in_use[node.resource] = in_use.get(node.resource, 0) + 1
+                args = [results[dep] for dep in node.deps]
+                # A fresh context per node keeps resource accounting separate
+                future = executor.submit(contextvars.copy_context().run, _run_node, node, args)
+                running[future] = (node, time.perf_counter())
+
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node, started = running.pop(future)
+                if node.resource is not None:
+                    in_use[node.resource] -= 1
+                result, error, usage = future.result()
+                if error is None:
+                    results[node.name] = result
+                    record(node, "ok", usage=usage, started=started)
+                else:
+                    record(node, "failed", error, usage, started)
+
+    return {
+        "wall_s": round(time.perf_counter() - run_started, 3),
+        "nodes": [records[node.name] for node in nodes if node.name in records],
+        "results": results,
+    }
+
+
+def format_run_report(report: Dict[str, Any], top: int = 15) -> str:
+    """
+    Human-readable summary of a run report: time and resources per stage kind, then
+    the slowest nodes.
+    """
+    nodes = [n for n in report["nodes"] if "wall_s" in n]
+    total_wall = report["wall_s"] or 1e-9
+    lines = [f"Pipeline run: {report['wall_s']:.2f}s wall, {len(report['nodes'])} nodes"]
+    problems = [n for n in report["nodes"] if n["status"] != "ok"]
+    for node in problems:
+        lines.append(f"  {node['status'].upper()}: {node['name']} ({node['error']})")
+
+    stages = {}
+    for node in nodes:
+        totals = stages.setdefault(node["stage"], {"count": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_rss_mb": 0.0,
+                                                   "read_mb": 0.0, "write_mb": 0.0})
+        totals["count"] += 1
+        for field in ("wall_s", "cpu_s", "read_mb", "write_mb"):
+            totals[field] += node[field]
+        totals["peak_rss_mb"] = max(totals["peak_rss_mb"], node["peak_rss_mb"])
+
+    header = f"{'':<28}{'n':>4}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'read MB':>10}{'write MB':>10}"
+    lines += ["", "By stage (summed over nodes):", header]
+    for stage, totals in sorted(stages.items(), key=lambda item: -item[1]["wall_s"]):
+        lines.append(f"{stage[:27]:<28}{totals['count']:>4}{totals['wall_s']:>10.2f}{totals['cpu_s']:>10.2f}"
+                     f"{totals['peak_rss_mb']:>10.1f}{totals['read_mb']:>10.1f}{totals['write_mb']:>10.1f}")
+
+    lines += ["", "Slowest nodes (share of run wall time):",
+              f"{'':<28}{'start s':>8}{'wall s':>10}{'share':>8}{'cpu s':>10}{'peak MB':>10}"]
+    for node in sorted(nodes, key=lambda n: -n["wall_s"])[:top]:
+        lines.append(f"{node['name'][:27]:<28}{node['start_s']:>8.2f}{node['wall_s']:>10.2f}"
+                     f"{100 * node['wall_s'] / total_wall:>7.0f}%{node['cpu_s']:>10.2f}{node['peak_rss_mb']:>10.1f}")
+    return "\n".join(lines)
+
+
+def write_run_report(report: Dict[str, Any], output_dir: Path) -> Path:
+    """
+    Save a run report as run_report.json (without the node results) and
+    run_report.txt next to it. Returns the JSON path.
+    """
+    output_dir = Path(output_dir)
+    json_path = output_dir / "run_report.json"
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump({"wall_s": report["wall_s"], "nodes": report["nodes"]}, f, indent=2)
+    (output_dir / "run_report.txt").write_text(format_run_report(report) + "\n", encoding="utf-8")
+    return json_path
@@ -0,0 +1,114 @@
+# plan_cache.py
+# Content-addressed on-disk cache of B-roll plans. A plan is keyed by the hash of the
+# media library version and every planning input, so repeating a seeded request
+# returns the stored scenes instead of planning again.
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_ENTRIES = 512
+
+
+def media_version(analyzed_media) -> str:
+    """
+    Hash of everything about the library that planning reads: paths, content hashes,
+    analysis versions, types, durations and tags. Order-independent.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for item in sorted(analyzed_media, key=lambda m: str(m.file_path)):
+        digest.update(json.dumps([
+            str(item.file_path),
+            item.file_hash,
+            getattr(item, "analysis_version", 0),
+            item.file_type,
+            item.duration,
+            list(item.dimensions) if item.dimensions else None,
+            sorted(item.tags),
+        ]).encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def plan_key(version: str, context: str, target_duration: float, style: str, seed: int, **options) -> str:
+    """
+    Cache key for one planning request. Extra keyword options (strategy, orientation,
+    ...) are part of the key so different settings never share an entry.
+    """
+    payload = json.dumps({
+        "media_version": version,
+        "context": context,
+        "target_duration": float(target_duration),
+        "style": style,
+        "seed": seed,
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    Directory of <key>.json plan files with least-recently-used eviction. A hit
+    refreshes the file's mtime, which is what eviction orders by, so the cache can be
+    shared by several processes without a separate bookkeeping file.
+    """
+
+    def __init__(self, cache_dir: Path, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        path = self._path(key)
+        try:
+            data = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def put(self, key: str, scenes: List[Dict[str, Any]]):
+        # Write to a temporary file and rename so readers never see a partial plan
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(scenes, f, sort_keys=True)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            print(f"Error writing plan cache: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used plans beyond max_entries.
+        """
+        try:
+            entries = [(entry.stat().st_mtime_ns, entry.path) for entry in os.scandir(self.cache_dir)
+                       if entry.name.endswith(".json")]
+        except OSError:
+            return
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.cache_dir) if name.endswith(".json"))
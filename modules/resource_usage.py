@@ -0,0 +1,142 @@
+# resource_usage.py
+# Resource accounting for pipeline stages: wall time, CPU time, peak resident memory and
+# bytes read/written by a stage, including the ffmpeg/node subprocesses it starts. A
+# subprocess is charged to the stage that is current (a context variable) when it runs.
+
+import os
+import resource
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+_current_usage: ContextVar[Optional["StageUsage"]] = ContextVar("stage_usage", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _read_io(path: str) -> Tuple[int, int]:
+    # rchar/wchar count all bytes passed through read/write calls, including page
+    # cache hits, which is what a stage "reads" from the pipeline's point of view
+    try:
+        with open(path, "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _process_rss() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageUsage:
+    """
+    Resources used by one stage. The stage's own thread is measured directly;
+    subprocesses started through run_subprocess are added as they exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.child_cpu_s = 0.0
+        self.peak_rss = 0
+        self.read_bytes = 0
+        self.write_bytes = 0
+        self.subprocesses = 0
+
+    def add_child(self, rusage, read_bytes: int, write_bytes: int):
+        with self._lock:
+            self.child_cpu_s += rusage.ru_utime + rusage.ru_stime
+            # ru_maxrss is in kilobytes on Linux
+            self.peak_rss = max(self.peak_rss, rusage.ru_maxrss * 1024)
+            self.read_bytes += read_bytes
+            self.write_bytes += write_bytes
+            self.subprocesses += 1
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "wall_s": round(self.wall_s, 3),
+            "cpu_s": round(self.cpu_s + self.child_cpu_s, 3),
+            "child_cpu_s": round(self.child_cpu_s, 3),
+            "peak_rss_mb": round(self.peak_rss / 1024 ** 2, 1),
+            "read_mb": round(self.read_bytes / 1024 ** 2, 2),
+            "write_mb": round(self.write_bytes / 1024 ** 2, 2),
+            "subprocesses": self.subprocesses,
+        }
+
+
+@contextmanager
+def measure_stage():
+    """
+    Measure the code in the with block and the subprocesses it runs.
+
+    peak_rss is the largest of the subprocesses' peak resident sizes and this
+    process's resident size at the start and end of the stage (Python threads share
+    one address space, so their memory cannot be told apart).
+
+    Yields:
+        StageUsage, complete once the block exits
+    """
+    usage = StageUsage()
+    token = _current_usage.set(usage)
+    io_path = "/proc/thread-self/io"
+    started, cpu_started = time.perf_counter(), time.thread_time()
+    read_started, write_started = _read_io(io_path)
+    rss_started = _process_rss()
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+        read_ended, write_ended = _read_io(io_path)
+        with usage._lock:
+            usage.wall_s = time.perf_counter() - started
+            usage.cpu_s = time.thread_time() - cpu_started
+            usage.read_bytes += read_ended - read_started
+            usage.write_bytes += write_ended - write_started
+            usage.peak_rss = max(usage.peak_rss, rss_started, _process_rss())
+
+
+def run_subprocess(cmd: Sequence[str], **kwargs) -> subprocess.CompletedProcess:
+    """
+    subprocess.run(cmd, stdout=PIPE, stderr=PIPE, check=False, **kwargs) that charges
+    the child's CPU time, peak memory and I/O to the current stage (see measure_stage).
+    """
+    check = kwargs.pop("check", False)
+    usage = _current_usage.get()
+    if usage is None or not hasattr(os, "wait4"):
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=check, **kwargs)
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+    output = {}
+
+    def drain(name, pipe):
+        output[name] = pipe.read()
+        pipe.close()
+
+    # Both pipes are drained concurrently so a chatty child cannot block on a full pipe
+    reader = threading.Thread(target=drain, args=("stderr", process.stderr), daemon=True)
+    reader.start()
+    drain("stdout", process.stdout)
+    reader.join()
+
+    # Wait without reaping so the exited child's I/O counters can still be read,
+    # then reap it with wait4 for its resource usage
+    try:
+        os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+        read_bytes, write_bytes = _read_io(f"/proc/{process.pid}/io")
+        _, status, rusage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        usage.add_child(rusage, read_bytes, write_bytes)
+    except ChildProcessError:
+        process.wait()
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args, output["stdout"], output["stderr"])
+    return subprocess.CompletedProcess(process.args, process.returncode, output["stdout"], output["stderr"])
@@ -3,11 +3,27 @@ from moviepy.editor import concatenate_videoclips
 import json
 import os
 import streamlit as st
+from modules.config import get_keyframe_index_dir
+from modules.media_probe import probe_media
+from modules.smart_cut import smart_cut
+from modules.timeline import Segment
+
+TRIM_MODES = ("smart", "moviepy")
+
+
 class SilenceTrimmer:
-    def __init__(self, video_file, silence_file, output_path):
+    def __init__(self, video_file, silence_file, output_path, mode="smart"):
+        """
+        Args:
+            mode: "smart" stream-copies whole GOPs and re-encodes only the frames around
+                each cut (keeps the source resolution); "moviepy" decodes, resizes to
+                1920 high and re-encodes everything. Smart mode falls back to moviepy
+                when it fails (e.g. for non-H.264 sources).
+        """
         self.video_file = video_file
         self.silence_file = silence_file
         self.output_path = output_path
+        self.mode = mode
 
     def load_silence_json(self):
         try:
@@ -51,7 +67,32 @@ class SilenceTrimmer:
 
         print(f"Calculated non-silent segments: {segments}")
         return segments
+    def smart_trim(self):
+        """
+        Keyframe-aware trim: returns True when the output was written.
+        """
+        silence_periods = self.load_silence_json()
+        if not silence_periods:
+            raise ValueError("No silence periods found. Check your silence JSON file.")
+        duration = probe_media(self.video_file).get("duration") or 0
+        segments = [
+            Segment(start=seg["start"], end=min(seg["end"], duration))
+            for seg in self.calculate_non_silent_segments(silence_periods, duration)
+            if (seg["end"] - seg["start"]) > 0.1
+        ]
+        if not segments:
+            raise ValueError("No valid non-silent segments found.")
+        stats = smart_cut(self.video_file, segments, self.output_path, keyframe_cache_dir=get_keyframe_index_dir())
+        st.write(f"Smart-cut trimmed video saved to {self.output_path}: {stats}")
+        return True
+
     def trim_video(self):
+        if self.mode == "smart":
+            try:
+                if self.smart_trim():
+                    return
+            except Exception as e:
+                st.write(f"Smart cut failed, re-encoding with moviepy: {e}")
         try:
             # Load video
             video = mp.VideoFileClip(str(self.video_file))
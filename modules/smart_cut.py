@@ -0,0 +1,183 @@
+# smart_cut.py
+# Keyframe-aware cutting: GOPs that lie entirely inside a kept segment are stream-copied,
+# only the partial GOPs at each cut are re-encoded, and the pieces are joined with the
+# concat demuxer. Audio is trimmed sample-exactly from the source in the same final run.
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+try:
+    import av
+except ImportError:
+    av = None
+
+from modules.ffmpeg_utils import run_ffmpeg
+from modules.keyframe_index import load_keyframe_index
+from modules.timeline import Segment, audio_trim_filter, snap_to_frames
+
+# Codecs whose packets can be copied next to re-encoded boundary pieces, and the
+# encoder used for those
+SMART_CUT_CODECS = {"h264": "libx264"}
+
+# Boundary pieces are re-encoded close to visually lossless
+DEFAULT_CRF = 18
+DEFAULT_PRESET = "veryfast"
+AUDIO_BITRATE = "192k"
+
+# Cuts closer than this to a keyframe are treated as on it
+KEYFRAME_TOLERANCE = 0.001
+
+
+class Piece(NamedTuple):
+    start: float
+    end: float
+    copy: bool  # stream copy (whole GOPs) or re-encode
+
+
+def plan_pieces(segments: Sequence[Segment], keyframes: np.ndarray) -> List[Piece]:
+    """
+    Split each kept segment into a re-encoded head up to its first keyframe, a copied
+    run of whole GOPs, and a re-encoded tail after its last keyframe. Segments without
+    two keyframes inside are re-encoded whole.
+    """
+    pieces = []
+    for segment in segments:
+        start, end = segment.start, segment.end
+        first = np.searchsorted(keyframes, start - KEYFRAME_TOLERANCE, side="left")
+        last = np.searchsorted(keyframes, end + KEYFRAME_TOLERANCE, side="right") - 1
+        if first >= len(keyframes) or last < first or keyframes[last] - keyframes[first] <= KEYFRAME_TOLERANCE:
+            pieces.append(Piece(start, end, False))
+            continue
+        copy_start, copy_end = float(keyframes[first]), float(keyframes[last])
+        if end - copy_end <= KEYFRAME_TOLERANCE:
+            copy_end = end
+        if copy_start - start > KEYFRAME_TOLERANCE:
+            pieces.append(Piece(start, copy_start, False))
+        pieces.append(Piece(copy_start, copy_end, True))
+        if end - copy_end > KEYFRAME_TOLERANCE:
+            pieces.append(Piece(copy_end, end, False))
+    return pieces
+
+
+def _write_piece(video_path: Path, piece: Piece, output: Path, fps: float, encoder: str, pix_fmt: str, crf: int, preset: str):
+    # Every piece carries its parameter sets in-band before each keyframe (copied GOPs
+    # via mp4toannexb, re-encodes via repeat-headers), so the joined stream decodes
+    # correctly even though the re-encoded pieces use different SPS/PPS than the source.
+    # Pieces are bounded by frame count rather than -t: with B-frames the packets past
+    # a time limit are interleaved with ones before it in decode order, while a copied
+    # run of closed GOPs is exactly its first N packets.
+    frames = str(int(round((piece.end - piece.start) * fps)))
+    if piece.copy:
+        args = ["-ss", f"{piece.start:.6f}", "-i", str(video_path), "-frames:v", frames,
+                "-c:v", "copy", "-bsf:v", "h264_mp4toannexb"]
+    else:
+        # Seeking a quarter frame early keeps float rounding from skipping the first frame
+        args = ["-ss", f"{max(0.0, piece.start - 0.25 / fps):.6f}", "-i", str(video_path), "-frames:v", frames,
+                "-c:v", encoder, "-preset", preset, "-crf", str(crf), "-pix_fmt", pix_fmt,
+                "-x264-params", "repeat-headers=1"]
+    args += ["-map", "0:v:0", "-an", "-sn", "-dn"]
+    run_ffmpeg(args + ["-f", "matroska", str(output)])
+
+
+def smart_cut(
+    video_path: Path,
+    segments: Sequence[Segment],
+    output_path: Path,
+    crf: int = DEFAULT_CRF,
+    preset: str = DEFAULT_PRESET,
+    work_dir: Optional[Path] = None,
+    keyframe_cache_dir: Optional[Path] = None,
+    fingerprint_mode: str = "sampled"
+) -> dict:
+    """
+    Keep only `segments` of video_path, re-encoding just the partial GOPs at the cuts.
+
+    Args:
+        video_path: H.264 source
+        segments: Source ranges to keep, in order
+        output_path: Destination MP4
+        crf: libx264 CRF for the re-encoded boundary pieces
+        preset: libx264 preset for the boundary pieces
+        work_dir: Directory for the intermediate pieces (a temporary one by default)
+        keyframe_cache_dir: Where the source's keyframe index is cached
+        fingerprint_mode: Fingerprint mode keying that cache (see load_keyframe_index)
+
+    Returns:
+        Statistics: pieces, copied and re-encoded seconds
+    """
+    if av is None:
+        raise ImportError("PyAV is required for smart cutting")
+    with av.open(str(video_path)) as container:
+        if not container.streams.video:
+            raise ValueError(f"No video stream in {video_path}")
+        video = container.streams.video[0]
+        codec, pix_fmt = video.codec_context.name, video.codec_context.pix_fmt or "yuv420p"
+        rate = video.average_rate or video.guessed_rate
+        has_audio = bool(container.streams.audio)
+    encoder = SMART_CUT_CODECS.get(codec)
+    if encoder is None:
+        raise ValueError(f"Smart cut does not support {codec} video")
+    if not rate:
+        raise ValueError(f"Unknown frame rate for {video_path}")
+    fps = float(rate)
+
+    segments = snap_to_frames(segments, fps)
+    pieces = plan_pieces(segments, load_keyframe_index(video_path, keyframe_cache_dir, fingerprint_mode).times)
+    temp_dir = Path(tempfile.mkdtemp(prefix="smartcut_", dir=work_dir))
+    try:
+        concat_list = temp_dir / "pieces.txt"
+        lines = []
+        for i, piece in enumerate(pieces):
+            piece_path = temp_dir / f"piece_{i:05d}.mkv"
+            _write_piece(video_path, piece, piece_path, fps, encoder, pix_fmt, crf, preset)
+            # Matroska stores millisecond timestamps; an exact duration per piece keeps
+            # that rounding from adding up across the joins
+            frames = int(round((piece.end - piece.start) * fps))
+            lines += [f"file '{piece_path.as_posix()}'", f"duration {frames / fps:.6f}"]
+        concat_list.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        # Join the video pieces without re-encoding and trim the audio from the source
+        # in the same run, so it follows the kept segments sample for sample
+        args = ["-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if has_audio:
+            args += ["-i", str(video_path), "-filter_complex", audio_trim_filter("1:a:0", segments, "a"),
+                     "-map", "0:v", "-map", "[a]", "-c:a", "aac", "-b:a", AUDIO_BITRATE]
+        else:
+            args += ["-map", "0:v"]
+        args += ["-c:v", "copy", "-movflags", "+faststart", str(output_path)]
+        run_ffmpeg(args)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    copied = sum(p.end - p.start for p in pieces if p.copy)
+    encoded = sum(p.end - p.start for p in pieces if not p.copy)
+    return {"pieces": len(pieces), "copied_seconds": round(copied, 3), "encoded_seconds": round(encoded, 3)}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from modules.media_probe import probe_media
+    from modules.timeline import apply_silence_trim, timeline_from_source
+
+    parser = argparse.ArgumentParser(description="Remove silence from a video with keyframe-aware smart cutting.")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("silence", type=Path, help="Silence JSON from silence.detect_silence")
+    parser.add_argument("output", type=Path)
+    args = parser.parse_args()
+
+    with open(args.silence, "r", encoding="utf-8") as f:
+        silence_periods = json.load(f)
+    timeline = apply_silence_trim(timeline_from_source(args.video, probe_media(args.video)), silence_periods)
+
+    started = time.perf_counter()
+    stats = smart_cut(args.video, timeline.segments, args.output)
+    elapsed = time.perf_counter() - started
+    print(f"Kept {timeline.duration:.1f}s of {timeline.source_duration:.1f}s in {elapsed:.2f}s "
+          f"({timeline.source_duration / elapsed:.0f}x real time): {stats}")
@@ -0,0 +1,361 @@
+# timeline.py
+# Edit decision list (EDL) for one output video: which parts of the source are kept,
+# where zooms and B-roll overlays go, which audio tracks play and how the video fades.
+# The pipeline stages (silence trimming, zoom planning, B-roll insertion, voiceover)
+# are transforms on this model; timeline_renderer turns the result into a single
+# ffmpeg invocation instead of one re-encode per stage.
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel
+
+from modules.directory_reader import IMAGE_EXTENSIONS
+
+# Output height used by the original pipeline (SilenceTrimmer resized to 1920 high)
+DEFAULT_OUTPUT_HEIGHT = 1920
+DEFAULT_FPS = 30.0
+# Width B-roll stills were resized to before being overlaid
+DEFAULT_IMAGE_OVERLAY_WIDTH = 1024
+DEFAULT_IMAGE_DURATION = 5.0
+DEFAULT_ZOOM_DURATION = 1.0
+# Seconds each zoom eases in from 1x and back out (see zoom_engine)
+DEFAULT_ZOOM_EASE = 0.3
+
+
+class Segment(BaseModel):
+    start: float  # seconds in the source
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.end - self.start)
+
+
+class Zoom(BaseModel):
+    start: float  # seconds in the output
+    end: float
+    level: float = 1.0
+    ease: float = DEFAULT_ZOOM_EASE  # ramp in/out seconds; 0 jumps straight to level
+
+
+class Overlay(BaseModel):
+    source: str
+    start: float  # seconds in the output
+    duration: float
+    offset: float = 0.0  # seconds into a video overlay's source
+    is_image: bool = False
+    width: Optional[int] = None  # scaled width in pixels; None keeps the native size
+    position: str = "center"
+
+
+class AudioTrack(BaseModel):
+    source: str
+    start: float = 0.0  # seconds in the output
+    volume: float = 1.0
+    replace: bool = True  # replace the source audio instead of mixing with it
+
+
+class Transition(BaseModel):
+    kind: str  # fade_in, fade_out (other kinds are rendered as cuts)
+    at: float = 0.0  # seconds in the output
+    duration: float = 0.5
+
+
+class Timeline(BaseModel):
+    source: str
+    source_duration: float
+    width: int
+    height: int
+    fps: float = DEFAULT_FPS
+    has_audio: bool = True
+    segments: List[Segment] = []
+    zooms: List[Zoom] = []
+    overlays: List[Overlay] = []
+    audio_tracks: List[AudioTrack] = []
+    transitions: List[Transition] = []
+
+    @property
+    def duration(self) -> float:
+        return sum(segment.duration for segment in self.segments)
+
+    def source_to_output(self, time: float) -> Optional[float]:
+        """
+        Map a source timestamp to the output timeline; None if it was cut out.
+        """
+        offset = 0.0
+        for segment in self.segments:
+            if segment.start <= time <= segment.end:
+                return offset + time - segment.start
+            offset += segment.duration
+        return None
+
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.dict(), f, indent=2)
+
+
+# Segment bounds are moved this much earlier in select expressions, so a frame that
+# sits exactly on a boundary lands on the same side however the time was rounded
+SELECT_EPSILON = 1e-4
+
+
+def select_expression(segments: Sequence[Segment]) -> str:
+    """
+    ffmpeg select/aselect expression keeping the given source segments (half-open, so
+    boundary frames are never taken twice).
+    """
+    return "+".join(
+        f"gte(t,{segment.start - SELECT_EPSILON:.6f})*lt(t,{segment.end - SELECT_EPSILON:.6f})"
+        for segment in segments
+    )
+
+
+def audio_trim_filter(source: str, segments: Sequence[Segment], output: str) -> str:
+    """
+    filter_complex fragment cutting the given source segments out of audio stream
+    `source` and joining them into `output`. Each segment is trimmed by timestamp to
+    the sample, so the audio stays in sync with the frame-selected video however many
+    cuts there are (aselect keeps or drops whole audio frames instead).
+    """
+    trims = [
+        f"atrim=start={segment.start:.6f}:end={segment.end:.6f},asetpts=PTS-STARTPTS"
+        for segment in segments
+    ]
+    if len(trims) == 1:
+        return f"[{source}]{trims[0]}[{output}]"
+    parts = [f"[{source}]asplit={len(trims)}" + "".join(f"[{output}_in{i}]" for i in range(len(trims)))]
+    parts += [f"[{output}_in{i}]{trim}[{output}_{i}]" for i, trim in enumerate(trims)]
+    parts.append("".join(f"[{output}_{i}]" for i in range(len(trims))) + f"concat=n={len(trims)}:v=0:a=1[{output}]")
+    return ";".join(parts)
+
+
+def snap_to_frames(segments: Sequence[Segment], fps: float) -> List[Segment]:
+    """
+    Move segment boundaries onto the frame grid so every segment holds whole frames
+    and audio and video cuts match exactly.
+    """
+    snapped = []
+    for segment in segments:
+        start, end = round(segment.start * fps) / fps, round(segment.end * fps) / fps
+        if end > start:
+            snapped.append(Segment(start=start, end=end))
+    return snapped
+
+
+def _even(value: float) -> int:
+    return max(2, int(round(value / 2)) * 2)
+
+
+def timeline_from_source(
+    video_path: Path,
+    info: Dict[str, Any],
+    output_height: int = DEFAULT_OUTPUT_HEIGHT
+) -> Timeline:
+    """
+    Start a timeline that keeps the whole source, scaled to output_height with the
+    source aspect ratio.
+
+    Args:
+        video_path: Source video
+        info: media_probe.probe_media result for the source
+        output_height: Output height in pixels
+    """
+    width, height = info.get("width") or 0, info.get("height") or 0
+    if not width or not height:
+        raise ValueError(f"Could not read dimensions of {video_path}")
+    duration = float(info.get("duration") or 0.0)
+    return Timeline(
+        source=str(video_path),
+        source_duration=duration,
+        width=_even(width * output_height / height),
+        height=_even(output_height),
+        fps=float(info.get("fps") or DEFAULT_FPS),
+        has_audio=bool(info.get("has_audio", True)),
+        segments=[Segment(start=0.0, end=duration)],
+    )
+
+
+def apply_silence_trim(timeline: Timeline, silence_periods: Sequence[Dict[str, Any]], min_segment: float = 0.1) -> Timeline:
+    """
+    Keep only the non-silent parts of the source (same rules as
+    SilenceTrimmer.calculate_non_silent_segments, including dropping segments of
+    min_segment seconds or less), snapped to the frame grid. Returns the timeline
+    unchanged if nothing remains.
+    """
+    segments = []
+    last_end = 0.0
+    for silence in silence_periods:
+        from_s, to_s = silence["fromMs"] / 1000.0, silence["toMs"] / 1000.0
+        if silence["fromMs"] == 0:
+            last_end = to_s
+            continue
+        if from_s > last_end:
+            segments.append(Segment(start=last_end, end=min(from_s, timeline.source_duration)))
+        last_end = to_s
+    if last_end < timeline.source_duration:
+        segments.append(Segment(start=last_end, end=timeline.source_duration))
+
+    segments = snap_to_frames([segment for segment in segments if segment.duration > min_segment], timeline.fps)
+    if not segments:
+        return timeline
+    return timeline.copy(update={"segments": segments})
+
+
+def load_zoom_plan(zoom_json: Path) -> List[Dict[str, Any]]:
+    """
+    Read a zoom plan written by zoom_effect_creator: either a list of
+    {fromMs, toMs, zoomEffect, zoomLevel} or {"effects": [{timestampMs, ...}]}.
+    """
+    with open(zoom_json, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data.get("effects", []) if isinstance(data, dict) else data
+
+
+def apply_zoom_plan(timeline: Timeline, zoom_config: Sequence[Dict[str, Any]], source_times: bool = False) -> Timeline:
+    """
+    Add zooms from a zoom plan. Entries with only timestampMs last until the next
+    entry (at most DEFAULT_ZOOM_DURATION seconds).
+
+    Args:
+        timeline: Timeline to extend
+        zoom_config: Zoom plan entries
+        source_times: Whether plan times refer to the untrimmed source (e.g. a
+            transcript of the original video) rather than the output
+    """
+    entries = sorted(zoom_config, key=lambda z: z.get("fromMs", z.get("timestampMs", 0)))
+    zooms = list(timeline.zooms)
+    for i, entry in enumerate(entries):
+        if not entry.get("zoomEffect", False) or float(entry.get("zoomLevel", 1.0)) == 1.0:
+            continue
+        start = entry.get("fromMs", entry.get("timestampMs", 0)) / 1000.0
+        if "toMs" in entry:
+            end = entry["toMs"] / 1000.0
+        else:
+            following = entries[i + 1].get("fromMs", entries[i + 1].get("timestampMs")) if i + 1 < len(entries) else None
+            end = start + DEFAULT_ZOOM_DURATION
+            if following is not None:
+                end = min(end, following / 1000.0)
+        if source_times:
+            start, end = timeline.source_to_output(start), timeline.source_to_output(end)
+            if start is None or end is None:
+                continue
+        end = min(end, timeline.duration)
+        if end > start:
+            zooms.append(Zoom(start=start, end=end, level=float(entry["zoomLevel"])))
+    return timeline.copy(update={"zooms": zooms})
+
+
+def broll_from_scenes(scenes: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert a suggest_broll plan into overlay entries: each scene's first media file
+    plays for the scene's duration, back to back from the start of the video.
+    """
+    entries = []
+    time = 0.0
+    for scene in scenes:
+        duration = float(scene.get("duration", 0.0))
+        if scene.get("media_files"):
+            entries.append({"path": scene["media_files"][0], "timestamp": time, "duration": duration})
+        time += duration
+    return entries
+
+
+def apply_broll(
+    timeline: Timeline,
+    broll_entries: Sequence[Dict[str, Any]],
+    media_root: Path = Path("./media/images"),
+    image_duration: float = DEFAULT_IMAGE_DURATION,
+    video_durations: Optional[Dict[str, float]] = None
+) -> Timeline:
+    """
+    Add centered B-roll overlays. Entries use either the insert_broll format
+    ({broll_filename, timestamp, duration}, relative to media_root) or
+    {path, timestamp, duration}. Overlays starting after the end of the video are
+    dropped; the rest are clipped to it.
+
+    Args:
+        video_durations: {path: seconds} for video overlays without a duration
+    """
+    overlays = list(timeline.overlays)
+    for entry in broll_entries:
+        if "path" in entry:
+            source = Path(entry["path"])
+        else:
+            source = (Path(media_root) / entry["broll_filename"]).resolve()
+        start = float(entry.get("timestamp", 0.0))
+        if start >= timeline.duration:
+            continue
+        is_image = source.suffix.lower() in IMAGE_EXTENSIONS
+        duration = entry.get("duration")
+        if duration is None:
+            duration = image_duration if is_image else (video_durations or {}).get(str(source), image_duration)
+        duration = min(float(duration), timeline.duration - start)
+        overlays.append(Overlay(
+            source=str(source),
+            start=start,
+            duration=duration,
+            is_image=is_image,
+            width=DEFAULT_IMAGE_OVERLAY_WIDTH if is_image else None,
+        ))
+    return timeline.copy(update={"overlays": overlays})
+
+
+def apply_voiceover(timeline: Timeline, audio_path: Path, replace: bool = True, volume: float = 1.0) -> Timeline:
+    """
+    Play audio_path from the start of the output, replacing the source audio by
+    default (as the original set_audio step did).
+    """
+    track = AudioTrack(source=str(audio_path), start=0.0, volume=volume, replace=replace)
+    return timeline.copy(update={"audio_tracks": list(timeline.audio_tracks) + [track]})
+
+
+def slice_timeline(timeline: Timeline, start: float, end: float) -> Timeline:
+    """
+    The part of a timeline between output times start and end, as a timeline of its
+    own starting at 0: source segments, overlays (with their source offset) and fades
+    are clipped and shifted, zooms are shifted whole. Audio tracks are not carried
+    over; slices are meant for rendering video chunks while the audio is rendered
+    once in full.
+    """
+    segments = []
+    offset = 0.0
+    for segment in timeline.segments:
+        seg_start, seg_end = offset, offset + segment.duration
+        offset = seg_end
+        lo, hi = max(seg_start, start), min(seg_end, end)
+        if hi > lo:
+            segments.append(Segment(start=segment.start + lo - seg_start, end=segment.start + hi - seg_start))
+
+    # Zooms are shifted but not clipped: one crossing a chunk edge keeps its ramps where
+    # they were, and the zoom expression evaluates it over the chunk's frames only
+    zooms = [
+        z.copy(update={"start": z.start - start, "end": z.end - start})
+        for z in timeline.zooms if z.end > start and z.start < end
+    ]
+    overlays = []
+    for overlay in timeline.overlays:
+        lo, hi = max(overlay.start, start), min(overlay.start + overlay.duration, end)
+        if hi > lo:
+            skipped = 0.0 if overlay.is_image else lo - overlay.start
+            overlays.append(overlay.copy(update={
+                "start": lo - start, "duration": hi - lo, "offset": overlay.offset + skipped,
+            }))
+    transitions = [
+        t.copy(update={"at": t.at - start})
+        for t in timeline.transitions if t.at >= start and t.at + t.duration <= end
+    ]
+    return timeline.copy(update={
+        "segments": segments, "zooms": zooms, "overlays": overlays,
+        "audio_tracks": [], "transitions": transitions, "has_audio": False,
+    })
+
+
+def apply_fades(timeline: Timeline, fade_in: float = 0.0, fade_out: float = 0.0) -> Timeline:
+    transitions = list(timeline.transitions)
+    if fade_in > 0:
+        transitions.append(Transition(kind="fade_in", at=0.0, duration=fade_in))
+    if fade_out > 0:
+        transitions.append(Transition(kind="fade_out", at=max(0.0, timeline.duration - fade_out), duration=fade_out))
+    return timeline.copy(update={"transitions": transitions})
@@ -0,0 +1,229 @@
+# timeline_renderer.py
+# Compiles a Timeline into one ffmpeg invocation: segment selection, scaling, zooms,
+# B-roll overlays, audio tracks and fades all live in a single filter_complex, so the
+# source is decoded once and the output encoded once.
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from modules.derivative_store import get_derivative
+from modules.ffmpeg_utils import run_ffmpeg
+from modules.timeline import Overlay, Segment, Timeline, audio_trim_filter, select_expression
+from modules.zoom_engine import zoom_filter
+
+DEFAULT_PRESET = "veryfast"
+DEFAULT_CRF = 20
+AUDIO_BITRATE = "192k"
+# Image overlays are pre-scaled through the derivative store; these formats may carry
+# transparency and stay lossless
+ALPHA_IMAGE_EXTENSIONS = {".png", ".gif", ".webp"}
+OVERLAY_JPEG_QUALITY = 95
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.3f}"
+
+
+def _overlay_position(position: str) -> str:
+    return {
+        "center": "(W-w)/2:(H-h)/2",
+        "top": "(W-w)/2:0",
+        "bottom": "(W-w)/2:H-h",
+    }.get(position, "(W-w)/2:(H-h)/2")
+
+
+def _overlay_image_source(overlay: Overlay) -> str:
+    # A photo scaled to the overlay width once, instead of decoding the full-size
+    # original on every render; the original is used if that fails
+    if not overlay.width:
+        return overlay.source
+    alpha = Path(overlay.source).suffix.lower() in ALPHA_IMAGE_EXTENSIONS
+    derivative = get_derivative(Path(overlay.source), overlay.width, format="PNG" if alpha else "JPEG",
+                                quality=OVERLAY_JPEG_QUALITY)
+    return str(derivative) if derivative is not None else overlay.source
+
+
+def build_filter_graph(timeline: Timeline, video: bool = True, audio: bool = True) -> Tuple[List[str], str, Optional[str], Optional[str]]:
+    """
+    Build the input arguments and filter_complex for a timeline.
+
+    Args:
+        timeline: Timeline to render
+        video: Include the video chain (main video, zooms, overlays, fades)
+        audio: Include the audio chain (source audio and extra tracks)
+
+    Returns:
+        (input args, filter_complex, video output label or None, audio output label or None)
+    """
+    # Seek the main input to the first kept frame instead of decoding everything
+    # before it (matters for timelines cut from the middle of a long source)
+    seek = timeline.segments[0].start
+    segments = [Segment(start=s.start - seek, end=s.end - seek) for s in timeline.segments]
+    inputs = (["-ss", _fmt(seek)] if seek > 0 else []) + ["-i", timeline.source]
+    filters = []
+    duration = timeline.duration
+    fps = timeline.fps
+    trimmed = len(segments) != 1 or segments[0].end < timeline.source_duration - seek
+
+    video_label = None
+    if video:
+        # Main video: constant frame rate first so frame-count timestamps are exact
+        # after the cut, then scale to the output size
+        chain = [f"fps={fps:g}"]
+        if trimmed:
+            chain += [f"select='{select_expression(segments)}'", f"setpts=N/({fps:g}*TB)"]
+        chain += [f"scale={timeline.width}:{timeline.height}", "setsar=1"]
+        if timeline.zooms:
+            chain.append(zoom_filter(timeline.zooms, timeline.width, timeline.height, fps))
+        filters.append(f"[0:v]{','.join(chain)}[base]")
+        video_label = "base"
+
+        # Overlays: each input is scaled as it is decoded, shifted to its start and
+        # shown only within its window. Stills come pre-scaled from the derivative store
+        # and are decoded once, then the frame is repeated in the graph for their
+        # duration. Every input has its own demux/decode thread in ffmpeg, so overlays
+        # decode concurrently.
+        for i, overlay in enumerate(timeline.overlays):
+            input_index = 1 + i
+            end = overlay.start + overlay.duration
+            scale = f"scale={overlay.width}:-2," if overlay.width else ""
+            if overlay.is_image:
+                inputs += ["-i", _overlay_image_source(overlay)]
+                frames = max(1, int(round(overlay.duration * fps)))
+                filters.append(
+                    f"[{input_index}:v]{scale}loop=loop={frames - 1}:size=1:start=0,"
+                    f"setpts=N/({fps:g}*TB)+{_fmt(overlay.start)}/TB[ov{i}]"
+                )
+            else:
+                offset = ["-ss", _fmt(overlay.offset)] if overlay.offset > 0 else []
+                inputs += offset + ["-t", _fmt(overlay.duration), "-i", overlay.source]
+                filters.append(
+                    f"[{input_index}:v]{scale}fps={fps:g},setpts=PTS-STARTPTS+{_fmt(overlay.start)}/TB[ov{i}]"
+                )
+            filters.append(
+                f"[{video_label}][ov{i}]overlay={_overlay_position(overlay.position)}"
+                f":enable='between(t,{_fmt(overlay.start)},{_fmt(end)})':eof_action=pass[v{i}]"
+            )
+            video_label = f"v{i}"
+
+        fades = [f"fade=t=in:st={_fmt(t.at)}:d={_fmt(t.duration)}" if t.kind == "fade_in"
+                 else f"fade=t=out:st={_fmt(t.at)}:d={_fmt(t.duration)}"
+                 for t in timeline.transitions if t.kind in ("fade_in", "fade_out")]
+        if fades:
+            filters.append(f"[{video_label}]{','.join(fades)}[vfaded]")
+            video_label = "vfaded"
+
+    audio_label = None
+    if audio:
+        # Audio: the kept source audio, replaced by or mixed with the extra tracks,
+        # padded or cut to the video length
+        audio_labels = []
+        replace = any(track.replace for track in timeline.audio_tracks)
+        if timeline.has_audio and not replace:
+            # Trimmed per segment rather than with aselect, which keeps whole audio
+            # frames and drifts against the frame-selected video over many cuts
+            filters.append(audio_trim_filter("0:a", segments, "asrc") if trimmed else "[0:a]anull[asrc]")
+            audio_labels.append("asrc")
+        first_audio_input = 1 + (len(timeline.overlays) if video else 0)
+        for i, track in enumerate(timeline.audio_tracks):
+            inputs += ["-i", track.source]
+            chain = [f"volume={track.volume:g}"]
+            if track.start > 0:
+                delay = int(round(track.start * 1000))
+                chain.append(f"adelay={delay}:all=1")
+            filters.append(f"[{first_audio_input + i}:a]{','.join(chain)}[at{i}]")
+            audio_labels.append(f"at{i}")
+
+        if audio_labels:
+            if len(audio_labels) > 1:
+                mixed = "".join(f"[{label}]" for label in audio_labels)
+                filters.append(f"{mixed}amix=inputs={len(audio_labels)}:duration=longest:normalize=0[amixed]")
+                audio_label = "amixed"
+            else:
+                audio_label = audio_labels[0]
+            chain = ["apad", f"atrim=0:{_fmt(duration)}"]
+            chain += [f"afade=t=in:st={_fmt(t.at)}:d={_fmt(t.duration)}" if t.kind == "fade_in"
+                      else f"afade=t=out:st={_fmt(t.at)}:d={_fmt(t.duration)}"
+                      for t in timeline.transitions if t.kind in ("fade_in", "fade_out")]
+            filters.append(f"[{audio_label}]{','.join(chain)}[aout]")
+            audio_label = "aout"
+
+    return inputs, ";".join(filters), video_label, audio_label
+
+
+def video_codec_args(fps: float, preset: str = DEFAULT_PRESET, crf: int = DEFAULT_CRF) -> List[str]:
+    """
+    libx264 output arguments shared by whole and chunked renders, so chunks encoded
+    separately join into one valid stream.
+    """
+    return ["-c:v", "libx264", "-preset", preset, "-crf", str(crf), "-pix_fmt", "yuv420p", "-r", f"{fps:g}"]
+
+
+def render_timeline(
+    timeline: Timeline,
+    output_path: Path,
+    preset: str = DEFAULT_PRESET,
+    crf: int = DEFAULT_CRF,
+    threads: Optional[int] = None
+) -> Path:
+    """
+    Render a timeline to output_path with a single ffmpeg run (one decode of every
+    input, one libx264/AAC encode).
+
+    Args:
+        timeline: Edit decision list to render
+        output_path: Destination file
+        preset: libx264 preset
+        crf: libx264 constant rate factor
+        threads: Filter and encoder threads (ffmpeg's default when None)
+    """
+    if not timeline.segments:
+        raise ValueError("Timeline has no segments to render")
+    inputs, filter_graph, video_label, audio_label = build_filter_graph(timeline)
+    args = list(inputs)
+    if threads:
+        args += ["-filter_complex_threads", str(threads)]
+    args += ["-filter_complex", filter_graph, "-map", f"[{video_label}]"]
+    if audio_label:
+        args += ["-map", f"[{audio_label}]", "-c:a", "aac", "-b:a", AUDIO_BITRATE]
+    args += video_codec_args(timeline.fps, preset, crf)
+    args += ["-t", _fmt(timeline.duration), "-movflags", "+faststart"]
+    if threads:
+        args += ["-threads", str(threads)]
+    run_ffmpeg(args + [str(output_path)])
+    return Path(output_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import time
+
+    from modules.media_probe import probe_media
+    from modules.timeline import (apply_broll, apply_silence_trim, apply_voiceover, apply_zoom_plan,
+                                  load_zoom_plan, timeline_from_source)
+
+    parser = argparse.ArgumentParser(description="Render a video with silence cuts, zooms and B-roll in one pass.")
+    parser.add_argument("video", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--silence", type=Path, help="Silence JSON from silence.detect_silence")
+    parser.add_argument("--zooms", type=Path, help="Zoom plan JSON")
+    parser.add_argument("--broll", type=Path, help="JSON list of {path, timestamp, duration}")
+    parser.add_argument("--voiceover", type=Path)
+    args = parser.parse_args()
+
+    timeline = timeline_from_source(args.video, probe_media(args.video))
+    if args.silence:
+        with open(args.silence, "r", encoding="utf-8") as f:
+            timeline = apply_silence_trim(timeline, json.load(f))
+    if args.zooms:
+        timeline = apply_zoom_plan(timeline, load_zoom_plan(args.zooms))
+    if args.broll:
+        with open(args.broll, "r", encoding="utf-8") as f:
+            timeline = apply_broll(timeline, json.load(f))
+    if args.voiceover:
+        timeline = apply_voiceover(timeline, args.voiceover)
+
+    started = time.perf_counter()
+    render_timeline(timeline, args.output)
+    print(f"Rendered {timeline.duration:.2f}s to {args.output} in {time.perf_counter() - started:.2f}s")
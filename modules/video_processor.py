@@ -1,21 +1,45 @@
 import subprocess
+import json
 from pathlib import Path
 import os
 import time
 import shutil
 import tempfile
-from moviepy.editor import VideoFileClip, AudioFileClip, CompositeVideoClip, ImageClip
+from moviepy.editor import VideoFileClip, CompositeVideoClip, ImageClip
 from modules.silence_trimmer import SilenceTrimmer
 from modules.zoom_effect_creator import create_zoom_effects
 from modules.broller import insert_broll
 from modules.silence import detect_silence
 from modules.sub import process_video
+from modules.directory_reader import iter_media_entries, VIDEO_EXTENSIONS
+from modules.media_probe import probe_media
+from modules.timeline import (Timeline, apply_broll, apply_silence_trim, apply_voiceover, apply_zoom_plan,
+                              broll_from_scenes, load_zoom_plan, timeline_from_source)
+from modules.timeline_renderer import DEFAULT_CRF, DEFAULT_PRESET, render_timeline
+from modules.chunked_encoder import CHUNKED_MIN_THREADS, MIN_CHUNK_SECONDS, render_timeline_chunked
+from modules.keyframe_index import load_keyframe_index
+from modules.artifact_cache import ArtifactCache, run_cached
+from modules.audio_mux import replace_audio
+from modules.pipeline_dag import Node, format_run_report, run_dag, write_run_report
+from modules.resource_usage import run_subprocess
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import subprocess
-import traceback
+import threading
+from functools import partial
+from modules.config import (get_artifact_cache_dir, get_artifact_cache_max_bytes, get_artifact_fingerprint_mode,
+                            get_keyframe_index_dir, get_render_mode, get_video_workers,
+                            get_voiceover_length_mode)
 
 from modules.zoomer import add_zoom_effects_from_json
 
+# Code versions of the cached stages; bump one when its output changes for the same inputs
+STAGE_VERSIONS = {"silence": 1, "zoom_plan": 1, "trim": 1, "render": 2}
+
+# Pipeline threads for the light stages (probing, transcripts, OpenAI calls) next to
+# the renders
+LIGHT_STAGE_WORKERS = 4
+
 def render_remotion_video():
     """Render a video using Remotion."""
     try:
@@ -44,13 +68,7 @@ def process_with_node(directory_or_file):
 
     try:
         # Call the Node.js script
-        subprocess.run(
-            ["node", node_script_path],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-        )
+        run_subprocess(["node", node_script_path], check=True, text=True)
         print(f"Successfully processed: {directory_or_file}")
         return True
     except subprocess.CalledProcessError as e:
@@ -90,16 +108,297 @@ def create_simple_caption(video_path, output_path):
         shutil.copy(str(video_path), str(output_path))
         return False
 
+def _broll_for_video(video_file: Path, broll_suggestions):
+    """
+    B-roll overlay entries for one video. Accepts per-video suggestions
+    ({filename, suggested_broll}) or a suggest_broll scene plan, which is laid out
+    from the start of the video.
+    """
+    scene_plan = [s for s in broll_suggestions or [] if "media_files" in s]
+    if scene_plan:
+        return broll_from_scenes(scene_plan)
+    for suggestion in broll_suggestions or []:
+        if suggestion.get("filename") == video_file.name:
+            return suggestion.get("suggested_broll", [])
+    return []
+
+
+def _find_transcript(subs_dir: Path, video_file: Path):
+    """
+    Transcript for zoom planning and whether its times refer to the untrimmed source.
+    """
+    transcript_path = subs_dir / f"trimmed_{video_file.stem}.json"
+    if transcript_path.exists():
+        return transcript_path, False
+    return subs_dir / f"{video_file.stem}.json", True
+
+
+def _silence_stage(video_file: Path, videos_dir: Path, video_temp_dir: Path, cache: ArtifactCache = None):
+    """
+    Detect silence from the video's transcript; returns the silence JSON path, or
+    None when detection failed.
+    """
+    silence_json_path = video_temp_dir / "silence.json"
+    video_transcript_file = videos_dir / f"{video_file.stem}.json"
+    try:
+        run_cached(cache, "silence", STAGE_VERSIONS["silence"], [video_transcript_file], None, silence_json_path,
+                   lambda: detect_silence(video_transcript_file, silence_json_path))
+        if silence_json_path.exists():
+            st.success(f"Detected silence for {video_file.name}")
+            return silence_json_path
+    except Exception as e:
+        st.warning(f"Silence detection failed for {video_file.name}: {str(e)}")
+    return None
+
+
+def _zoom_plan_stage(video_file: Path, media_dir: Path, video_temp_dir: Path, cache: ArtifactCache = None):
+    """
+    Plan zooms from the video's transcript; returns (zoom plan path, whether its times
+    refer to the untrimmed source), or None without a plan.
+    """
+    # Captions were generated for the whole videos directory by the transcribe stage
+    transcript_path, source_times = _find_transcript(media_dir / "subs", video_file)
+    zoom_effects_path = video_temp_dir / "zoom_effects.json"
+    try:
+        if transcript_path.exists():
+            run_cached(cache, "zoom_plan", STAGE_VERSIONS["zoom_plan"], [transcript_path], None, zoom_effects_path,
+                       lambda: create_zoom_effects(str(transcript_path), str(zoom_effects_path)))
+            return zoom_effects_path, source_times
+        st.warning(f"No transcript found for zoom effects: {video_file.name}")
+    except Exception as e:
+        st.warning(f"Error adding zoom effects: {str(e)}")
+    return None
+
+
+def _trim_stage(timeline: Timeline, silence_json_path) -> Timeline:
+    if silence_json_path is None:
+        return timeline
+    with open(silence_json_path, "r", encoding="utf-8") as f:
+        return apply_silence_trim(timeline, json.load(f))
+
+
+def _zoom_stage(timeline: Timeline, zoom_plan) -> Timeline:
+    if zoom_plan is None:
+        return timeline
+    zoom_effects_path, source_times = zoom_plan
+    try:
+        timeline = apply_zoom_plan(timeline, load_zoom_plan(zoom_effects_path), source_times=source_times)
+        st.success(f"Added zoom effects to {Path(timeline.source).name}")
+    except Exception as e:
+        st.warning(f"Error adding zoom effects: {str(e)}")
+    return timeline
+
+
+def _broll_stage(timeline: Timeline, video_file: Path, video_temp_dir: Path, broll_suggestions) -> Timeline:
+    current_broll = _broll_for_video(video_file, broll_suggestions)
+    if current_broll:
+        timeline = apply_broll(timeline, current_broll)
+        st.success(f"Found B-roll suggestions for {video_file.name}")
+    timeline.save(video_temp_dir / "timeline.json")
+    return timeline
+
+
+def build_video_timeline(video_file: Path, videos_dir: Path, media_dir: Path, video_temp_dir: Path, broll_suggestions,
+                         cache: ArtifactCache = None) -> Timeline:
+    """
+    Run the per-video stages (silence detection, zoom planning, B-roll lookup) as
+    transforms on one timeline instead of re-encoding after each stage. Stage outputs
+    whose inputs are unchanged are taken from cache. process_videos runs the same
+    stages as pipeline nodes (see _video_nodes).
+    """
+    timeline = timeline_from_source(video_file, probe_media(video_file))
+    timeline = _trim_stage(timeline, _silence_stage(video_file, videos_dir, video_temp_dir, cache))
+    timeline = _zoom_stage(timeline, _zoom_plan_stage(video_file, media_dir, video_temp_dir, cache))
+    return _broll_stage(timeline, video_file, video_temp_dir, broll_suggestions)
+
+
+def _process_video_legacy(video_file: Path, videos_dir: Path, media_dir: Path, video_temp_dir: Path, broll_suggestions,
+                          cache: ArtifactCache = None) -> Path:
+    """
+    Original stage-by-stage processing (one moviepy encode per stage); used when the
+    single-pass render fails. Every stage writes a new file, since outputs taken
+    from the cache may be hardlinks that must not be written through.
+    """
+    # Run silence detection
+    silence_json_path = video_temp_dir / "silence.json"
+    video_transcript_file = videos_dir / f"{video_file.stem}.json"
+    silence_detected = False
+
+    try:
+        run_cached(cache, "silence", STAGE_VERSIONS["silence"], [video_transcript_file], None, silence_json_path,
+                   lambda: detect_silence(video_transcript_file, silence_json_path))
+        silence_detected = True
+    except Exception as e:
+        st.warning(f"Silence detection failed for {video_file.name}: {str(e)}")
+
+    # Remove silence if detected
+    trimmed_path = video_temp_dir / f"trimmed_{video_file.name}"
+    if silence_detected and silence_json_path.exists():
+        try:
+            trimmer = SilenceTrimmer(str(video_file), str(silence_json_path), str(trimmed_path))
+            run_cached(cache, "trim", STAGE_VERSIONS["trim"], [video_file, silence_json_path], {"mode": trimmer.mode},
+                       trimmed_path, trimmer.trim_video)
+        except Exception as e:
+            st.warning(f"Error trimming silence: {str(e)}")
+            trimmed_path.unlink(missing_ok=True)
+            shutil.copy(str(video_file), str(trimmed_path))
+    else:
+        trimmed_path.unlink(missing_ok=True)
+        shutil.copy(str(video_file), str(trimmed_path))
+
+    subs_dir = media_dir / "subs"
+    subs_dir.mkdir(exist_ok=True)
+    transcript_path, _ = _find_transcript(subs_dir, video_file)
+    zoom_effects_path = video_temp_dir / "zoom_effects.json"
+    zoomed_path = video_temp_dir / f"zoomed_{video_file.name}"
+    try:
+        if transcript_path.exists():
+            run_cached(cache, "zoom_plan", STAGE_VERSIONS["zoom_plan"], [transcript_path], None, zoom_effects_path,
+                       lambda: create_zoom_effects(str(transcript_path), str(zoom_effects_path)))
+            zoomed_path.unlink(missing_ok=True)
+            add_zoom_effects_from_json(str(trimmed_path), str(zoom_effects_path), str(zoomed_path))
+            if zoomed_path.exists():
+                trimmed_path = zoomed_path
+    except Exception as e:
+        st.warning(f"Error adding zoom effects: {str(e)}")
+
+    current_broll = [b for b in _broll_for_video(video_file, broll_suggestions) if "broll_filename" in b]
+    final_video_path = video_temp_dir / f"final_{video_file.stem}.mp4"
+    final_video_path.unlink(missing_ok=True)
+    try:
+        if current_broll:
+            insert_broll(str(trimmed_path), current_broll, final_video_path)
+        else:
+            shutil.copy(str(trimmed_path), str(final_video_path))
+    except Exception as e:
+        st.warning(f"Error inserting B-roll: {str(e)}")
+        shutil.copy(str(trimmed_path), str(final_video_path))
+    return final_video_path
+
+
+def use_chunked_render(timeline: Timeline, threads: int) -> bool:
+    """
+    Whether to render a timeline in parallel chunks (RENDER_MODE=chunked), as one
+    ffmpeg process (RENDER_MODE=single), or - by default - in chunks only when one
+    video has enough cores to itself that a single libx264 process would leave some
+    idle.
+    """
+    mode = get_render_mode()
+    if mode == "chunked":
+        return True
+    if mode == "single":
+        return False
+    return threads >= CHUNKED_MIN_THREADS and timeline.duration >= 2 * MIN_CHUNK_SECONDS
+
+
+def _keyframe_times(video_file: Path):
+    try:
+        return load_keyframe_index(video_file, get_keyframe_index_dir()).times
+    except Exception as e:
+        print(f"Error reading keyframes of {video_file}: {e}")
+        return None
+
+
+def video_worker_budget(video_count: int, workers: int = 0):
+    """
+    Return (workers, ffmpeg threads per worker) for a batch of video_count videos:
+    at most one worker per video and per core, with the cores split evenly between
+    workers so concurrent encodes don't oversubscribe the machine.
+
+    Args:
+        video_count: Number of videos in the batch
+        workers: Requested worker count (0 = one per CPU)
+    """
+    cpus = os.cpu_count() or 1
+    if not workers or workers < 0:
+        workers = cpus
+    workers = max(1, min(workers, video_count, cpus))
+    return workers, max(1, cpus // workers)
+
+
+def _streamlit_thread_initializer():
+    """
+    Thread initializer that lets pipeline worker threads report progress through the
+    caller's Streamlit session, if any (None outside Streamlit).
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return (lambda: add_script_run_ctx(threading.current_thread(), ctx)) if ctx is not None else None
+
+
+def _render_stage(timeline: Timeline, video_file: Path, final_video_path: Path, threads: int, voiceover_path,
+                  cache: ArtifactCache = None) -> Path:
+    """
+    Encode a video's timeline (with the voiceover, if given) to final_video_path.
+    """
+    if voiceover_path is not None:
+        timeline = apply_voiceover(timeline, voiceover_path)
+
+    def render():
+        if use_chunked_render(timeline, threads):
+            stats = render_timeline_chunked(timeline, final_video_path, threads=threads,
+                                            keyframe_times=_keyframe_times(video_file))
+            st.success(f"Rendered {video_file.name} in {len(stats['chunks'])} parallel chunks")
+        else:
+            render_timeline(timeline, final_video_path, threads=threads)
+            st.success(f"Rendered {video_file.name} in a single pass")
+
+    # Chunked and single renders produce the same output, so the mode is not part of
+    # the key; the timeline names every input and edit
+    render_inputs = ([timeline.source] + [overlay.source for overlay in timeline.overlays]
+                     + [track.source for track in timeline.audio_tracks])
+    render_params = {"timeline": timeline.dict(), "preset": DEFAULT_PRESET, "crf": DEFAULT_CRF}
+    if run_cached(cache, "render", STAGE_VERSIONS["render"], render_inputs, render_params, final_video_path, render):
+        st.success(f"Reused the cached render of {video_file.name}")
+    return final_video_path
+
+
+def _video_nodes(video_file: Path, videos_dir: Path, media_dir: Path, video_temp_dir: Path, broll_suggestions,
+                 final_video_path: Path, voiceover_path, threads: int, cache: ArtifactCache = None):
+    """
+    Pipeline nodes for one video, named "<file name>:<stage>". Silence detection and
+    zoom planning read the transcripts of the shared transcribe node; trim, zoom and
+    B-roll edit the timeline, and render encodes it once.
+    """
+    prefix = f"{video_file.name}:"
+
+    def probe():
+        st.info(f"Processing video: {video_file.name}")
+        return timeline_from_source(video_file, probe_media(video_file))
+
+    return [
+        Node(prefix + "probe", probe, stage="probe"),
+        Node(prefix + "silence", lambda _: _silence_stage(video_file, videos_dir, video_temp_dir, cache),
+             ["transcribe"], "silence"),
+        Node(prefix + "trim", _trim_stage, [prefix + "probe", prefix + "silence"], "trim"),
+        Node(prefix + "zoom_plan", lambda _: _zoom_plan_stage(video_file, media_dir, video_temp_dir, cache),
+             ["transcribe"], "zoom_plan"),
+        Node(prefix + "zoom", _zoom_stage, [prefix + "trim", prefix + "zoom_plan"], "zoom"),
+        Node(prefix + "broll", lambda timeline: _broll_stage(timeline, video_file, video_temp_dir, broll_suggestions),
+             [prefix + "zoom"], "broll"),
+        Node(prefix + "render",
+             lambda timeline: _render_stage(timeline, video_file, final_video_path, threads, voiceover_path, cache),
+             [prefix + "broll"], "render", resource="encode"),
+    ]
+
+
 def process_videos(media_dir: Path, output_dir: Path, broll_suggestions, voiceover_path: Path):
     """
     Process videos with B-roll, captions, and effects.
-    
+
+    Each video's stages build one timeline (edit decision list) that is rendered with
+    a single ffmpeg run; the first video is rendered straight to final_video.mp4 with
+    the voiceover, so it is encoded exactly once. The stages of all videos run as one
+    dependency graph (pipeline_dag), with up to VIDEO_WORKERS renders at a time (see
+    config.get_video_workers), each with an equal share of the CPU cores for ffmpeg.
+    Per-stage timings and resource use are written to run_report.json/.txt in
+    output_dir.
+
     Args:
         media_dir: Directory containing media files
         output_dir: Directory for output files
         broll_suggestions: Suggestions for B-roll overlays
         voiceover_path: Path to the voiceover audio file
-    
+
     Returns:
         Path to the final video
     """
@@ -108,128 +407,105 @@ def process_videos(media_dir: Path, output_dir: Path, broll_suggestions, voiceov
     if not videos_dir.exists():
         videos_dir.mkdir(parents=True, exist_ok=True)
         st.warning("Created videos directory, but no videos were found.")
-        
+
     # Find video files
-    video_files = list(videos_dir.glob("*.mp4")) + list(videos_dir.glob("*.mov"))
+    video_files = [
+        Path(entry.path)
+        for entry in iter_media_entries(videos_dir, VIDEO_EXTENSIONS, recursive=False)
+    ]
     if not video_files:
         st.error("No video files found in the videos directory.")
         return create_empty_video(output_dir)
-    
-    # Process each video
+
+    has_voiceover = voiceover_path.exists() and os.path.getsize(str(voiceover_path)) > 0
+    final_output_path = output_dir / 'final_video.mp4'
+
+    (media_dir / "subs").mkdir(exist_ok=True)
+
+    try:
+        cache = ArtifactCache(get_artifact_cache_dir(), get_artifact_cache_max_bytes(), get_artifact_fingerprint_mode())
+    except OSError as e:
+        print(f"Error opening artifact cache: {e}")
+        cache = None
+
+    # One pipeline for all videos: captions are added with Node.js once for the whole
+    # directory, then every video's stages run as soon as their inputs are ready.
+    # Renders are limited to `workers` at a time, each with `threads` ffmpeg threads.
+    workers, threads = video_worker_budget(len(video_files), get_video_workers())
+    nodes = [Node("transcribe", lambda: process_with_node(str(videos_dir)))]
+    temp_dirs = {}
+    for index, video_file in enumerate(video_files):
+        # Create a subdirectory for intermediate files
+        video_temp_dir = temp_dirs[video_file] = output_dir / video_file.stem
+        video_temp_dir.mkdir(exist_ok=True)
+        # The first video becomes the final output and gets the voiceover
+        is_main = index == 0
+        final_video_path = final_output_path if is_main else video_temp_dir / f"final_{video_file.stem}.mp4"
+        nodes += _video_nodes(video_file, videos_dir, media_dir, video_temp_dir, broll_suggestions, final_video_path,
+                              voiceover_path if is_main and has_voiceover else None, threads, cache)
+    initializer = _streamlit_thread_initializer()
+    report = run_dag(nodes, workers + LIGHT_STAGE_WORKERS, {"encode": workers}, initializer)
+
+    # Videos whose single-pass pipeline failed get the stage-by-stage fallback
+    errors = {node["name"].rsplit(":", 1)[0]: node["error"] for node in report["nodes"] if node["status"] == "failed"}
+    fallback = []
+    for video_file in video_files:
+        if f"{video_file.name}:render" in report["results"]:
+            continue
+        st.warning(f"Single-pass render failed for {video_file.name}, using stage-by-stage processing: "
+                   f"{errors.get(video_file.name)}")
+        fallback.append(Node(
+            f"{video_file.name}:legacy",
+            partial(_process_video_legacy, video_file, videos_dir, media_dir, temp_dirs[video_file],
+                    broll_suggestions, cache),
+            stage="legacy", resource="encode",
+        ))
+    if fallback:
+        fallback_report = run_dag(fallback, workers, {"encode": workers}, initializer)
+        report["wall_s"] += fallback_report["wall_s"]
+        report["nodes"] += fallback_report["nodes"]
+        report["results"].update(fallback_report["results"])
+
+    try:
+        write_run_report(report, output_dir)
+        print(format_run_report(report))
+    except OSError as e:
+        print(f"Error writing run report: {e}")
+
+    # Results in directory order
     final_paths = []
     for video_file in video_files:
-        try:
-            st.info(f"Processing video: {video_file.name}")
-            
-            # Create a subdirectory for intermediate files
-            video_temp_dir = output_dir / video_file.stem
-            video_temp_dir.mkdir(exist_ok=True)
-            
-            # Run silence detection
-            silence_json_path = video_temp_dir / "silence.json"
-            video_transcript_file = videos_dir / f"{video_file.stem}.json"
-            silence_detected = False
-            
-            try:
-                detect_silence(video_transcript_file, silence_json_path)
-                silence_detected = True
-                st.success(f"Detected silence for {video_file.name}")
-            except Exception as e:
-                st.warning(f"Silence detection failed for {video_file.name}: {str(e)}")
-            
-            # Remove silence if detected
-            trimmed_path = video_temp_dir / f"trimmed_{video_file.name}"
-            if silence_detected and silence_json_path.exists():
-                try:
-                    trimmer = SilenceTrimmer(str(video_file), str(silence_json_path), str(trimmed_path))
-                    trimmer.trim_video()
-                    st.success(f"Trimmed silence from {video_file.name}")
-                except Exception as e:
-                    st.warning(f"Error trimming silence: {str(e)}")
-                    # Copy the original file as fallback
-                    shutil.copy(str(video_file), str(trimmed_path))
-            else:
-                # If silence detection failed, just copy the original file
-                shutil.copy(str(video_file), str(trimmed_path))
-            
-            # Ensure the subs directory exists
-            subs_dir = media_dir / "subs"
-            subs_dir.mkdir(exist_ok=True)
-            
-            # Add captions with Node.js
-            captioning_success = process_with_node(str(videos_dir))
-            
-            # Look for transcript JSON file
-            transcript_path = subs_dir / f"trimmed_{video_file.stem}.json"
-            if not transcript_path.exists():
-                transcript_path = subs_dir / f"{video_file.stem}.json"
-            
-            # Create zoom effects if possible
-            zoom_effects_path = video_temp_dir / "zoom_effects.json"
-            
-            try:
-                if transcript_path.exists():
-                    create_zoom_effects(str(transcript_path), str(zoom_effects_path))
-                    add_zoom_effects_from_json(str(trimmed_path), str(zoom_effects_path), str(trimmed_path))
-                    st.success(f"Added zoom effects to {video_file.name}")
-                else:
-                    st.warning(f"No transcript found for zoom effects: {video_file.name}")
-            except Exception as e:
-                st.warning(f"Error adding zoom effects: {str(e)}")
-            
-            # Insert B-roll
-            current_broll = []
-            for suggestion in broll_suggestions:
-                if suggestion["filename"] == video_file.name:
-                    current_broll = suggestion["suggested_broll"]
-                    st.success(f"Found B-roll suggestions for {video_file.name}")
-                    break
-            
-            final_video_path = video_temp_dir / f"final_{video_file.stem}.mp4"
-            
-            try:
-                if current_broll:
-                    insert_broll(str(trimmed_path), current_broll, final_video_path)
-                    st.success(f"Inserted B-roll into {video_file.name}")
-                else:
-                    # Just copy the file if no B-roll
-                    shutil.copy(str(trimmed_path), str(final_video_path))
-            except Exception as e:
-                st.warning(f"Error inserting B-roll: {str(e)}")
-                # Use the trimmed video as fallback
-                shutil.copy(str(trimmed_path), str(final_video_path))
-            
-            final_paths.append(final_video_path)
-            
-        except Exception as e:
-            st.error(f"Error processing video {video_file.name}: {str(e)}")
-            traceback.print_exc()
+        final_video_path = (report["results"].get(f"{video_file.name}:render")
+                            or report["results"].get(f"{video_file.name}:legacy"))
+        if final_video_path is None:
+            st.error(f"Error processing video {video_file.name}: {errors.get(video_file.name)}")
             continue
+        final_paths.append(final_video_path)
 
     # If no videos were successfully processed, create an empty one
     if not final_paths:
         st.warning("No videos were successfully processed. Creating a placeholder video.")
         return create_empty_video(output_dir)
 
-    # Merge with voiceover if available
+    if final_paths[0] == final_output_path:
+        if has_voiceover:
+            st.success("Added voiceover to the video")
+        return final_output_path
+
+    # The main video came from the stage-by-stage fallback: attach the voiceover by
+    # remuxing (the video stream is copied, not re-encoded)
     try:
-        if len(final_paths) > 0:
-            main_clip = VideoFileClip(str(final_paths[0]))
-            
-            # Add voiceover if it exists
-            if voiceover_path.exists() and os.path.getsize(str(voiceover_path)) > 0:
-                try:
-                    voiceover = AudioFileClip(str(voiceover_path))
-                    main_clip = main_clip.set_audio(voiceover)
-                    st.success("Added voiceover to the video")
-                except Exception as e:
-                    st.warning(f"Error adding voiceover: {str(e)}")
-            
-            final_output_path = output_dir / 'final_video.mp4'
-            main_clip.write_videofile(str(final_output_path), codec='libx264', audio_codec='aac')
-            return final_output_path
-        else:
-            raise Exception("No final videos produced.")
+        # final_video.mp4 may be a hardlink to a cached render
+        final_output_path.unlink(missing_ok=True)
+        if has_voiceover:
+            try:
+                replace_audio(final_paths[0], voiceover_path, final_output_path, get_voiceover_length_mode())
+                st.success("Added voiceover to the video")
+                return final_output_path
+            except Exception as e:
+                st.warning(f"Error adding voiceover: {str(e)}")
+        shutil.copyfile(str(final_paths[0]), str(final_output_path))
+        return final_output_path
     except Exception as e:
         st.error(f"Error in final video production: {str(e)}")
         return create_empty_video(output_dir)
@@ -0,0 +1,127 @@
+# visual_features.py
+# Vectorized NumPy features for sampled video frames and images, and the tags derived
+# from them (brightness:*, energetic, blurry) that broll_suggester selects on.
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Luma thresholds shared with the original histogram-based analyze_brightness
+DARK_LUMA = 85
+BRIGHT_LUMA = 170
+
+# Variance of the Laplacian (on 0-255 luma at sampling resolution) below which a clip
+# is considered out of focus
+BLURRY_SHARPNESS = 60.0
+
+# Mean absolute luma change between consecutive samples (0-1 scale) above which a clip
+# is considered energetic
+ENERGETIC_MOTION = 0.12
+
+_LUMA_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def to_luma(frames: np.ndarray) -> np.ndarray:
+    """
+    Convert an (N, H, W, 3) or (H, W, 3) RGB uint8 array to float32 luma.
+    """
+    return np.tensordot(frames.astype(np.float32, copy=False), _LUMA_WEIGHTS, axes=([-1], [0]))
+
+
+def laplacian_variance(luma: np.ndarray) -> np.ndarray:
+    """
+    Per-frame variance of the 4-neighbour Laplacian for an (N, H, W) luma stack.
+    """
+    lap = (
+        luma[:, :-2, 1:-1] + luma[:, 2:, 1:-1] + luma[:, 1:-1, :-2] + luma[:, 1:-1, 2:]
+        - 4.0 * luma[:, 1:-1, 1:-1]
+    )
+    return lap.reshape(lap.shape[0], -1).var(axis=1)
+
+
+def colorfulness(frames: np.ndarray) -> np.ndarray:
+    """
+    Per-frame Hasler-Suesstrunk colorfulness for an (N, H, W, 3) RGB stack.
+    """
+    rgb = frames.astype(np.float32, copy=False)
+    rg = rgb[..., 0] - rgb[..., 1]
+    yb = 0.5 * (rgb[..., 0] + rgb[..., 1]) - rgb[..., 2]
+    rg = rg.reshape(rg.shape[0], -1)
+    yb = yb.reshape(yb.shape[0], -1)
+    std = np.sqrt(rg.var(axis=1) + yb.var(axis=1))
+    mean = np.sqrt(rg.mean(axis=1) ** 2 + yb.mean(axis=1) ** 2)
+    return std + 0.3 * mean
+
+
+def compute_visual_features(frames: Sequence[np.ndarray]) -> Dict[str, float]:
+    """
+    Compute clip-level features from equally sized RGB frames.
+
+    Returns:
+        mean_luma (0-255), contrast (luma std), colorfulness, sharpness (Laplacian
+        variance) and motion_energy (mean absolute luma change between consecutive
+        samples, 0-1). Empty if there are no frames.
+    """
+    if len(frames) == 0:
+        return {}
+    stack = np.stack(frames) if not isinstance(frames, np.ndarray) else frames
+    if stack.ndim == 3:
+        stack = stack[np.newaxis]
+
+    luma = to_luma(stack)
+    flat = luma.reshape(luma.shape[0], -1)
+    motion = np.abs(np.diff(luma, axis=0)).mean() / 255.0 if luma.shape[0] > 1 else 0.0
+
+    return {
+        "mean_luma": float(flat.mean()),
+        "contrast": float(flat.std(axis=1).mean()),
+        "colorfulness": float(colorfulness(stack).mean()),
+        "sharpness": float(np.median(laplacian_variance(luma))) if min(luma.shape[1:]) > 2 else 0.0,
+        "motion_energy": float(motion),
+    }
+
+
+def brightness_label(mean_luma: float) -> str:
+    if mean_luma < DARK_LUMA:
+        return "dark"
+    elif mean_luma > BRIGHT_LUMA:
+        return "bright"
+    return "balanced"
+
+
+def visual_tags(features: Dict[str, float]) -> List[str]:
+    """
+    Map computed features to the tags used for B-roll selection.
+    """
+    if not features:
+        return []
+    tags = [f"brightness:{brightness_label(features['mean_luma'])}"]
+    if features.get("motion_energy", 0.0) >= ENERGETIC_MOTION:
+        tags.append("energetic")
+    if features.get("sharpness", BLURRY_SHARPNESS) < BLURRY_SHARPNESS:
+        tags.append("blurry")
+    return tags
+
+
+def dominant_colors(image: np.ndarray, count: int = 3, bits: int = 3, max_pixels: int = 65536) -> List[str]:
+    """
+    Return the `count` most common colors of an (H, W, 3) RGB image as hex strings.
+
+    Pixels are quantized to `bits` per channel and counted with a single bincount; each
+    reported color is the mean of the pixels in its bin rather than the bin corner.
+    """
+    pixels = image.reshape(-1, 3)
+    if pixels.shape[0] > max_pixels:
+        pixels = pixels[::pixels.shape[0] // max_pixels + 1]
+    if pixels.shape[0] == 0:
+        return []
+    shift = 8 - bits
+    quantized = (pixels >> shift).astype(np.int32)
+    bins = (quantized[:, 0] << (2 * bits)) | (quantized[:, 1] << bits) | quantized[:, 2]
+    num_bins = 1 << (3 * bits)
+    counts = np.bincount(bins, minlength=num_bins)
+    top = np.argsort(counts)[::-1][:count]
+    top = top[counts[top] > 0]
+    sums = np.stack([np.bincount(bins, weights=pixels[:, c], minlength=num_bins) for c in range(3)], axis=1)
+    means = (sums[top] / counts[top, np.newaxis]).round().astype(np.int32)
+    return ["#{:02x}{:02x}{:02x}".format(*color) for color in means]
@@ -0,0 +1,108 @@
+# zoom_engine.py
+# Zoom plans as keyframed centre crop-and-scale: each zoom eases in from 1x to its level
+# and back out with a smoothstep curve, evaluated per frame by ffmpeg's zoompan filter
+# (one streaming pass at a constant output size) or, for frame-by-frame consumers, as
+# NumPy arrays of zoom levels and crop rectangles.
+
+from typing import Sequence
+
+import numpy as np
+
+from modules.timeline import Zoom
+
+
+def _ease_duration(zoom: Zoom) -> float:
+    # The ramps take at most a third of the zoom each
+    return max(0.0, min(zoom.ease, (zoom.end - zoom.start) / 3))
+
+
+def zoom_expression(zooms: Sequence[Zoom], var: str = "it") -> str:
+    """
+    ffmpeg expression for the zoom level at time `var`: 1 outside all zooms, each
+    zoom's level inside it, with smoothstep ramps of _ease_duration at both ends.
+    Zooms are summed, so overlapping zooms add their extra magnification.
+    """
+    terms = []
+    for zoom in zooms:
+        extra = zoom.level - 1.0
+        if extra == 0:
+            continue
+        ease = _ease_duration(zoom)
+        window = f"between({var},{zoom.start:.4f},{zoom.end:.4f})"
+        if ease > 0:
+            # u rises 0->1 over the ramp in and falls 1->0 over the ramp out
+            u = f"clip(min(({var}-{zoom.start:.4f})/{ease:.4f},({zoom.end:.4f}-{var})/{ease:.4f}),0,1)"
+            terms.append(f"{window}*{extra:g}*{u}*{u}*(3-2*{u})")
+        else:
+            terms.append(f"{window}*{extra:g}")
+    return "1" if not terms else "1+" + "+".join(terms)
+
+
+def zoom_filter(zooms: Sequence[Zoom], width: int, height: int, fps: float) -> str:
+    """
+    zoompan filter applying zooms to a width x height stream at fps: one output frame
+    per input frame, cropped around the centre and scaled back to width x height.
+    """
+    return (
+        f"zoompan=z='{zoom_expression(zooms)}':x='iw/2-(iw/zoom/2)':y='ih/2-(ih/zoom/2)'"
+        f":d=1:s={width}x{height}:fps={fps:g}"
+    )
+
+
+def zoom_levels(zooms: Sequence[Zoom], times: np.ndarray) -> np.ndarray:
+    """
+    Zoom level at each of `times` (seconds), the same curve as zoom_expression.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    levels = np.ones_like(times)
+    for zoom in zooms:
+        extra = zoom.level - 1.0
+        if extra == 0:
+            continue
+        inside = (times >= zoom.start) & (times <= zoom.end)
+        ease = _ease_duration(zoom)
+        if ease > 0:
+            u = np.clip(np.minimum(times - zoom.start, zoom.end - times) / ease, 0.0, 1.0)
+            levels += inside * extra * u * u * (3 - 2 * u)
+        else:
+            levels += inside * extra
+    return levels
+
+
+def crop_boxes(levels: np.ndarray, width: int, height: int) -> np.ndarray:
+    """
+    Centre crop (x, y, w, h) per zoom level for a width x height frame, as float
+    rows; scaling each crop back to width x height applies the zoom.
+    """
+    levels = np.maximum(np.asarray(levels, dtype=np.float64), 1.0)
+    w, h = width / levels, height / levels
+    return np.stack([(width - w) / 2, (height - h) / 2, w, h], axis=1)
+
+
+def zoom_frames(frames, zooms: Sequence[Zoom], fps: float):
+    """
+    Apply zooms to an iterable of HxWxC uint8 frames at fps, yielding frames of the
+    same size. Crop boxes are precomputed in chunks; each frame is resampled with a
+    bilinear gather of its crop, so the cost is linear in the frame count.
+    """
+    boxes = None
+    for index, frame in enumerate(frames):
+        if index % 256 == 0:
+            times = (index + np.arange(256)) / fps
+            boxes = crop_boxes(zoom_levels(zooms, times), frame.shape[1], frame.shape[0])
+        x, y, w, h = boxes[index % 256]
+        if w >= frame.shape[1] - 0.5:
+            yield frame
+            continue
+        height, width = frame.shape[:2]
+        # Sample positions of the output pixel centres inside the crop
+        xs = x + (np.arange(width) + 0.5) * (w / width) - 0.5
+        ys = y + (np.arange(height) + 0.5) * (h / height) - 0.5
+        x0 = np.clip(np.floor(xs).astype(np.int64), 0, width - 2)
+        y0 = np.clip(np.floor(ys).astype(np.int64), 0, height - 2)
+        fx = (xs - x0)[None, :, None]
+        fy = (ys - y0)[:, None, None]
+        source = frame.astype(np.float32)
+        top = source[y0][:, x0] * (1 - fx) + source[y0][:, x0 + 1] * fx
+        bottom = source[y0 + 1][:, x0] * (1 - fx) + source[y0 + 1][:, x0 + 1] * fx
+        yield np.clip(top * (1 - fy) + bottom * fy + 0.5, 0, 255).astype(np.uint8)
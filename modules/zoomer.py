@@ -1,64 +1,27 @@
-import json
-from moviepy.editor import VideoFileClip, CompositeVideoClip, vfx
 from pathlib import Path
 
+from modules.media_probe import probe_media
+from modules.timeline import apply_zoom_plan, load_zoom_plan, timeline_from_source
+from modules.timeline_renderer import render_timeline
+
 
 def add_zoom_effects_from_json(video_path, json_path, output_path):
     """
     Adds zoom effects to a video based on the configuration in a JSON file.
 
+    Zooms are eased centre crops scaled back to the video's own size, applied by
+    ffmpeg in one streaming pass (see zoom_engine).
+
     Args:
         video_path (str): Path to the input video.
         json_path (str): Path to the JSON configuration file.
         output_path (str): Path to save the output video.
     """
     try:
-        # Load the video
-        video = VideoFileClip(video_path)
-        clips = []
-        start_time = 0  # Track the start time for non-zoom segments
-
-        # Load zoom configuration from JSON
-        with open(json_path, "r") as f:
-            zoom_config = json.load(f)
-
-        # Apply each zoom effect as specified in the JSON
-        for zoom in zoom_config:
-            from_ms = zoom.get("fromMs", 0)
-            to_ms = zoom.get("toMs", 0)
-            zoom_effect = zoom.get("zoomEffect", False)
-            zoom_level = zoom.get("zoomLevel", 1.0)
-
-            from_sec = from_ms / 1000  # Convert milliseconds to seconds
-            to_sec = to_ms / 1000
-
-            # Add the non-zoomed part before the zoom
-            if start_time < from_sec:
-                clips.append(video.subclip(start_time, from_sec))
-
-            # Add the zoomed section
-            if zoom_effect:
-                zoom_clip = video.subclip(from_sec, to_sec).fx(vfx.resize, zoom_level)
-                clips.append(zoom_clip)
-
-            start_time = to_sec  # Update the start time
-
-        # Add the remaining part of the video after the last zoom
-        if start_time < video.duration:
-            clips.append(video.subclip(start_time, video.duration))
-
-        # Combine all clips
-        final_clip = CompositeVideoClip(clips)
-
-        # Write the output video
-        final_clip.write_videofile(
-                output_path,
-                codec="libx264",
-                audio_codec="aac",
-                preset="ultrafast",  # Optional: faster encoding
-                threads=4,           # Optional: multi-threading
-                ffmpeg_params=["-vf", "scale=iw:-1"],  # Ensures correct scaling
-            )
+        info = probe_media(Path(video_path))
+        timeline = timeline_from_source(Path(video_path), info, output_height=info.get("height") or 0)
+        timeline = apply_zoom_plan(timeline, load_zoom_plan(Path(json_path)))
+        render_timeline(timeline, Path(output_path))
         print(f"Zoom effects applied and saved to {output_path}")
     except Exception as e:
         print(f"An error occurred: {e}")
@@ -19,11 +19,14 @@ from pydantic import BaseModel
 from datetime import datetime
 
 # Import existing modules
-from modules.directory_reader import gather_media_files
+from modules.directory_reader import gather_media_files, iter_media_entries
 from modules.media_analyzer import analyze_media_files
-from modules.broll_suggester import suggest_broll
+from modules.broll_suggester import suggest_broll, suggest_broll_variants
+from modules.broll_assignment import ASSIGNMENT_STRATEGIES
+from modules.plan_cache import PlanCache
+from modules.audio_pacing import analyze_audio
 from modules.voiceover_generator import generate_voiceover
-from modules.config import get_elevenlabs_api_key
+from modules.config import get_elevenlabs_api_key, get_analysis_workers, get_media_index_path, get_plan_cache_dir, get_audio_analysis_cache_dir
 
 # Create FastMCP server instance
 mcp = FastMCP(
@@ -59,13 +62,18 @@ class VideoProject(BaseModel):
 active_projects: Dict[str, VideoProject] = {}
 
 @mcp.tool()
-def analyze_media_directory(directory_path: str, context: Optional[str] = None) -> Dict[str, Any]:
+def analyze_media_directory(
+    directory_path: str,
+    context: Optional[str] = None,
+    workers: Optional[int] = None
+) -> Dict[str, Any]:
     """
     Analyze all media files in a directory and return detailed information about each file.
     
     Args:
         directory_path: Path to directory containing media files
         context: Optional marketing/creative context to inform analysis
+        workers: Number of parallel analysis processes (default: ANALYSIS_WORKERS, 0 = one per CPU)
     
     Returns:
         Analysis results including file details, descriptions, and usage suggestions
@@ -74,18 +82,37 @@ def analyze_media_directory(directory_path: str, context: Optional[str] = None)
     if not media_dir.exists():
         return {"error": f"Directory not found: {directory_path}"}
     
-    # Gather media files
-    media_files = gather_media_files(media_dir)
-    if not media_files:
+    # Stream the directory scan straight into analysis so work starts on the first file
+    found_files = []
+
+    def scanned_entries():
+        for entry in iter_media_entries(media_dir):
+            found_files.append(entry.path)
+            yield entry
+
+    # Analyze media files, keeping track of throughput
+    throughput = {"files_per_second": 0.0}
+
+    def on_progress(completed, total, files_per_sec):
+        throughput["files_per_second"] = round(files_per_sec, 2)
+
+    started = time.time()
+    analyzed_media = analyze_media_files(
+        scanned_entries(),
+        context or "",
+        cache_path=get_media_index_path(),
+        workers=get_analysis_workers() if workers is None else workers,
+        progress_callback=on_progress
+    )
+    if not found_files:
         return {"error": "No media files found in directory", "directory": directory_path}
     
-    # Analyze media files
-    analyzed_media = analyze_media_files(media_files, context or "")
-    
     # Convert to dictionary format
     results = {
         "directory": directory_path,
-        "total_files": len(media_files),
+        "total_files": len(found_files),
+        "analysis_seconds": round(time.time() - started, 2),
+        "files_per_second": throughput["files_per_second"],
         "media_analysis": []
     }
     
@@ -156,7 +183,11 @@ def create_video_project(
 def suggest_broll_scenes(
     project_id: str,
     video_duration: int = 30,
-    style: str = "dynamic"
+    style: str = "dynamic",
+    strategy: str = "random",
+    seed: Optional[int] = None,
+    audio_path: Optional[str] = None,
+    transcript_path: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Suggest B-roll scenes based on analyzed media files and project context.
@@ -165,6 +196,10 @@ def suggest_broll_scenes(
         project_id: ID of the video project
         video_duration: Target video duration in seconds (default: 30)
         style: Video style - "dynamic", "calm", "energetic", "emotional"
+        strategy: Media assignment - "random", "optimal" (best overall plan) or "greedy"
+        seed: Optional seed; the same seed and inputs always return the same scenes
+        audio_path: Optional voiceover or music file; cuts are placed on its beats and onsets
+        transcript_path: Optional token-level transcript JSON; cuts are placed on sentence ends
     
     Returns:
         B-roll suggestions with scene descriptions and recommended media files
@@ -185,19 +220,117 @@ def suggest_broll_scenes(
     if not media_files:
         return {"error": "No media files found in project"}
     
-    analyzed_media = analyze_media_files(media_files, context)
+    analyzed_media = analyze_media_files(
+        media_files,
+        context,
+        cache_path=get_media_index_path(),
+        workers=get_analysis_workers()
+    )
     
     # Get B-roll suggestions
-    suggestions = suggest_broll(analyzed_media, context)
+    if strategy not in ASSIGNMENT_STRATEGIES:
+        return {"error": f"Unknown strategy: {strategy}"}
+    audio_analysis = None
+    if audio_path:
+        if not Path(audio_path).exists():
+            return {"error": f"Audio file not found: {audio_path}"}
+        try:
+            audio_analysis = analyze_audio(Path(audio_path), get_audio_analysis_cache_dir())
+        except Exception as e:
+            return {"error": f"Audio analysis failed: {str(e)}"}
+    transcript = None
+    if transcript_path:
+        try:
+            transcript = json.loads(Path(transcript_path).read_text())
+        except Exception as e:
+            return {"error": f"Could not read transcript: {str(e)}"}
+    
+    suggestions = suggest_broll(
+        analyzed_media,
+        context,
+        target_duration=video_duration,
+        style=style,
+        strategy=strategy,
+        seed=seed,
+        plan_cache=PlanCache(get_plan_cache_dir()),
+        audio_analysis=audio_analysis,
+        transcript=transcript
+    )
     
     return {
         "project_id": project_id,
         "total_scenes": len(suggestions),
         "target_duration": video_duration,
         "style": style,
+        "seed": seed,
         "scenes": suggestions
     }
 
+@mcp.tool()
+def suggest_broll_scene_variants(
+    project_id: str,
+    variants: int = 10,
+    styles: Optional[List[str]] = None,
+    durations: Optional[List[int]] = None,
+    strategy: str = "optimal",
+    min_distance: float = 0.5,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Suggest several distinct B-roll plans at once, e.g. for A/B testing a campaign.
+    
+    Args:
+        project_id: ID of the video project
+        variants: Number of plans to generate (default: 10)
+        styles: Styles to cycle through across variants (default: ["dynamic"])
+        durations: Target durations in seconds to cycle through (default: [30])
+        strategy: Media assignment - "random", "optimal" or "greedy"
+        min_distance: Minimum media-overlap distance between any two plans (0-1)
+        seed: Optional seed to make the whole batch reproducible
+    
+    Returns:
+        The plans plus a diversity report (pairwise media overlap, unique media used)
+    """
+    if project_id not in active_projects:
+        return {"error": f"Project not found: {project_id}"}
+    if strategy not in ASSIGNMENT_STRATEGIES:
+        return {"error": f"Unknown strategy: {strategy}"}
+    
+    project = active_projects[project_id]
+    media_dir = Path(project.media_directory)
+    
+    context = ""
+    if project.context_path and Path(project.context_path).exists():
+        context = Path(project.context_path).read_text()
+    
+    media_files = gather_media_files(media_dir)
+    if not media_files:
+        return {"error": "No media files found in project"}
+    
+    analyzed_media = analyze_media_files(
+        media_files,
+        context,
+        cache_path=get_media_index_path(),
+        workers=get_analysis_workers()
+    )
+    
+    result = suggest_broll_variants(
+        analyzed_media,
+        context,
+        n=variants,
+        styles=styles,
+        durations=durations,
+        strategy=strategy,
+        min_distance=min_distance,
+        seed=seed
+    )
+    
+    return {
+        "project_id": project_id,
+        "total_variants": len(result["variants"]),
+        **result
+    }
+
 @mcp.tool()
 def create_voiceover(
     project_id: str,
@@ -47,6 +47,76 @@ try:
 except Exception as e:
     print(f"✗ B-roll suggester test failed: {e}")
 
+# Test seeded multi-variant planning
+try:
+    from modules.broll_suggester import suggest_broll_variants
+    from modules.media_analyzer import MediaItem
+    library = [
+        MediaItem(file_path=Path(f"clip_{i}.mp4"), file_type="video", duration=5.0 + i,
+                  description="", suggested_usage="", tags=["landscape"])
+        for i in range(20)
+    ]
+    batch = suggest_broll_variants(library, "product demo", n=3, seed=1)
+    assert batch == suggest_broll_variants(library, "product demo", n=3, seed=1)
+    print(f"✓ B-roll variants work: {len(batch['variants'])} plans, "
+          f"min distance {batch['diversity']['min_distance']}")
+except Exception as e:
+    print(f"✗ B-roll variants test failed: {e}")
+
+# Test content fingerprinting
+try:
+    from modules.fingerprint import fingerprint_file
+    full = fingerprint_file(Path(__file__), "full")
+    sampled = fingerprint_file(Path(__file__), "sampled")
+    assert full == fingerprint_file(Path(__file__), "full") and full != sampled
+    print(f"✓ Fingerprinting works: {full.split(':')[0]} / {sampled.split(':')[0]}")
+except Exception as e:
+    print(f"✗ Fingerprint test failed: {e}")
+
+# Test smart-cut planning
+try:
+    import numpy as np
+    from modules.smart_cut import plan_pieces
+    from modules.timeline import Segment
+    pieces = plan_pieces([Segment(start=0.5, end=5.2)], np.array([0.0, 2.0, 4.0, 6.0]))
+    assert [(p.start, p.end, p.copy) for p in pieces] == [(0.5, 2.0, False), (2.0, 4.0, True), (4.0, 5.2, False)]
+    print(f"✓ Smart-cut planning works: {len(pieces)} pieces")
+except Exception as e:
+    print(f"✗ Smart-cut planning test failed: {e}")
+
+# Test the pipeline executor
+try:
+    from modules.pipeline_dag import Node, run_dag
+    report = run_dag([
+        Node("a", lambda: 2),
+        Node("b", lambda a: a * 3, ["a"]),
+        Node("c", lambda a: 1 / 0, ["a"]),
+        Node("d", lambda c: c, ["c"]),
+    ])
+    statuses = {node["name"]: node["status"] for node in report["nodes"]}
+    assert report["results"]["b"] == 6
+    assert statuses == {"a": "ok", "b": "ok", "c": "failed", "d": "skipped"}
+    print(f"✓ Pipeline executor works: {statuses}")
+except Exception as e:
+    print(f"✗ Pipeline executor test failed: {e}")
+
+# Test the image derivative store
+try:
+    import tempfile
+    from PIL import Image
+    from modules.derivative_store import DerivativeStore, get_derivative
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "photo.jpg"
+        Image.new("RGB", (1200, 800), (40, 80, 120)).save(source)
+        store = DerivativeStore(Path(tmp) / "store")
+        thumb = get_derivative(source, 160, 160, crop=True, store=store)
+        assert thumb == get_derivative(source, 160, 160, crop=True, store=store)
+        assert Image.open(thumb).size == (160, 160)
+        assert Image.open(get_derivative(source, 300, store=store)).size == (300, 200)
+    print("✓ Derivative store works: 160x160 crop and 300px variants")
+except Exception as e:
+    print(f"✗ Derivative store test failed: {e}")
+
 print("\n🎉 Basic server tests passed! The MCP server should work correctly.")
 print("\nTo run the server:")
 print("  python server.py") 
\ No newline at end of file
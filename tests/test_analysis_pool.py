@@ -0,0 +1,38 @@
+# A worker crash in the parallel analysis pool must be blamed only on the file that
+# causes it, however many other files were outstanding when the pool broke.
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from modules import media_analyzer  # noqa: E402
+
+
+def crash_on_marked_files(file_path, context, stale_item, hash_mode):
+    # Module-level so spawned workers can unpickle it
+    if Path(file_path).name.startswith("crash"):
+        os._exit(1)
+    if Path(file_path).name.startswith("slow"):
+        time.sleep(1.0)
+    return Path(file_path).name, None
+
+
+def test_only_the_crashing_file_is_dropped(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_analyzer, "_analyze_file_safe", crash_on_marked_files)
+    # The slow file sits at the head of the window while the crashing file right
+    # behind it breaks the pool, again on every retry
+    names = ["slow_head.jpg", "crash_a.jpg"] + [f"ok_{i:02d}.jpg" for i in range(8)] + ["crash_b.jpg", "ok_tail.jpg"]
+    jobs = [(tmp_path / name, None, None) for name in names]
+
+    results = list(media_analyzer._iter_analysis_results(jobs, workers=2))
+
+    assert [path.name for path, _, _ in results] == names
+    for path, item, error in results:
+        if path.name.startswith("crash"):
+            assert item is None and "crashed" in error
+        else:
+            assert item == path.name and error is None
@@ -0,0 +1,27 @@
+# Artifact cache keys must change when an input is edited in place, even when the
+# edit keeps the file size and misses the blocks sampled fingerprints read.
+
+from modules.artifact_cache import ArtifactCache
+from modules.fingerprint import SAMPLE_BLOCK_SIZE, SAMPLE_BLOCKS
+
+
+def _edit_between_samples(path):
+    # Just past the head block: outside every sampled block of a file this size
+    size = path.stat().st_size
+    with open(path, "r+b") as f:
+        f.seek(SAMPLE_BLOCK_SIZE + 1)
+        f.write(b"\xff")
+    assert path.stat().st_size == size
+
+
+def test_full_mode_keys_follow_same_size_edits(tmp_path):
+    source = tmp_path / "source.mp4"
+    source.write_bytes(bytes(SAMPLE_BLOCK_SIZE * (SAMPLE_BLOCKS + 2) * 4))
+    full = ArtifactCache(tmp_path / "full")
+    sampled = ArtifactCache(tmp_path / "sampled", fingerprint_mode="sampled")
+    before = full.key("render", 1, [source]), sampled.key("render", 1, [source])
+
+    _edit_between_samples(source)
+    assert full.key("render", 1, [source]) != before[0]
+    # Sampled keys are cheap change detection only, and miss this edit
+    assert sampled.key("render", 1, [source]) == before[1]
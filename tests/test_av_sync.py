@@ -0,0 +1,87 @@
+# A/V sync after many cuts: the source flashes white and beeps at the top of every
+# second, the outputs keep 43 ranges around those events, and the flash and beep
+# must still start together in the result.
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+av = pytest.importorskip("av")
+
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg is not installed", allow_module_level=True)
+
+from modules.ffmpeg_utils import run_ffmpeg  # noqa: E402
+from modules.timeline import Segment  # noqa: E402
+
+FPS = 30
+SAMPLE_RATE = 48000
+DURATION = 60
+EVENTS = range(1, 44)
+# Rounding at each cut (whole AAC frames, millisecond container timestamps) adds up
+# to tens of milliseconds over 43 cuts; exact cuts stay within a fraction of one
+MAX_OFFSET = 0.005
+
+
+@pytest.fixture(scope="module")
+def sync_clip(tmp_path_factory) -> Path:
+    path = tmp_path_factory.mktemp("sync") / "sync.mp4"
+    run_ffmpeg([
+        "-f", "lavfi", "-i", f"color=c=black:s=320x240:r={FPS}:d={DURATION},"
+                             "drawbox=c=white:t=fill:enable='lt(mod(t,1),0.1)'",
+        "-f", "lavfi", "-i", f"aevalsrc='if(lt(mod(t,1),0.1),0.5*sin(2*PI*1000*t),0)':s={SAMPLE_RATE}:d={DURATION}",
+        "-c:v", "libx264", "-g", str(FPS), "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", str(path),
+    ])
+    return path
+
+
+def cut_segments():
+    # Cut points are spread over the audio frame grid so rounding to whole AAC frames
+    # would add up instead of cancelling out
+    return [Segment(start=k - 0.3 - 0.011 * (k % 5), end=k + 0.35) for k in EVENTS]
+
+
+def _onsets(times, active):
+    return [t for t, now, before in zip(times[1:], active[1:], active[:-1]) if now and not before]
+
+
+def av_offsets(path: Path):
+    """
+    Audio onset minus video onset for every flash/beep pair in path.
+    """
+    with av.open(str(path)) as container:
+        frames = [(frame.time, frame.to_ndarray(format="gray").mean()) for frame in container.decode(video=0)]
+    with av.open(str(path)) as container:
+        chunks = [(frame.time, frame.to_ndarray().mean(axis=0)) for frame in container.decode(audio=0)]
+    video_times = [0.0] + [t for t, _ in frames]
+    flashes = _onsets(video_times, [False] + [luma > 128 for _, luma in frames])
+    sample_times = np.concatenate([t + np.arange(len(samples)) / SAMPLE_RATE for t, samples in chunks])
+    samples = np.abs(np.concatenate([samples for _, samples in chunks]))
+    # Beep onset: first loud sample after a run of silence at least as long as a frame
+    loud = np.flatnonzero(samples > 0.1)
+    starts = loud[np.concatenate([[True], np.diff(loud) > SAMPLE_RATE // FPS])]
+    beeps = list(sample_times[starts])
+    assert len(flashes) == len(beeps) == len(EVENTS)
+    return np.array(beeps) - np.array(flashes)
+
+
+def test_smart_cut_keeps_sync(sync_clip, tmp_path):
+    from modules.smart_cut import smart_cut
+
+    output = tmp_path / "smart.mp4"
+    smart_cut(sync_clip, cut_segments(), output)
+    assert np.abs(av_offsets(output)).max() < MAX_OFFSET
+
+
+def test_single_pass_render_keeps_sync(sync_clip, tmp_path):
+    from modules.media_probe import probe_media
+    from modules.timeline import snap_to_frames, timeline_from_source
+    from modules.timeline_renderer import render_timeline
+
+    timeline = timeline_from_source(sync_clip, probe_media(sync_clip), output_height=240)
+    timeline = timeline.copy(update={"segments": snap_to_frames(cut_segments(), timeline.fps)})
+    output = tmp_path / "rendered.mp4"
+    render_timeline(timeline, output)
+    assert np.abs(av_offsets(output)).max() < MAX_OFFSET
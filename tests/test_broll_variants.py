@@ -0,0 +1,37 @@
+# Every variant of a batch can be replayed on its own with suggest_broll.
+
+import random
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from modules.broll_suggester import suggest_broll, suggest_broll_variants
+
+TAGS = ["landscape", "portrait", "short-clip", "high-fps", "energetic", "detail", "establishing"]
+
+
+def _library(size=40):
+    rng = random.Random(7)
+    return [
+        SimpleNamespace(
+            file_path=Path(f"/library/asset_{i:03d}.mp4"),
+            file_type="video" if rng.random() < 0.7 else "image",
+            duration=round(rng.uniform(1, 20), 2),
+            tags=rng.sample(TAGS, 2),
+            file_hash=None,
+            perceptual_hash=None,
+        )
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize("strategy", ["random", "optimal"])
+def test_variant_replays_from_its_seed_and_usage(strategy):
+    library = _library()
+    batch = suggest_broll_variants(library, "product demo", n=4, styles=["dynamic", "calm"],
+                                   durations=[20.0], strategy=strategy, seed=3)
+    for variant in batch["variants"]:
+        replayed = suggest_broll(library, "product demo", variant["target_duration"], variant["style"],
+                                 strategy=strategy, seed=variant["seed"], recent_usage=variant["recent_usage"])
+        assert replayed == variant["scenes"]
@@ -0,0 +1,47 @@
+# Chunked and single-pass renders of a timeline whose zooms cross the chunk boundary
+# must show the same zoom on every frame.
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+av = pytest.importorskip("av")
+
+if shutil.which("ffmpeg") is None:
+    pytest.skip("ffmpeg is not installed", allow_module_level=True)
+
+from modules.chunked_encoder import render_timeline_chunked  # noqa: E402
+from modules.ffmpeg_utils import run_ffmpeg  # noqa: E402
+from modules.media_probe import probe_media  # noqa: E402
+from modules.timeline import Zoom, timeline_from_source  # noqa: E402
+from modules.timeline_renderer import render_timeline  # noqa: E402
+
+DURATION = 8
+
+
+def _frames(path: Path) -> np.ndarray:
+    with av.open(str(path)) as container:
+        return np.stack([frame.to_ndarray(format="gray").astype(np.float32) for frame in container.decode(video=0)])
+
+
+def test_chunked_zoom_matches_single_pass(tmp_path):
+    source = tmp_path / "source.mp4"
+    run_ffmpeg(["-f", "lavfi", "-i", f"testsrc2=s=320x240:r=30:d={DURATION}",
+                "-c:v", "libx264", "-pix_fmt", "yuv420p", str(source)])
+    timeline = timeline_from_source(source, probe_media(source), output_height=240)
+    # Two workers split the 8 s into two chunks at 4 s, inside both zooms
+    timeline = timeline.copy(update={"has_audio": False, "zooms": [
+        Zoom(start=2.5, end=5.5, level=1.6),
+        Zoom(start=3.8, end=4.4, level=1.3, ease=0.0),
+    ]})
+
+    render_timeline(timeline, tmp_path / "single.mp4")
+    stats = render_timeline_chunked(timeline, tmp_path / "chunked.mp4", threads=4)
+    assert len(stats["chunks"]) == 2
+
+    single, chunked = _frames(tmp_path / "single.mp4"), _frames(tmp_path / "chunked.mp4")
+    assert single.shape == chunked.shape
+    # Only encoder noise apart; a zoom level mismatch moves the whole test pattern
+    assert np.abs(single - chunked).mean(axis=(1, 2)).max() < 4
@@ -0,0 +1,30 @@
+# Reduced-scale decoding of images in modes Image.reduce does not handle itself.
+
+import pytest
+from PIL import Image
+
+from modules.image_loader import load_reduced_image
+
+
+@pytest.mark.parametrize("mode, suffix", [("P", ".png"), ("P", ".gif"), ("1", ".png"), ("I;16", ".png")])
+def test_reduces_non_rgb_modes(tmp_path, mode, suffix):
+    path = tmp_path / f"large{suffix}"
+    image = Image.new("RGB", (4000, 3000), (200, 40, 40))
+    image = image.convert(mode) if mode != "I;16" else Image.new("I;16", image.size, 40000)
+    image.save(path)
+
+    reduced, info = load_reduced_image(path, (1000, 1000))
+    assert (info["width"], info["height"]) == (4000, 3000)
+    assert reduced.mode == "RGB"
+    assert reduced.size == (1334, 1000)
+
+
+def test_keeps_palette_transparency(tmp_path):
+    path = tmp_path / "transparent.png"
+    image = Image.new("P", (4000, 3000), 0)
+    image.info["transparency"] = 0
+    image.save(path, transparency=0)
+
+    reduced, _ = load_reduced_image(path, (1000, 1000), keep_alpha=True)
+    assert reduced.mode == "RGBA"
+    assert reduced.size == (1334, 1000)